@@ -23,6 +23,11 @@ public function storeResult(Request $request)
             'plate' => 'required|string|max:20',
             'mode' => 'required|in:entry,exit',
             'image_base64' => 'nullable|string',
+            'image' => 'nullable|file|image|max:10240',
+            'image_url' => 'nullable|url',
+            'image_sha256' => 'nullable|string|size:64',
+            'canonical_plate' => 'nullable|string|max:20',
+            'plate_distance' => 'nullable|integer|min:0',
             'timestamp' => 'nullable|date',
             'slot_name' => 'nullable|string'
         ]);
@@ -35,9 +40,16 @@ public function storeResult(Request $request)
         $mode = $request->input('mode');
         $imageBase64 = $request->input('image_base64');
 
-        // Simpan gambar jika tersedia
+        // Simpan gambar jika tersedia: file multipart, base64 (lama), atau URL evidence server Python
         $imageName = null;
-        if ($imageBase64) {
+        if ($request->hasFile('image')) {
+            $imageName = $request->file('image')->storeAs(
+                'plates', time() . '_' . substr(md5($plate), 0, 6) . '.jpg', 'public'
+            );
+        } elseif ($request->filled('image_url')) {
+            // gambar tetap di server ANPR (content-addressed), diambil saat dibutuhkan
+            $imageName = $request->input('image_url');
+        } elseif ($imageBase64) {
             $imageData = base64_decode($imageBase64);
             if ($imageData !== false) {
                 $imageName = 'plates/' . time() . '_' . substr(md5($plate), 0, 6) . '.jpg';
@@ -48,7 +60,8 @@ public function storeResult(Request $request)
         if ($mode === 'entry') {
             return $this->handleEntryMode($plate, $imageName, $request->input('slot_name'));
         } elseif ($mode === 'exit') {
-            return $this->handleExitMode($plate, $imageName, $request->input('slot_name'));
+            return $this->handleExitMode($plate, $imageName, $request->input('slot_name'),
+                $request->input('canonical_plate'));
         }
 
         return $this->errorResponse('Invalid mode. Use "entry" or "exit"', [], 400);
@@ -119,7 +132,7 @@ private function handleEntryMode($plate, $imageName, $slotName = null)
     /**
      * Menangani mode EXIT (kendaraan keluar)
      */
-    private function handleExitMode($plate, $imageName, $slotName = null)
+    private function handleExitMode($plate, $imageName, $slotName = null, $canonicalPlate = null)
     {
         // Cari data masuk terakhir berdasarkan plat nomor yang belum keluar
         $entry = IncomingCar::where('car_no', $plate)
@@ -129,9 +142,20 @@ private function handleExitMode($plate, $imageName, $slotName = null)
             ->orderBy('datetime', 'desc')
             ->first();
 
+        // Bacaan keluar beda satu karakter OCR (8 vs B, 0 vs D): pakai plat kanonik dari server ANPR
+        if (!$entry && $canonicalPlate) {
+            $entry = IncomingCar::whereRaw("REPLACE(car_no, ' ', '') = ?", [strtoupper(str_replace(' ', '', $canonicalPlate))])
+                ->whereDoesntHave('outgoing', function ($query) {
+                    $query->whereNotNull('exit_time');
+                })
+                ->orderBy('datetime', 'desc')
+                ->first();
+        }
+
         if (!$entry) {
             return $this->errorResponse('Entry record not found for this vehicle', [], 404);
         }
+        $plate = $entry->car_no; // outgoing record memakai plat yang tercatat saat masuk
 
         // Hitung durasi dan biaya
         $entryTime = Carbon::parse($entry->datetime);
@@ -196,6 +220,24 @@ private function handleExitMode($plate, $imageName, $slotName = null)
         ], 'Vehicle exit recorded successfully');
     }
 
+    /**
+     * Plat yang sedang parkir (masuk, belum keluar), untuk indeks rekonsiliasi server ANPR
+     */
+    public function parkedPlates()
+    {
+        $plates = IncomingCar::whereDoesntHave('outgoing', function ($query) {
+                $query->whereNotNull('exit_time');
+            })
+            ->pluck('car_no')
+            ->unique()
+            ->values();
+
+        return $this->successResponse([
+            'plates' => $plates,
+            'count' => $plates->count(),
+        ], 'Parked plates retrieved successfully');
+    }
+
     /**
      * Mendapatkan riwayat hasil ANPR
      */
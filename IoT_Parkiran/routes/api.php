@@ -40,6 +40,10 @@
 // Method: POST | URL: http://ip-laptop:8000/api/anpr/result
 Route::post('/anpr/result', [ANPRController::class, 'storeResult']);
 
+// Plat yang sedang parkir, dibaca server ANPR untuk mencocokkan bacaan keluar yang salah satu karakter
+// Method: GET | URL: http://ip-laptop:8000/api/anpr/parked
+Route::get('/anpr/parked', [ANPRController::class, 'parkedPlates']);
+
 
 // --- 3. TEST CONNECTION (Opsional) ---
 // Buat ngecek apakah HP/ESP32 bisa nyambung ke Laptop
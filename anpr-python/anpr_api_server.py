@@ -2,13 +2,25 @@
 import os
 import time
 import logging
+import threading
 import traceback
-import requests
-import numpy as np
-import cv2
-from flask import Flask, request, jsonify
+from urllib.parse import urlsplit
+from flask import Flask, Response, request, jsonify, g
 
-from anpr_bisa import setup_models, process_image_from_array
+from anpr_bisa import (setup_models, warmup_models, pin_threads, process_image_from_array, detect_plate_boxes,
+                       recognize_plates, preproc_stats, YOLO_MODEL_PATH)
+from anpr_detector import load_detector, YOLO_BACKEND
+from anpr_jobs import JobManager, QueueFull, CallbackNotAllowed
+from anpr_forwarder import LaravelForwarder, LARAVEL_BATCH_PATH
+from anpr_batcher import BatchingDetector, YOLO_BATCH_MAX, YOLO_BATCH_WAIT_MS
+from anpr_frame_cache import FrameResultCache, dhash, FRAME_CACHE
+from anpr_metrics import REGISTRY, STAGE_SECONDS
+from anpr_evidence import attach_evidence, evidence_jpeg, default_store
+from anpr_decode import decode_frame
+from anpr_profiles import camera_profiles
+from anpr_stream import StreamLane, StreamSession, boundary_from_content_type
+from anpr_batch import BatchError, iter_batch_images, run_batch
+from anpr_reconcile import ParkedIndex, RECONCILE, RECONCILE_PARKED_PATH
 
 # Logging
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +31,17 @@ LARAVEL_API_URL = os.getenv("LARAVEL_API_URL", "http://localhost:8000/api")
 ANPR_TOKEN = os.getenv("ANPR_TOKEN", "your_anpr_token_here")
 MODEL_YOLO_PATH = os.getenv("YOLO_MODEL_PATH", "models/yolo/best.pt")
 MODEL_OCR_DIR = os.getenv("PADDLE_OCR_DIR", "models/ocr")
+ANPR_ASYNC = os.getenv("ANPR_ASYNC", "0") == "1"  # default mode /process_image: 1 = langsung 202 + job id
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", 32))
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", 600))  # detik hasil job disimpan untuk polling
+# host yang boleh jadi tujuan callback_url (koma); default hanya host Laravel
+JOB_CALLBACK_HOSTS = os.getenv("JOB_CALLBACK_HOSTS", urlsplit(LARAVEL_API_URL).hostname or "").split(",")
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.sqlite")  # status job dibagi semua worker gunicorn
+ANPR_WARMUP = os.getenv("ANPR_WARMUP", "1") == "1"  # dummy inference sebelum ready
+ANPR_BACKGROUND_INIT = os.getenv("ANPR_BACKGROUND_INIT", "1") == "1"  # HTTP (live) sudah jalan saat model dimuat
+ANPR_WORKER_THREADS = int(os.getenv("ANPR_WORKER_THREADS", 0))  # intra-op thread per proses, 0 = default library
+CLIENT_MIN_INTERVAL = float(os.getenv("CLIENT_MIN_INTERVAL", 0.5))  # detik, batas bawah saran interval kirim kamera
 
 # Initialize Flask
 app = Flask(__name__)
@@ -27,27 +50,151 @@ app = Flask(__name__)
 yolo_model = None
 ocr_model = None
 
-def initialize_models():
+# Laravel forwarder (pooled session + on-disk outbox); flusher thread starts in __main__
+forwarder = LaravelForwarder(
+    f"{LARAVEL_API_URL.rstrip('/')}/anpr/result",
+    token=ANPR_TOKEN,
+    batch_url=f"{LARAVEL_API_URL.rstrip('/')}/{LARAVEL_BATCH_PATH.lstrip('/')}" if LARAVEL_BATCH_PATH else None
+)
+
+
+def _fetch_parked_plates():
+    r = forwarder.session.get(f"{LARAVEL_API_URL.rstrip('/')}/{RECONCILE_PARKED_PATH.lstrip('/')}",
+                              timeout=forwarder.timeout)
+    r.raise_for_status()
+    return r.json()["data"]["plates"]
+
+
+# Plates currently parked, for matching exit reads to entry reads (rebuilt from Laravel)
+parked = ParkedIndex(fetch=_fetch_parked_plates)
+
+# Near-duplicate frame cache (per webcam_index)
+frame_cache = FrameResultCache()
+
+# Async job queue (workers start lazily on first async request)
+jobs = JobManager(workers=JOB_WORKERS, max_queue=JOB_QUEUE_MAX, result_ttl=JOB_RESULT_TTL,
+                  callback_hosts=JOB_CALLBACK_HOSTS, store_path=JOB_STORE_PATH)
+
+# Metrics (/metrics); pipeline stages are recorded in anpr_bisa, these are read at scrape time
+HTTP_REQUESTS = REGISTRY.counter("anpr_http_requests_total", "HTTP requests by route and status", ["route", "status"])
+HTTP_SECONDS = REGISTRY.histogram("anpr_http_request_seconds", "HTTP request latency by route", ["route"])
+REGISTRY.gauge("anpr_job_queue_depth", "Async jobs waiting for a worker",
+               fn=lambda: jobs.stats()["queue_depth"])
+REGISTRY.gauge("anpr_jobs_total", "Async jobs by outcome", ["outcome"], kind="counter",
+               fn=lambda: {(k,): v for k, v in jobs.stats().items() if k in ("completed", "failed", "rejected")})
+REGISTRY.gauge("anpr_forwarder_events_total", "Laravel forwarder events by result", ["result"], kind="counter",
+               fn=lambda: {(k,): v for k, v in forwarder.snapshot().items() if isinstance(v, int)})
+REGISTRY.gauge("anpr_outbox_events", "Events in the Laravel outbox by status", ["status"],
+               fn=lambda: {(k,): v for k, v in forwarder.outbox.counts().items()})
+REGISTRY.gauge("anpr_frame_cache_lookups_total", "Near-duplicate frame cache lookups", ["result"], kind="counter",
+               fn=lambda: {("hit",): frame_cache.hits, ("miss",): frame_cache.misses})
+REGISTRY.gauge("anpr_ready", "1 once models are loaded and warmed up", fn=lambda: int(startup["ready"]))
+REGISTRY.gauge("anpr_parked_plates", "Plates in the entry/exit reconciliation index", fn=lambda: len(parked))
+REGISTRY.gauge("anpr_reconcile_lookups_total", "Exit read lookups in the parked plate index by result", ["result"],
+               kind="counter", fn=lambda: {(k,): parked.stats[k] for k in ("exact", "fuzzy", "ambiguous", "miss")})
+REGISTRY.gauge("anpr_streams_active", "Open /stream camera connections", fn=lambda: len(active_streams))
+STREAM_FRAMES = REGISTRY.counter("anpr_stream_frames_total", "Frames received on /stream by outcome", ["result"])
+BATCH_IMAGES = REGISTRY.counter("anpr_batch_images_total", "Images processed by /process_batch by outcome", ["result"])
+
+active_streams = set()  # StreamSession objects with an open connection
+
+# Startup phases; /health/ready only turns 200 after warm-up so rolling restarts keep routing
+# gate traffic to the old instance until this one answers fast.
+startup = {
+    "phase": "starting",
+    "ready": False,
+    "started_at": time.time(),
+    "timings": {},
+    "pid": os.getpid(),
+}
+
+
+def load_models():
+    """
+    Import frameworks and load weights without running inference. Under gunicorn this runs
+    once in the master before fork (gunicorn.conf.py), so workers share the weight pages.
+    """
     global yolo_model, ocr_model
+    timings = startup["timings"]
+    startup["phase"] = "loading"
+    yolo_model, ocr_model = setup_models(timings)
+    logger.info(f"Startup: import {timings.get('import_s', 0):.2f}s, "
+                f"YOLO load {timings.get('yolo_load_s', 0):.2f}s, OCR load {timings.get('ocr_load_s', 0):.2f}s")
+    if yolo_model is None:
+        logger.warning("YOLO model not loaded.")
+    if ocr_model is None:
+        logger.warning("PaddleOCR model not loaded.")
+
+
+def prepare_worker():
+    """Per-process part of startup: thread pinning, warm-up, micro-batching, readiness."""
+    global yolo_model
+    timings = startup["timings"]
+    pin_threads(ANPR_WORKER_THREADS)
+    if ANPR_WARMUP:
+        startup["phase"] = "warming"
+        timings["warmup_s"] = warmup_models(yolo_model, ocr_model)
+        logger.info(f"Startup: warm-up {timings['warmup_s']:.2f}s")
+
+    if yolo_model is not None and YOLO_BATCH_MAX > 1:
+        # concurrent requests share YOLO forward passes
+        yolo_model = BatchingDetector(yolo_model, YOLO_BATCH_MAX, YOLO_BATCH_WAIT_MS)
+        logger.info(f"YOLO micro-batching on: max_batch={YOLO_BATCH_MAX}, max_wait={YOLO_BATCH_WAIT_MS}ms")
+
+    timings["total_s"] = time.time() - startup["started_at"]
+    startup["ready"] = (yolo_model is not None) and (ocr_model is not None)
+    startup["phase"] = "ready" if startup["ready"] else "failed"
+    logger.info(f"Startup {startup['phase']} after {timings['total_s']:.2f}s (pid {os.getpid()})")
+
+
+def initialize_models():
+    """Single-process startup (python anpr_api_server.py)."""
     try:
-        yolo_model, ocr_model = setup_models()
-        if yolo_model is None:
-            logger.warning("YOLO model not loaded.")
-        if ocr_model is None:
-            logger.warning("PaddleOCR model not loaded.")
+        load_models()
+        prepare_worker()
     except Exception as e:
         logger.exception(f"Failed initialize_models: {e}")
+        startup["phase"] = "failed"
+
+
+def init_worker():
+    """gunicorn post_fork hook: finish startup inside a freshly forked worker."""
+    global yolo_model
+    startup["pid"] = os.getpid()
+    try:
+        if yolo_model is None and ocr_model is None:
+            load_models()  # ANPR_PRELOAD=0: every worker loads its own copy
+        elif yolo_model is not None and YOLO_BACKEND != "torch":
+            # ONNX Runtime thread pools do not survive fork; the session is small, rebuild it here
+            yolo_model = load_detector(YOLO_MODEL_PATH)
+        prepare_worker()
+    except Exception as e:
+        logger.exception(f"Failed init_worker: {e}")
+        startup["phase"] = "failed"
+    forwarder.start()
+    if RECONCILE:
+        parked.start()
+    REGISTRY.start_writer()
+
 
-def send_to_laravel_api(plate_number, webcam_index=1, image_bytes=None, timestamp=None, slot_name=None):
+def _not_ready():
+    resp = jsonify({"success": False, "message": f"models not ready ({startup['phase']})"})
+    resp.headers["Retry-After"] = "2"
+    return resp, 503
+
+
+def send_to_laravel_api(plate_number, webcam_index=1, image_bytes=None, timestamp=None, slot_name=None, bbox=None):
     """
-    Sends recognized plate to Laravel backend.
+    Sends recognized plate to Laravel backend through the pooled forwarder.
     Args:
         plate_number: Nomor plat (format: BA3242CD)
         webcam_index: 1 untuk masuk, 2 untuk keluar
         image_bytes: Raw image bytes (optional)
         timestamp: Unix timestamp (optional, akan use server time jika None)
+        bbox: plate box in image_bytes, used by EVIDENCE_IMAGE=crop
     
-    Returns (success_bool, response_json_or_text)
+    Returns (success_bool, response_json_or_text). If Laravel is down the event goes to
+    the outbox and is replayed later: (False, {"queued": True, "outbox_id": ...}).
     """
     try:
         payload = {
@@ -56,79 +203,202 @@ def send_to_laravel_api(plate_number, webcam_index=1, image_bytes=None, timestam
             "timestamp": timestamp or time.time()
         }
         if image_bytes:
-            import base64
-            payload["image_base64"] = base64.b64encode(image_bytes).decode("utf-8")
-
-        headers = {
-            "Authorization": f"Bearer {ANPR_TOKEN}",
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
-
-        url = f"{LARAVEL_API_URL.rstrip('/')}/anpr/result"
-        logger.info(f"Posting to Laravel {url} | plate={plate_number} | webcam={webcam_index}")
+            with STAGE_SECONDS.time(stage="evidence"):
+                attach_evidence(payload, evidence_jpeg(image_bytes=image_bytes, bbox=bbox))
         if slot_name:
             payload['slot_name'] = slot_name
-        r = requests.post(url, json=payload, headers=headers, timeout=30)
-        
-        if r.status_code in (200, 201):
-            try:
-                return True, r.json()
-            except Exception:
-                return True, r.text
-        else:
-            logger.error(f"Laravel responded {r.status_code}: {r.text}")
-            return False, r.text
+        if RECONCILE:
+            reconcile_plate(payload)
+
+        logger.info(f"Posting to Laravel {forwarder.url} | plate={plate_number} | webcam={webcam_index}")
+        with STAGE_SECONDS.time(stage="laravel_post"):
+            sent, r = forwarder.send(payload)
+        if sent and "canonical_plate" in payload:
+            # Laravel closed the entry; a queued or rejected exit leaves the car parked until it does
+            parked.remove(payload["canonical_plate"])
+        return sent, r
     except Exception as e:
         logger.exception(f"Error sending to Laravel: {e}")
         return False, str(e)
 
 
-def process_camera_image(image_data):
+def reconcile_plate(payload):
+    """
+    Entry reads join the parked plate index; an exit read gets the nearest parked plate as
+    canonical_plate (with plate_distance), so Laravel finds the entry despite one misread character.
+    The canonical plate leaves the index in send_to_laravel_api, once Laravel has the exit.
+    """
+    if payload["webcam_index"] == 1:
+        parked.add(payload["plate"])
+    elif payload["webcam_index"] == 2:
+        with STAGE_SECONDS.time(stage="reconcile"):
+            canonical, distance = parked.match(payload["plate"])
+        if canonical is not None:
+            if canonical != payload["plate"]:
+                logger.info(f"Exit read {payload['plate']} reconciled to {canonical} (distance {distance})")
+            payload["canonical_plate"] = canonical
+            payload["plate_distance"] = distance
+
+
+def _best_plate(plates):
+    """Choose best by combined (detection_confidence * recognition_confidence)."""
+    if not plates:
+        return None, "no plate detected"
+    best = None
+    best_score = 0.0
+    for p in plates:
+        det = p.get("detection_confidence", 0.0)
+        rec = p.get("confidence", 0.0)
+        score = det * rec
+        if score > best_score:
+            best_score = score
+            best = p
+    if best:
+        return best.get("text"), best
+    else:
+        return None, "no confident plate"
+
+
+def process_camera_image(image_data, camera=None, slot_name=None):
     """
     Decode bytes from ESP32 and run ANPR pipeline. Returns (plate_text or None, details or error string)
+    camera: webcam_index, used for per-camera preprocessing statistics and the near-duplicate frame cache
+            (a cache hit returns the earlier plate with details["cached"] = True). A new plate comes
+            back with details["frame_hash"]; the caller caches it once the plate has been forwarded.
+    slot_name: with camera selects the detector profile (camera_profiles.json)
     """
     global yolo_model, ocr_model
     try:
-        nparr = np.frombuffer(image_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if img is None:
+        profile = camera_profiles().get(camera, slot_name)
+        with STAGE_SECONDS.time(stage="decode"):
+            frame = decode_frame(image_data, target=profile.imgsz, roi=profile.rect)
+        if frame is None:
             return None, "cannot decode image"
+        img = frame.image
 
-        plates = process_image_from_array(img, yolo_model, ocr_model)
-        if not plates:
-            return None, "no plate detected"
-        # choose best by combined (detection_confidence * recognition_confidence)
-        best = None
-        best_score = 0.0
-        for p in plates:
-            det = p.get("detection_confidence", 0.0)
-            rec = p.get("confidence", 0.0)
-            score = det * rec
-            if score > best_score:
-                best_score = score
-                best = p
-        if best:
-            return best.get("text"), best
-        else:
-            return None, "no confident plate"
+        frame_hash = None
+        if FRAME_CACHE and camera is not None:
+            # hash what the detector sees: a passer-by outside the ROI must not defeat the cache,
+            # and changes inside it (a new car) must
+            frame_hash = dhash(profile.crop(img)[0])
+            cached = frame_cache.get(camera, frame_hash)
+            if cached is not None:
+                plate_text, meta = cached
+                return plate_text, dict(meta, cached=True) if plate_text else meta
+
+        with STAGE_SECONDS.time(stage="pipeline"):
+            plates = process_image_from_array(img, yolo_model, ocr_model, camera=camera, frame=frame, profile=profile)
+        plate_text, meta = _best_plate(plates)
+        if frame_hash is not None:
+            if plate_text:
+                meta["frame_hash"] = frame_hash
+            else:
+                frame_cache.put(camera, frame_hash, (plate_text, meta))
+        return plate_text, meta
     except Exception as e:
         logger.exception("process_camera_image error")
         return None, str(e)
 
 
+# recent per-frame cost and frames in progress, for the send interval suggested to cameras
+_load_lock = threading.Lock()
+_load = {"inflight": 0, "ewma_s": 0.0}
+
+
+def suggested_interval():
+    """
+    Seconds a camera should wait before its next frame: recent per-frame latency times the
+    work already in progress or queued. Sent as X-Suggested-Interval on /process_image responses.
+    """
+    with _load_lock:
+        ewma, inflight = _load["ewma_s"], _load["inflight"]
+    return round(max(CLIENT_MIN_INTERVAL, ewma * (1 + inflight + jobs.stats()["queue_depth"])), 2)
+
+
+def run_anpr_job(img_bytes, webcam_index, timestamp=None, slot_name=None):
+    """
+    ANPR + Laravel forwarding for one image. Shared by sync and async modes.
+    Returns (result_dict, http_status).
+    """
+    with _load_lock:
+        _load["inflight"] += 1
+    t0 = time.perf_counter()
+    try:
+        return _run_anpr_job(img_bytes, webcam_index, timestamp, slot_name)
+    finally:
+        elapsed = time.perf_counter() - t0
+        with _load_lock:
+            _load["inflight"] -= 1
+            _load["ewma_s"] = elapsed if not _load["ewma_s"] else 0.8 * _load["ewma_s"] + 0.2 * elapsed
+
+
+def _run_anpr_job(img_bytes, webcam_index, timestamp, slot_name):
+    plate_text, meta = process_camera_image(img_bytes, camera=webcam_index, slot_name=slot_name)
+    frame_hash = meta.pop("frame_hash", None) if plate_text else None
+    if not plate_text:
+        return {"success": True, "message": "no plate detected", "data": meta}, 200
+    if meta.get("cached"):
+        # same car still in front of the gate: its event was already forwarded
+        return {"success": True, "plate": plate_text, "webcam_index": webcam_index, "cached": True,
+                "message": "duplicate frame, not forwarded again"}, 200
+
+    # Send to Laravel dengan webcam_index
+    sent, r = send_to_laravel_api(plate_text, webcam_index=webcam_index, image_bytes=img_bytes,
+                                  timestamp=timestamp, slot_name=slot_name, bbox=meta.get("bbox"))
+
+    queued = isinstance(r, dict) and r.get("queued")
+    if frame_hash is not None and (sent or queued):
+        # only a delivered (or queued) event may turn the next near-identical frame into a duplicate
+        frame_cache.put(webcam_index, frame_hash, (plate_text, meta))
+    result = {
+        "success": sent or bool(queued),
+        "plate": plate_text,
+        "webcam_index": webcam_index,
+        "laravel_response": r
+    }
+    if queued:
+        result["queued"] = True
+        return result, 202
+    status = 200 if sent else 500
+    return result, status
+
+
+@app.before_request
+def _start_timer():
+    g.t0 = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    HTTP_REQUESTS.inc(route=route, status=response.status_code)
+    if "t0" in g:
+        HTTP_SECONDS.observe(time.perf_counter() - g.t0, route=route)
+    if request.endpoint == "process_image_endpoint" and "Retry-After" not in response.headers:
+        response.headers["X-Suggested-Interval"] = str(suggested_interval())
+    return response
+
+
+def _param(name, default=None, type=None):
+    return request.args.get(name, request.form.get(name, default), type=type)
+
+
 @app.route("/process_image", methods=["POST"])
 def process_image_endpoint():
     """
     Accepts image bytes with webcam_index parameter.
     Query params or POST data:
       - webcam_index: 1 (masuk) atau 2 (keluar)
+      - async: 1 untuk langsung balas 202 + job_id (default dari ANPR_ASYNC)
+      - callback_url: (async) URL yang di-POST hasil job saat selesai (host harus ada di JOB_CALLBACK_HOSTS)
     
     Returns JSON dengan plate dan Laravel response status.
     """
+    if not startup["ready"]:
+        return _not_ready()
     try:
         # Get webcam index (required)
-        webcam_index = request.args.get('webcam_index', request.form.get('webcam_index', 1), type=int)
+        webcam_index = _param('webcam_index', 1, type=int)
         if webcam_index not in (1, 2):
             return jsonify({"success": False, "message": "webcam_index harus 1 atau 2"}), 400
 
@@ -143,23 +413,29 @@ def process_image_endpoint():
         if not img_bytes or len(img_bytes) == 0:
             return jsonify({"success": False, "message": "no image data"}), 400
 
-        # Process ANPR
-        plate_text, meta = process_camera_image(img_bytes)
-        if not plate_text:
-            return jsonify({"success": True, "message": "no plate detected", "data": meta}), 200
-
-        # Send to Laravel dengan webcam_index
-        timestamp = request.args.get('timestamp', request.form.get('timestamp'), type=float)
-        sent, r = send_to_laravel_api(plate_text, webcam_index=webcam_index, 
-                          image_bytes=img_bytes, timestamp=timestamp, slot_name=request.args.get('slot_name', request.form.get('slot_name')))
-        
-        result = {
-            "success": sent,
-            "plate": plate_text,
-            "webcam_index": webcam_index,
-            "laravel_response": r
-        }
-        status = 200 if sent else 500
+        timestamp = _param('timestamp', type=float)
+        slot_name = _param('slot_name')
+        use_async = _param('async', '1' if ANPR_ASYNC else '0') == '1'
+
+        if use_async:
+            jobs.start()
+            try:
+                job_id = jobs.submit(run_anpr_job, img_bytes, webcam_index, timestamp, slot_name,
+                                     callback_url=_param('callback_url'))
+            except CallbackNotAllowed as e:
+                return jsonify({"success": False, "message": str(e)}), 400
+            except QueueFull:
+                resp = jsonify({"success": False, "message": "job queue full", "queue": jobs.stats()})
+                resp.headers["Retry-After"] = "1"
+                return resp, 503
+            return jsonify({
+                "success": True,
+                "job_id": job_id,
+                "status_url": f"/jobs/{job_id}",
+                "webcam_index": webcam_index
+            }), 202
+
+        result, status = run_anpr_job(img_bytes, webcam_index, timestamp, slot_name)
         return jsonify(result), status
 
     except Exception as e:
@@ -167,18 +443,217 @@ def process_image_endpoint():
         return jsonify({"success": False, "message": str(e)}), 500
 
 
+def process_stream_frame(lane, data, final=False):
+    """
+    One frame of a /stream connection: detection + tracker, OCR only for tracks that want a
+    read, then debounced per-vehicle events forwarded to Laravel. Returns event dicts for the client.
+    """
+    if data is not None:
+        profile = camera_profiles().get(lane.webcam_index, lane.slot_name)
+        with STAGE_SECONDS.time(stage="decode"):
+            frame = decode_frame(data, target=profile.imgsz, roi=profile.rect)
+        if frame is not None:
+            with STAGE_SECONDS.time(stage="detect"):
+                boxes = detect_plate_boxes(frame.image, yolo_model, profile)
+            tracks = lane.tracker.update(boxes)
+            to_read = [t for t in tracks if lane.tracker.wants_read(t)]
+            if to_read:
+                crops = frame.crops([t.bbox for t in to_read])
+                picks = recognize_plates([c for c, _ in crops], ocr_model, camera=lane.webcam_index,
+                                         variants=profile.preprocs)
+                for track, (text, conf, _, _, _) in zip(to_read, picks):
+                    lane.tracker.add_read(track, text, conf, evidence=(data, frame))
+
+    # final: the client is gone, every open track is flushed as if it had left the frame
+    now = time.time() + lane.tracker.max_age + 1.0 if final else None
+    out = []
+    for event in lane.pop_events(now):
+        # evidence: the frame of this vehicle's best read, not whatever was detected last
+        image_bytes, bbox = None, None
+        if event["evidence"] is not None:
+            image_bytes, ev_frame = event["evidence"]
+            bbox = list(ev_frame.to_full(event["evidence_bbox"]))
+        sent, r = send_to_laravel_api(event["plate"], webcam_index=lane.webcam_index, image_bytes=image_bytes,
+                                      slot_name=lane.slot_name, bbox=bbox)
+        out.append({
+            "type": "plate",
+            "plate": event["plate"],
+            "track_id": event["track_id"],
+            "agreement": round(event["agreement"], 3),
+            "reads": event["reads"],
+            "bbox": bbox,
+            "webcam_index": lane.webcam_index,
+            "sent": sent,
+            "queued": bool(isinstance(r, dict) and r.get("queued")),
+        })
+    return out
+
+
+@app.route("/stream", methods=["POST"])
+def stream_endpoint():
+    """
+    Long-lived camera stream: chunked multipart/x-mixed-replace body (one JPEG per part),
+    NDJSON events back on the same connection (see anpr_stream). Query params: webcam_index,
+    slot_name. Frames that arrive while the previous one is still processing are dropped.
+    Needs the gthread worker class (gunicorn.conf.py default; a sync worker is killed after the
+    timeout); the streams of one worker share its models, one YOLO / OCR call at a time (INFERENCE_LOCK).
+    """
+    if not startup["ready"]:
+        return _not_ready()
+    webcam_index = request.args.get("webcam_index", 1, type=int)
+    if webcam_index not in (1, 2):
+        return jsonify({"success": False, "message": "webcam_index harus 1 atau 2"}), 400
+    lane = StreamLane(webcam_index, request.args.get("slot_name"))
+    session = StreamSession(request.stream, lambda data, final: process_stream_frame(lane, data, final),
+                            boundary=boundary_from_content_type(request.content_type))
+
+    def generate():
+        active_streams.add(session)
+        logger.info(f"Stream opened: webcam {webcam_index}")
+        try:
+            for line in session.events():
+                yield line
+        finally:
+            active_streams.discard(session)
+            STREAM_FRAMES.inc(session.processed, result="processed")
+            STREAM_FRAMES.inc(session.slot.dropped, result="dropped")
+            logger.info(f"Stream closed: webcam {webcam_index} {session.stats()}")
+
+    return Response(generate(), mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
+def process_batch_image(data, webcam_index=None, slot_name=None, forward=False, timestamp=None):
+    """
+    One image of a /process_batch request: all plates found, the best one, and the Laravel
+    result only when forward is set. No frame cache, so archived near-duplicates are all read.
+    """
+    try:
+        profile = camera_profiles().get(webcam_index, slot_name)
+        with STAGE_SECONDS.time(stage="decode"):
+            frame = decode_frame(data, target=profile.imgsz, roi=profile.rect)
+        if frame is None:
+            raise ValueError("cannot decode image")
+        with STAGE_SECONDS.time(stage="pipeline"):
+            plates = process_image_from_array(frame.image, yolo_model, ocr_model, camera=webcam_index,
+                                              frame=frame, profile=profile)
+    except Exception:
+        BATCH_IMAGES.inc(result="error")
+        raise
+    plate_text, best = _best_plate(plates)
+    result = {"plate": plate_text, "plates": plates}
+    if forward and plate_text:
+        sent, r = send_to_laravel_api(plate_text, webcam_index=webcam_index or 1, image_bytes=data,
+                                      timestamp=timestamp, slot_name=slot_name, bbox=best.get("bbox"))
+        result["sent"] = sent
+        result["queued"] = bool(isinstance(r, dict) and r.get("queued"))
+    BATCH_IMAGES.inc(result="plate" if plate_text else "no_plate")
+    return result
+
+
+@app.route("/process_batch", methods=["POST"])
+def process_batch_endpoint():
+    """
+    Many images in one request: multipart/form-data (any number of files), or a tar / zip archive
+    as the body. One NDJSON line per image as soon as it is done, then a summary line (see anpr_batch).
+    Query params:
+      - forward: 1 to also send each best plate to Laravel (default 0: results only, no side effect)
+      - webcam_index, slot_name: detector profile and, with forward=1, the gate the plates belong to
+      - timestamp: (forward) event time for every image, default server time
+    """
+    if not startup["ready"]:
+        return _not_ready()
+    webcam_index = request.args.get("webcam_index", type=int)
+    if webcam_index not in (None, 1, 2):
+        return jsonify({"success": False, "message": "webcam_index harus 1 atau 2"}), 400
+    slot_name = request.args.get("slot_name")
+    forward = request.args.get("forward", "0") == "1"
+    timestamp = request.args.get("timestamp", type=float)
+    try:
+        items = iter_batch_images(request.content_type, request.stream)
+    except BatchError as e:
+        return jsonify({"success": False, "message": str(e)}), 415
+
+    def process(name, data):
+        return process_batch_image(data, webcam_index, slot_name, forward, timestamp)
+
+    logger.info(f"Batch started: {request.mimetype} forward={forward} webcam={webcam_index}")
+    return Response(run_batch(items, process), mimetype="application/x-ndjson",
+                    headers={"X-Accel-Buffering": "no"})
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "job not found"}), 404
+    return jsonify({"success": True, "job": job}), 200
+
+
+@app.route("/jobs", methods=["GET"])
+def job_queue_stats():
+    return jsonify({"success": True, "queue": jobs.stats()}), 200
+
+
+@app.route("/evidence/<sha256>", methods=["GET"])
+def evidence(sha256):
+    """Content-addressed evidence image (EVIDENCE_TRANSPORT=store): Laravel fetches it on demand."""
+    data = default_store().get(sha256)
+    if data is None:
+        return jsonify({"success": False, "message": "evidence not found"}), 404
+    resp = Response(data, mimetype="image/jpeg")
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return resp
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus text format; under gunicorn aggregated over all workers (METRICS_DIR)."""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/health/live", methods=["GET"])
+def health_live():
+    """Process is up and serving HTTP (models may still be loading)."""
+    return jsonify({"success": True, "phase": startup["phase"]}), 200
+
+
+@app.route("/health/ready", methods=["GET"])
+def health_ready():
+    """200 only once models are loaded and warmed up; 503 otherwise."""
+    body = {"success": startup["ready"], "phase": startup["phase"], "pid": startup["pid"],
+            "timings": startup["timings"]}
+    if not startup["ready"]:
+        return jsonify(body), 503
+    return jsonify(body), 200
+
+
 @app.route("/health", methods=["GET"])
 def health():
     return jsonify({
         "success": True,
         "models_loaded": (yolo_model is not None) and (ocr_model is not None),
+        "ready": startup["ready"],
+        "startup": startup,
         "yolo_path": MODEL_YOLO_PATH,
         "ocr_dir": MODEL_OCR_DIR,
+        "preprocessing_stats": preproc_stats.snapshot(),
+        "job_queue": jobs.stats(),
+        "forwarder": forwarder.snapshot(),
+        "frame_cache": frame_cache.stats(),
+        "reconcile": parked.snapshot() if RECONCILE else None,
+        "camera_profiles": camera_profiles().snapshot(),
+        "yolo_batching": yolo_model.stats() if isinstance(yolo_model, BatchingDetector) else None,
         "timestamp": time.time()
     }), 200
 
 
 if __name__ == "__main__":
-    initialize_models()
+    if ANPR_BACKGROUND_INIT:
+        threading.Thread(target=initialize_models, name="model-init", daemon=True).start()
+    else:
+        initialize_models()
+    forwarder.start()
+    if RECONCILE:
+        parked.start()
     # Run Flask app
     app.run(host="0.0.0.0", port=int(os.getenv("ANPR_PORT", 5000)), debug=False)
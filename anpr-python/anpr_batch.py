@@ -0,0 +1,155 @@
+# anpr_batch.py
+"""
+Pemrosesan banyak gambar dalam satu request (POST /process_batch) untuk re-run arsip snapshot.
+Input: multipart/form-data (banyak file, di-parse bertahap dari stream), application/x-tar (dibaca streaming, entry per entry)
+atau application/zip (zip butuh seek: di-spool ke file sementara dulu).
+Gambar dibaca satu per satu dan diproses oleh BATCH_WORKERS thread; paling banyak
+BATCH_WORKERS * 2 gambar ada di memori sekaligus. Tiap gambar menghasilkan satu baris NDJSON
+begitu selesai (urutan selesai, bukan urutan input; lihat "index"), diakhiri baris "summary".
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import tarfile
+import zipfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, File, MultipartDecoder, NeedData
+
+logger = logging.getLogger("anpr_batch")
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", os.getenv("JOB_WORKERS", 2)))
+BATCH_MAX_IMAGE_BYTES = int(os.getenv("BATCH_MAX_IMAGE_BYTES", 20 * 1024 * 1024))
+BATCH_ZIP_SPOOL_BYTES = int(os.getenv("BATCH_ZIP_SPOOL_BYTES", 32 * 1024 * 1024))  # di atas ini zip di-spool ke disk
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+class BatchError(Exception):
+    pass
+
+
+def _is_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _iter_tar(stream):
+    with tarfile.open(fileobj=stream, mode="r|*") as tf:  # pipe mode: no seeking, one member at a time
+        for member in tf:
+            if not member.isfile() or not _is_image(member.name):
+                continue
+            if member.size > BATCH_MAX_IMAGE_BYTES:
+                yield member.name, BatchError(f"{member.size} bytes exceeds BATCH_MAX_IMAGE_BYTES")
+                continue
+            yield member.name, tf.extractfile(member).read()
+
+
+def _iter_zip(stream):
+    with tempfile.SpooledTemporaryFile(max_size=BATCH_ZIP_SPOOL_BYTES) as spool:
+        shutil.copyfileobj(stream, spool, 1024 * 1024)
+        spool.seek(0)
+        with zipfile.ZipFile(spool) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not _is_image(info.filename):
+                    continue
+                if info.file_size > BATCH_MAX_IMAGE_BYTES:
+                    yield info.filename, BatchError(f"{info.file_size} bytes exceeds BATCH_MAX_IMAGE_BYTES")
+                    continue
+                yield info.filename, zf.read(info)
+
+
+def _iter_multipart(stream, boundary):
+    """Incremental multipart parse: one file part in memory at a time, text fields are ignored."""
+    decoder = MultipartDecoder(boundary.encode())
+    name, parts, size = None, [], 0
+    while True:
+        chunk = stream.read(64 * 1024)
+        decoder.receive_data(chunk or None)
+        event = decoder.next_event()
+        while not isinstance(event, NeedData):
+            if isinstance(event, File):
+                name, parts, size = event.filename or event.name, [], 0
+            elif isinstance(event, Data) and name is not None:
+                size += len(event.data)
+                if size <= BATCH_MAX_IMAGE_BYTES:
+                    parts.append(event.data)
+                if not event.more_data:
+                    if size > BATCH_MAX_IMAGE_BYTES:
+                        yield name, BatchError(f"{size} bytes exceeds BATCH_MAX_IMAGE_BYTES")
+                    else:
+                        yield name, b"".join(parts)
+                    name, parts = None, []
+            elif isinstance(event, Epilogue):
+                return
+            event = decoder.next_event()
+        if not chunk:
+            raise BatchError("multipart body ended before the closing boundary")
+
+
+def iter_batch_images(content_type, stream):
+    """(name, bytes or BatchError) for every image of the request body, read lazily from stream."""
+    content_type, options = parse_options_header(content_type or "")
+    content_type = content_type.lower()
+    if content_type in ("application/x-tar", "application/tar", "application/x-gtar", "application/gzip",
+                        "application/x-gzip"):
+        return _iter_tar(stream)
+    if content_type in ("application/zip", "application/x-zip-compressed"):
+        return _iter_zip(stream)
+    if content_type == "multipart/form-data" and options.get("boundary"):
+        return _iter_multipart(stream, options["boundary"])
+    raise BatchError(f"unsupported batch content type {content_type!r} (multipart/form-data, tar or zip)")
+
+
+def run_batch(items, process, workers=None):
+    """
+    Generator of NDJSON lines. process(name, data) -> dict, run on a thread pool with a bounded
+    number of images in flight; each line is the dict plus index, name and elapsed_ms.
+    """
+    workers = workers or BATCH_WORKERS
+    window = workers * 2
+    started = time.perf_counter()
+    counts = {"images": 0, "errors": 0, "plates": 0}
+
+    def run_one(index, name, data):
+        t0 = time.perf_counter()
+        if isinstance(data, Exception):
+            result = {"error": str(data)}
+        else:
+            try:
+                result = process(name, data)
+            except Exception as e:
+                logger.warning(f"batch item {name} failed: {e}")
+                result = {"error": str(e)}
+        result.update({"type": "result", "index": index, "name": name,
+                       "elapsed_ms": round(1000.0 * (time.perf_counter() - t0), 1)})
+        return result
+
+    def line(result):
+        counts["images"] += 1
+        if "error" in result:
+            counts["errors"] += 1
+        counts["plates"] += len(result.get("plates") or [])
+        return json.dumps(result) + "\n"
+
+    pending = set()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        try:
+            for index, (name, data) in enumerate(items):
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        yield line(fut.result())
+                pending.add(pool.submit(run_one, index, name, data))
+        except Exception as e:  # broken archive / client disconnect mid-body
+            logger.warning(f"batch input stopped: {e}")
+            counts["input_error"] = str(e)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield line(fut.result())
+    counts["elapsed_s"] = round(time.perf_counter() - started, 3)
+    yield json.dumps(dict(counts, type="summary")) + "\n"
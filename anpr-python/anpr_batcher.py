@@ -0,0 +1,109 @@
+# anpr_batcher.py
+"""
+Dynamic micro-batching for the YOLO plate detector.
+BatchingDetector wraps a loaded ultralytics model and is called exactly like it
+(`detector(img, conf=...)` -> list of Results), so anpr_bisa does not need to know.
+Concurrent callers are parked for at most max_wait_ms (or until max_batch frames are
+waiting); the frames then go through the model as one batch and each caller gets its
+own Results back.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+
+logger = logging.getLogger("anpr_batcher")
+
+YOLO_BATCH_MAX = int(os.getenv("YOLO_BATCH_MAX", 1))  # 1 = micro-batching off
+YOLO_BATCH_WAIT_MS = float(os.getenv("YOLO_BATCH_WAIT_MS", 5))
+
+
+class _Pending:
+    __slots__ = ("img", "kwargs", "event", "result", "error", "enqueued")
+
+    def __init__(self, img, kwargs):
+        self.img = img
+        self.kwargs = kwargs
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.enqueued = time.perf_counter()
+
+
+class BatchingDetector:
+    thread_safe = True  # every forward pass runs on the batcher thread
+
+    def __init__(self, model, max_batch=None, max_wait_ms=None):
+        self.model = model
+        self.max_batch = max_batch or YOLO_BATCH_MAX
+        self.max_wait = (YOLO_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._frames = 0
+        self._wait_total = 0.0
+        self._thread = threading.Thread(target=self._run, name="yolo-batcher", daemon=True)
+        self._thread.start()
+
+    def __call__(self, img, **kwargs):
+        item = _Pending(img, kwargs)
+        self._queue.put(item)
+        item.event.wait()
+        if item.error is not None:
+            raise item.error
+        return [item.result]
+
+    def __getattr__(self, name):
+        # model attributes (names, predictor, ...) stay reachable through the wrapper
+        return getattr(self.model, name)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self._batches,
+                "frames": self._frames,
+                "avg_batch": self._frames / self._batches if self._batches else 0.0,
+                "avg_queue_wait_ms": 1000.0 * self._wait_total / self._frames if self._frames else 0.0,
+            }
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            # callers with different predict kwargs (e.g. per-camera conf) cannot share a forward pass
+            groups = {}
+            for item in batch:
+                key = tuple(sorted(item.kwargs.items()))
+                groups.setdefault(key, []).append(item)
+            for key, items in groups.items():
+                try:
+                    results = self.model([it.img for it in items], **dict(key))
+                    for it, res in zip(items, results):
+                        it.result = res
+                except Exception as e:
+                    logger.exception("Batched YOLO inference failed")
+                    for it in items:
+                        it.error = e
+                for it in items:
+                    it.event.set()
+            with self._stats_lock:
+                self._batches += 1
+                self._frames += len(batch)
+                self._wait_total += sum(started - it.enqueued for it in batch)
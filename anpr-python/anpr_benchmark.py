@@ -0,0 +1,861 @@
+#!/usr/bin/env python3
+"""
+Benchmark script untuk pipeline ANPR (tanpa kamera / Laravel).
+
+Usage:
+    python anpr_benchmark.py ocr-batch --images images --repeat 3
+    python anpr_benchmark.py cascade --images images --repeat 5
+    python anpr_benchmark.py yolo-batch --images images --concurrency 1,2,4,8
+    python anpr_benchmark.py detector --images images --backends torch,onnx,onnx-int8
+    python anpr_benchmark.py serve --images images --workers 1,2,4,8 --duration 30
+    python anpr_benchmark.py accuracy --images images,anpr_test_images --json run.json --baseline base.json
+    python anpr_benchmark.py evidence --images images --repeat 20
+    python anpr_benchmark.py decode --images images --sizes 1920x1080,1280x720
+"""
+import os
+import sys
+import glob
+import time
+import json
+import argparse
+import logging
+import tempfile
+import threading
+import subprocess
+
+import cv2
+import numpy as np
+
+from anpr_bisa import setup_models, process_image_from_array, YOLO_CONF_THRESH, YOLO_MODEL_PATH, _xyxy_int_array_from_boxes
+from anpr_batcher import BatchingDetector
+from anpr_metrics import capture_samples
+from anpr_decode import decode_frame
+from anpr_profiles import DEFAULT_PROFILE, camera_profiles
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger("anpr_benchmark")
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_images(path):
+    """Load every image under a directory (or a single file / glob) as (name, BGR array)."""
+    if os.path.isdir(path):
+        files = sorted(f for f in glob.glob(os.path.join(path, "*")) if f.lower().endswith(IMAGE_EXTS))
+    else:
+        files = sorted(glob.glob(path))
+    images = []
+    for f in files:
+        img = cv2.imread(f)
+        if img is None:
+            logger.warning(f"cannot read {f}, skipping")
+            continue
+        images.append((f, img))
+    return images
+
+
+def _time_pipeline(images, yolo, ocr, repeat, **kwargs):
+    """Run process_image_from_array over all images `repeat` times. Returns (total_seconds, plates_found, results)."""
+    total = 0.0
+    plates = 0
+    results = {}
+    for _ in range(repeat):
+        for name, img in images:
+            t0 = time.perf_counter()
+            res = process_image_from_array(img, yolo, ocr, **kwargs)
+            total += time.perf_counter() - t0
+            plates += len(res)
+            results[name] = [p["text"] for p in res]
+    return total, plates, results
+
+
+def bench_ocr_batch(args):
+    """Compare legacy per-variant OCR loop vs single batched recognizer call."""
+    yolo, ocr = setup_models()
+    if yolo is None or ocr is None:
+        print("Models not loaded, abort")
+        return 1
+    images = load_images(args.images)
+    if not images:
+        print(f"No images found at {args.images}")
+        return 1
+
+    # warm-up so graph init does not land in the first measured mode
+    process_image_from_array(images[0][1], yolo, ocr, batch_ocr=True)
+    process_image_from_array(images[0][1], yolo, ocr, batch_ocr=False)
+
+    report = {}
+    for label, batch in (("loop", False), ("batch", True)):
+        total, plates, results = _time_pipeline(images, yolo, ocr, args.repeat, batch_ocr=batch)
+        report[label] = {
+            "total_s": total,
+            "frames": len(images) * args.repeat,
+            "plates": plates,
+            "ms_per_frame": 1000.0 * total / max(1, len(images) * args.repeat),
+            "ms_per_plate": 1000.0 * total / max(1, plates),
+            "results": results,
+        }
+
+    same = sum(1 for k in report["loop"]["results"] if report["loop"]["results"][k] == report["batch"]["results"].get(k))
+    print(f"{'mode':<8}{'frames':>8}{'plates':>8}{'ms/frame':>12}{'ms/plate':>12}")
+    for label in ("loop", "batch"):
+        r = report[label]
+        print(f"{label:<8}{r['frames']:>8}{r['plates']:>8}{r['ms_per_frame']:>12.1f}{r['ms_per_plate']:>12.1f}")
+    speedup = report["loop"]["ms_per_plate"] / max(1e-9, report["batch"]["ms_per_plate"])
+    print(f"per-plate speedup: {speedup:.2f}x | identical text on {same}/{len(images)} images")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def bench_cascade(args):
+    """
+    Full variant sweep vs early-exit cascade on one simulated camera.
+    Reports OCR passes per plate and whether the cascade changed any result.
+    """
+    yolo, ocr = setup_models()
+    if yolo is None or ocr is None:
+        print("Models not loaded, abort")
+        return 1
+    images = load_images(args.images)
+    if not images:
+        print(f"No images found at {args.images}")
+        return 1
+
+    report = {}
+    for label, cascade in (("full", False), ("cascade", True)):
+        total = 0.0
+        plates = 0
+        passes = 0
+        results = {}
+        for _ in range(args.repeat):
+            for name, img in images:
+                t0 = time.perf_counter()
+                res = process_image_from_array(img, yolo, ocr, camera="bench", cascade=cascade)
+                total += time.perf_counter() - t0
+                plates += len(res)
+                passes += sum(p.get("ocr_passes", 0) for p in res)
+                results[name] = [p["text"] for p in res]
+        report[label] = {
+            "ms_per_frame": 1000.0 * total / max(1, len(images) * args.repeat),
+            "plates": plates,
+            "avg_ocr_passes": passes / max(1, plates),
+            "results": results,
+        }
+
+    changed = [k for k in report["full"]["results"] if report["full"]["results"][k] != report["cascade"]["results"].get(k)]
+    print(f"{'mode':<10}{'plates':>8}{'ms/frame':>12}{'passes/plate':>14}")
+    for label in ("full", "cascade"):
+        r = report[label]
+        print(f"{label:<10}{r['plates']:>8}{r['ms_per_frame']:>12.1f}{r['avg_ocr_passes']:>14.2f}")
+    print(f"results changed by cascade on {len(changed)}/{len(images)} images")
+    for k in changed:
+        print(f"  {k}: {report['full']['results'][k]} -> {report['cascade']['results'].get(k)}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def _drive_detector(detect, images, concurrency, frames_per_client):
+    """Run `concurrency` client threads, each detecting frames_per_client frames. Returns frames/s."""
+    def client(offset):
+        for i in range(frames_per_client):
+            detect(images[(offset + i) % len(images)][1])
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return concurrency * frames_per_client / (time.perf_counter() - t0)
+
+
+def bench_yolo_batch(args):
+    """YOLO throughput vs concurrency: one call per frame (serialized) vs BatchingDetector."""
+    yolo, _ = setup_models()
+    if yolo is None:
+        print("YOLO not loaded, abort")
+        return 1
+    images = load_images(args.images)
+    if not images:
+        print(f"No images found at {args.images}")
+        return 1
+    yolo(images[0][1], conf=YOLO_CONF_THRESH, verbose=False)  # warm-up
+
+    # the plain model is not safe to call from several threads at once, so the baseline
+    # serializes calls the same way a single Flask process effectively does
+    lock = threading.Lock()
+
+    def direct(img):
+        with lock:
+            return yolo(img, conf=YOLO_CONF_THRESH, verbose=False)
+
+    batcher = BatchingDetector(yolo, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+
+    def batched(img):
+        return batcher(img, conf=YOLO_CONF_THRESH, verbose=False)
+
+    report = []
+    print(f"{'clients':>8}{'direct fps':>12}{'batched fps':>13}{'speedup':>9}{'avg batch':>11}")
+    for c in [int(x) for x in args.concurrency.split(",")]:
+        before = batcher.stats()
+        fps_direct = _drive_detector(direct, images, c, args.frames)
+        fps_batched = _drive_detector(batched, images, c, args.frames)
+        after = batcher.stats()
+        avg_batch = (after["frames"] - before["frames"]) / max(1, after["batches"] - before["batches"])
+        report.append({"concurrency": c, "direct_fps": fps_direct, "batched_fps": fps_batched, "avg_batch": avg_batch})
+        print(f"{c:>8}{fps_direct:>12.1f}{fps_batched:>13.1f}{fps_batched / fps_direct:>8.2f}x{avg_batch:>11.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def _box_iou(a, b):
+    iw = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    ih = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = iw * ih
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / float(union) if union > 0 else 0.0
+
+
+def _load_backend(name):
+    """torch | onnx | onnx-int8 | openvino -> (detector, load_seconds)"""
+    from anpr_detector import load_detector, OnnxPlateDetector, YOLO_ONNX_PATH, int8_path, export_onnx
+    t0 = time.perf_counter()
+    if name == "torch":
+        det = load_detector(YOLO_MODEL_PATH, "torch")
+    else:
+        if not os.path.exists(YOLO_ONNX_PATH):
+            export_onnx(YOLO_MODEL_PATH, YOLO_ONNX_PATH)
+        path = int8_path(YOLO_ONNX_PATH) if name == "onnx-int8" else YOLO_ONNX_PATH
+        provider = "OpenVINOExecutionProvider" if name == "openvino" else "CPUExecutionProvider"
+        det = OnnxPlateDetector(path, provider=provider)
+    return det, time.perf_counter() - t0
+
+
+def _detect_arrays(det, img):
+    res = det(img, conf=YOLO_CONF_THRESH, verbose=False)[0]
+    if res.boxes is None or len(res.boxes) == 0:
+        return []
+    xyxy, conf, _ = _xyxy_int_array_from_boxes(res.boxes)
+    return list(zip(xyxy.tolist(), conf.tolist()))
+
+
+def bench_detector(args):
+    """
+    Side-by-side report of YOLO backends on CPU: load time, latency per image and
+    agreement with the PyTorch boxes (recall/precision at IoU>=0.5, mean |conf diff|).
+    """
+    images = load_images(args.images)
+    if not images:
+        print(f"No images found at {args.images}")
+        return 1
+    backends = args.backends.split(",")
+    if "torch" not in backends:
+        backends.insert(0, "torch")
+
+    reference = {}
+    report = {}
+    for name in backends:
+        try:
+            det, load_s = _load_backend(name)
+        except Exception as e:
+            print(f"{name}: cannot load ({e})")
+            continue
+        _detect_arrays(det, images[0][1])  # warm-up
+        latencies = []
+        found = {}
+        for _ in range(args.repeat):
+            for img_name, img in images:
+                t0 = time.perf_counter()
+                found[img_name] = _detect_arrays(det, img)
+                latencies.append(time.perf_counter() - t0)
+        if name == "torch":
+            reference = found
+
+        matched = ref_total = cand_total = 0
+        conf_diff = []
+        for img_name, ref_boxes in reference.items():
+            cand = list(found.get(img_name, []))
+            ref_total += len(ref_boxes)
+            cand_total += len(cand)
+            for rbox, rconf in ref_boxes:
+                best = max(cand, key=lambda c: _box_iou(rbox, c[0]), default=None)
+                if best is not None and _box_iou(rbox, best[0]) >= 0.5:
+                    matched += 1
+                    conf_diff.append(abs(rconf - best[1]))
+                    cand.remove(best)
+        latencies.sort()
+        report[name] = {
+            "load_s": load_s,
+            "ms_mean": 1000.0 * sum(latencies) / len(latencies),
+            "ms_p95": 1000.0 * latencies[int(0.95 * (len(latencies) - 1))],
+            "recall_vs_torch": matched / ref_total if ref_total else 1.0,
+            "precision_vs_torch": matched / cand_total if cand_total else 1.0,
+            "mean_conf_diff": sum(conf_diff) / len(conf_diff) if conf_diff else 0.0,
+        }
+
+    print(f"{'backend':<11}{'load s':>8}{'ms mean':>9}{'ms p95':>9}{'recall':>8}{'precision':>10}{'|dconf|':>9}")
+    for name, r in report.items():
+        print(f"{name:<11}{r['load_s']:>8.2f}{r['ms_mean']:>9.1f}{r['ms_p95']:>9.1f}"
+              f"{r['recall_vs_torch']:>8.2f}{r['precision_vs_torch']:>10.2f}{r['mean_conf_diff']:>9.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def _proc_memory_kb(pid):
+    """(rss_kb, pss_kb) of a process from /proc/<pid>/smaps_rollup (Linux). PSS splits shared pages."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    values[key] = int(rest.split()[0])
+    except OSError:
+        pass
+    return values.get("Rss", 0), values.get("Pss", 0)
+
+
+def _child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _wait_workers_ready(base_url, workers, timeout):
+    """Poll /health/ready until `workers` distinct worker pids answered 200. Returns seconds or None."""
+    import requests
+
+    t0 = time.perf_counter()
+    ready = set()
+    while time.perf_counter() - t0 < timeout:
+        try:
+            r = requests.get(f"{base_url}/health/ready", timeout=2)
+            if r.status_code == 200:
+                ready.add(r.json().get("pid"))
+                if len(ready) >= workers:
+                    return time.perf_counter() - t0
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return None
+
+
+def bench_serve(args):
+    """
+    Throughput and memory of the gunicorn serving mode as workers scale: for each worker count
+    start gunicorn, wait until every worker is ready, drive /process_image from client threads
+    and read RSS/PSS of every worker. Laravel forwarding goes to a closed port and a temp outbox.
+    """
+    import requests
+
+    files = [f for f, _ in load_images(args.images)]
+    if not files:
+        print(f"No images found at {args.images}")
+        return 1
+    payloads = []
+    for f in files:
+        with open(f, "rb") as fh:
+            payloads.append(fh.read())
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    report = []
+    print(f"{'workers':>8}{'threads':>8}{'ready s':>9}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'errors':>8}{'RSS/w MB':>10}{'PSS/w MB':>10}{'PSS tot MB':>11}")
+    for n in [int(x) for x in args.workers.split(",")]:
+        tmpdir = tempfile.mkdtemp(prefix="anpr_serve_")
+        env = dict(os.environ,
+                   ANPR_WORKERS=str(n),
+                   ANPR_PORT=str(args.port),
+                   ANPR_PRELOAD="1" if args.preload else "0",
+                   FRAME_CACHE="0",  # the same images repeat; measure real inference
+                   LARAVEL_API_URL="http://127.0.0.1:9/api",
+                   FORWARD_OUTBOX_PATH=os.path.join(tmpdir, "outbox.sqlite"))
+        env.pop("ANPR_WORKER_THREADS", None)
+        if args.threads:
+            env["ANPR_WORKER_THREADS"] = str(args.threads)
+        server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "anpr_api_server:app"],
+                                  env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            ready_s = _wait_workers_ready(base_url, n, args.ready_timeout)
+            if ready_s is None:
+                print(f"{n:>8}  workers not ready after {args.ready_timeout}s, skipping")
+                continue
+
+            latencies = []
+            errors = [0]
+            lock = threading.Lock()
+            deadline = time.perf_counter() + args.duration
+            clients = args.concurrency or 2 * n
+
+            def client(offset):
+                session = requests.Session()
+                i = offset
+                while time.perf_counter() < deadline:
+                    t0 = time.perf_counter()
+                    try:
+                        r = session.post(f"{base_url}/process_image?webcam_index=1", data=payloads[i % len(payloads)],
+                                         headers={"Content-Type": "image/jpeg"}, timeout=60)
+                        ok = r.status_code in (200, 202)  # 202 = event queued in the temp outbox
+                    except requests.RequestException:
+                        ok = False
+                    with lock:
+                        latencies.append(time.perf_counter() - t0)
+                        errors[0] += 0 if ok else 1
+                    i += 1
+
+            threads = [threading.Thread(target=client, args=(c,)) for c in range(clients)]
+            t0 = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - t0
+
+            worker_mem = [_proc_memory_kb(pid) for pid in _child_pids(server.pid)]
+            master_rss, master_pss = _proc_memory_kb(server.pid)
+            latencies.sort()
+            row = {
+                "workers": n,
+                "threads_per_worker": int(args.threads or max(1, os.cpu_count() // n)),
+                "preload": args.preload,
+                "ready_s": ready_s,
+                "requests": len(latencies),
+                "req_per_s": len(latencies) / elapsed,
+                "ms_p50": 1000.0 * latencies[len(latencies) // 2] if latencies else 0.0,
+                "ms_p95": 1000.0 * latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+                "errors": errors[0],
+                "rss_mb_per_worker": sum(r for r, _ in worker_mem) / 1024.0 / max(1, len(worker_mem)),
+                "pss_mb_per_worker": sum(p for _, p in worker_mem) / 1024.0 / max(1, len(worker_mem)),
+                "pss_mb_total": (master_pss + sum(p for _, p in worker_mem)) / 1024.0,
+            }
+            report.append(row)
+            print(f"{n:>8}{row['threads_per_worker']:>8}{ready_s:>9.1f}{row['req_per_s']:>8.2f}{row['ms_p50']:>9.0f}"
+                  f"{row['ms_p95']:>9.0f}{row['errors']:>8}{row['rss_mb_per_worker']:>10.0f}"
+                  f"{row['pss_mb_per_worker']:>10.0f}{row['pss_mb_total']:>11.0f}")
+        finally:
+            server.terminate()
+            try:
+                server.wait(30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def _norm_plate(text):
+    return "".join(ch for ch in str(text).upper() if ch.isalnum())
+
+
+def _edit_distance(a, b):
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0}
+    pick = lambda q: 1000.0 * values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+    return {"count": len(values), "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+            "mean_ms": 1000.0 * sum(values) / len(values)}
+
+
+def load_ground_truth(path):
+    """
+    Labels keyed by normalized image path. Accepts the license_plate_results.json layout
+    ({"images\\test1.jpg": [{"text": ...}, ...]}) or a plain {"images/test1.jpg": "B1387DKC"} map.
+    """
+    with open(path) as f:
+        raw = json.load(f)
+    truth = {}
+    for key, value in raw.items():
+        if isinstance(value, str):
+            plates = [value]
+        else:
+            plates = [p["text"] for p in value if p.get("text")]
+        truth[os.path.normpath(key.replace("\\", "/")).lower()] = [_norm_plate(p) for p in plates]
+    return truth
+
+
+def _truth_for(truth, file_path):
+    key = os.path.normpath(os.path.relpath(file_path)).lower()
+    if key in truth:
+        return truth[key]
+    base = os.path.basename(key)
+    matches = [v for k, v in truth.items() if os.path.basename(k) == base]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _score_image(expected, plates):
+    """Match every expected plate to its closest prediction. Returns (exact, char_errors, chars)."""
+    predicted = [_norm_plate(p["text"]) for p in plates]
+    exact = errors = chars = 0
+    for gt in expected:
+        dist = min((_edit_distance(gt, p) for p in predicted), default=len(gt))
+        exact += dist == 0
+        errors += min(dist, len(gt))
+        chars += len(gt)
+    return exact, errors, chars
+
+
+def _compare_baseline(report, baseline_path):
+    """Print current vs baseline summary; returns True when accuracy regressed."""
+    with open(baseline_path) as f:
+        base = json.load(f)
+    cur, old = report["summary"], base["summary"]
+    print(f"\n{'vs baseline':<18}{'baseline':>12}{'current':>12}{'delta':>10}")
+    for key, fmt in (("images_per_s", ".2f"), ("exact_match", ".3f"), ("cer", ".3f"), ("ocr_passes_per_plate", ".2f")):
+        delta = cur[key] - old[key]
+        print(f"{key:<18}{old[key]:>12{fmt}}{cur[key]:>12{fmt}}{delta:>+10{fmt}}")
+    for stage in sorted(set(report["stages"]) & set(base["stages"])):
+        c, o = report["stages"][stage]["p95_ms"], base["stages"][stage]["p95_ms"]
+        print(f"{'p95 ' + stage:<18}{o:>12.1f}{c:>12.1f}{c - o:>+10.1f}")
+    return cur["exact_match"] < old["exact_match"] or cur["cer"] > old["cer"]
+
+
+def bench_accuracy(args):
+    """
+    Run process_image_from_array over a labelled image set: per-stage p50/p95/p99 latency,
+    images/s, exact match and character error rate (CER) against ground truth and OCR passes
+    per plate. The bundled license_plate_results.json holds earlier pipeline output, so it
+    measures drift from that reference rather than human-verified accuracy.
+    """
+    yolo, ocr = setup_models()
+    if yolo is None or ocr is None:
+        print("Models not loaded, abort")
+        return 1
+    images = []
+    for path in args.images.split(","):
+        images.extend(load_images(path))
+    if not images:
+        print(f"No images found at {args.images}")
+        return 1
+    truth = load_ground_truth(args.labels) if args.labels and os.path.exists(args.labels) else {}
+    profile = camera_profiles().get(args.camera) if args.camera else DEFAULT_PROFILE
+
+    encoded = []  # raw file bytes, so decode time is part of the measurement
+    for name, _ in images:
+        with open(name, "rb") as f:
+            encoded.append((name, f.read()))
+    # warm-up so graph init does not land in the measured runs
+    process_image_from_array(images[0][1], yolo, ocr, camera="bench")
+
+    stage_samples = {}
+    totals = []
+    per_image = {}
+    passes = plates_found = 0
+    wall = 0.0
+    for _ in range(args.repeat):
+        for name, data in encoded:
+            with capture_samples() as samples:
+                t0 = time.perf_counter()
+                # same decode path as the server (DECODE_* settings, camera profile ROI)
+                frame = decode_frame(data, target=profile.imgsz, roi=profile.rect)
+                t1 = time.perf_counter()
+                plates = process_image_from_array(frame.image, yolo, ocr, camera="bench", frame=frame, profile=profile)
+                t2 = time.perf_counter()
+            wall += t2 - t0
+            totals.append(t2 - t0)
+            stage_samples.setdefault("decode", []).append(t1 - t0)
+            for metric, key, value in samples:
+                if metric == "anpr_stage_seconds":
+                    stage_samples.setdefault(key[0], []).append(value)
+            passes += sum(p.get("ocr_passes", 0) for p in plates)
+            plates_found += len(plates)
+            per_image[name] = {"plates": [p["text"] for p in plates]}
+
+    exact = errors = chars = labelled = 0
+    for name, entry in per_image.items():
+        expected = _truth_for(truth, name)
+        if expected is None:
+            continue
+        labelled += 1
+        e, err, n = _score_image(expected, [{"text": t} for t in entry["plates"]])
+        entry.update({"expected": expected, "exact": e, "char_errors": err})
+        exact, errors, chars = exact + e, errors + err, chars + n
+    expected_plates = sum(len(v["expected"]) for v in per_image.values() if "expected" in v)
+
+    stages = {name: _percentiles(values) for name, values in stage_samples.items()}
+    stages["total"] = _percentiles(totals)
+    report = {
+        "config": {k: os.getenv(k) for k in ("YOLO_BACKEND", "OCR_BATCH", "OCR_CASCADE", "OCR_REC_ONLY", "YOLO_ONNX_INT8",
+                                           "DECODE_REDUCED", "DECODE_GRAYSCALE")},
+        "profile": profile.to_dict(),
+        "summary": {
+            "images": len(per_image),
+            "labelled_images": labelled,
+            "repeat": args.repeat,
+            "images_per_s": len(totals) / wall if wall else 0.0,
+            "exact_match": exact / expected_plates if expected_plates else 0.0,
+            "cer": errors / chars if chars else 0.0,
+            "plates_found": plates_found // args.repeat,
+            "ocr_passes_per_plate": passes / plates_found if plates_found else 0.0,
+        },
+        "stages": stages,
+        "per_image": per_image,
+    }
+
+    summary = report["summary"]
+    print(f"{len(per_image)} images ({labelled} labelled) x {args.repeat}: {summary['images_per_s']:.2f} images/s")
+    print(f"exact match {summary['exact_match']:.3f} | CER {summary['cer']:.3f} | "
+          f"OCR passes/plate {summary['ocr_passes_per_plate']:.2f}")
+    print(f"\n{'stage':<14}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, st in stages.items():
+        print(f"{name:<14}{st['count']:>7}{st['p50_ms']:>9.1f}{st['p95_ms']:>9.1f}{st['p99_ms']:>9.1f}")
+    for name, entry in per_image.items():
+        if entry.get("exact", 1) < len(entry.get("expected", [])):
+            print(f"  miss {name}: expected {entry['expected']} got {entry['plates']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        regressed = _compare_baseline(report, args.baseline)
+        if regressed:
+            print("accuracy regressed vs baseline")
+            return 2 if args.strict else 0
+    return 0
+
+
+def bench_evidence(args):
+    """
+    Payload size and forwarding latency per evidence mode: builds each event the way the server
+    does (EVIDENCE_IMAGE x EVIDENCE_TRANSPORT) and POSTs it through LaravelForwarder to a local
+    sink that only counts request bytes. Plate boxes come from --labels when available.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from anpr_evidence import EvidenceStore, attach_evidence, evidence_jpeg
+    from anpr_forwarder import LaravelForwarder
+
+    received = []
+
+    class Sink(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            received.append(length)
+            body = b'{"success": true}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *a):
+            pass
+
+    files = [f for f, _ in load_images(args.images)]
+    if not files:
+        print(f"No images found at {args.images}")
+        return 1
+    boxes = {}
+    if args.labels and os.path.exists(args.labels):
+        with open(args.labels) as f:
+            for key, plates in json.load(f).items():
+                if plates and isinstance(plates, list) and plates[0].get("bbox"):
+                    boxes[os.path.normpath(key.replace("\\", "/")).lower()] = plates[0]["bbox"]
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Sink)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    tmpdir = tempfile.mkdtemp(prefix="anpr_evidence_")
+    store = EvidenceStore(os.path.join(tmpdir, "store"))
+    fwd = LaravelForwarder(f"http://127.0.0.1:{server.server_address[1]}/api/anpr/result",
+                           outbox_path=os.path.join(tmpdir, "outbox.sqlite"), evidence_store=store)
+
+    report = []
+    print(f"{'image':<7}{'transport':<11}{'KB/event':>10}{'build ms':>10}{'post ms':>9}")
+    for mode in args.modes.split(","):
+        for transport in args.transports.split(","):
+            del received[:]
+            build = post = 0.0
+            n = 0
+            for _ in range(args.repeat):
+                for path in files:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    bbox = boxes.get(os.path.normpath(os.path.relpath(path)).lower())
+                    t0 = time.perf_counter()
+                    payload = {"plate": "B1387DKC", "webcam_index": 1, "timestamp": time.time()}
+                    attach_evidence(payload, evidence_jpeg(image_bytes=data, bbox=bbox, mode=mode),
+                                    transport=transport, store=store)
+                    t1 = time.perf_counter()
+                    fwd._post(fwd.url, payload)
+                    t2 = time.perf_counter()
+                    build += t1 - t0
+                    post += t2 - t1
+                    n += 1
+            row = {"image": mode, "transport": transport, "events": n,
+                   "kb_per_event": sum(received) / 1024.0 / max(1, len(received)),
+                   "build_ms": 1000.0 * build / n, "post_ms": 1000.0 * post / n}
+            report.append(row)
+            print(f"{mode:<7}{transport:<11}{row['kb_per_event']:>10.1f}{row['build_ms']:>10.2f}{row['post_ms']:>9.2f}")
+    server.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def bench_decode(args):
+    """
+    Decode time and peak memory per decode path on JPEGs re-encoded at each --sizes resolution:
+    full-resolution BGR (old path), reduced (IMREAD_REDUCED_*), reduced grayscale, and reduced
+    plus full-resolution plate crops (frames where a plate is too small in the reduced image).
+    Peak memory is tracemalloc's peak over the decode (numpy buffers of the decoded images).
+    """
+    import tracemalloc
+
+    images = load_images(args.images)[:args.limit]
+    if not images:
+        print(f"No images found at {args.images}")
+        return 1
+    sizes = [tuple(int(v) for v in s.split("x")) for s in args.sizes.split(",")]
+
+    def full(data):
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+    def reduced(data):
+        return decode_frame(data, reduced=True, gray=False)
+
+    def reduced_gray(data):
+        return decode_frame(data, reduced=True, gray=True)
+
+    def reduced_crops(data):
+        frame = decode_frame(data, reduced=True, gray=False)
+        h, w = frame.image.shape[:2]
+        box = (w // 3, h // 2, w // 3 + w // 8, h // 2 + h // 20)  # plate-sized box, below min height
+        return frame.crops([box], min_height=h)
+
+    paths = [("full", full), ("reduced", reduced), ("reduced_gray", reduced_gray), ("reduced+crop", reduced_crops)]
+    report = []
+    print(f"{'size':<11}{'path':<14}{'p50 ms':>8}{'mean ms':>9}{'peak MB':>9}")
+    for w, h in sizes:
+        encoded = [cv2.imencode(".jpg", cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA),
+                                [cv2.IMWRITE_JPEG_QUALITY, args.quality])[1].tobytes() for _, img in images]
+        for name, fn in paths:
+            fn(encoded[0])  # warm-up
+            times = []
+            for _ in range(args.repeat):
+                for data in encoded:
+                    t0 = time.perf_counter()
+                    fn(data)
+                    times.append(time.perf_counter() - t0)
+            peak = 0
+            for data in encoded:
+                tracemalloc.start()
+                out = fn(data)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                del out
+            st = _percentiles(times)
+            row = {"size": f"{w}x{h}", "path": name, "p50_ms": st["p50_ms"],
+                   "mean_ms": 1000.0 * sum(times) / len(times), "peak_mb": peak / 1e6}
+            report.append(row)
+            print(f"{row['size']:<11}{name:<14}{row['p50_ms']:>8.2f}{row['mean_ms']:>9.2f}{row['peak_mb']:>9.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="ANPR pipeline benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ocr-batch", help="per-variant OCR loop vs one batched recognizer call")
+    p.add_argument("--images", default="images", help="image directory or glob")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--json", default=None, help="write full report to this file")
+    p.set_defaults(func=bench_ocr_batch)
+
+    p = sub.add_parser("cascade", help="full preprocessing sweep vs early-exit cascade")
+    p.add_argument("--images", default="images", help="image directory or glob")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--json", default=None, help="write full report to this file")
+    p.set_defaults(func=bench_cascade)
+
+    p = sub.add_parser("yolo-batch", help="YOLO throughput vs concurrency with dynamic micro-batching")
+    p.add_argument("--images", default="images", help="image directory or glob")
+    p.add_argument("--concurrency", default="1,2,4,8", help="comma separated client counts")
+    p.add_argument("--frames", type=int, default=20, help="frames per client")
+    p.add_argument("--max-batch", type=int, default=8)
+    p.add_argument("--max-wait-ms", type=float, default=5.0)
+    p.add_argument("--json", default=None, help="write report to this file")
+    p.set_defaults(func=bench_yolo_batch)
+
+    p = sub.add_parser("detector", help="PyTorch vs ONNX Runtime / INT8 / OpenVINO detector backends")
+    p.add_argument("--images", default="images", help="image directory or glob")
+    p.add_argument("--backends", default="torch,onnx,onnx-int8")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--json", default=None, help="write report to this file")
+    p.set_defaults(func=bench_detector)
+
+    p = sub.add_parser("serve", help="gunicorn workers: throughput and RSS/PSS per worker as workers scale")
+    p.add_argument("--images", default="images", help="image directory or glob")
+    p.add_argument("--workers", default="1,2,4,8", help="comma separated worker counts")
+    p.add_argument("--threads", type=int, default=0, help="threads per worker (0 = cpu_count // workers)")
+    p.add_argument("--concurrency", type=int, default=0, help="client threads (0 = 2 x workers)")
+    p.add_argument("--duration", type=float, default=30.0, help="seconds of load per worker count")
+    p.add_argument("--port", type=int, default=5055)
+    p.add_argument("--no-preload", dest="preload", action="store_false", help="every worker loads its own models")
+    p.add_argument("--ready-timeout", type=float, default=300.0)
+    p.add_argument("--json", default=None, help="write report to this file")
+    p.set_defaults(func=bench_serve)
+
+    p = sub.add_parser("accuracy", help="latency percentiles per stage + exact match / CER against labels")
+    p.add_argument("--images", default="images,anpr_test_images", help="comma separated image directories or globs")
+    p.add_argument("--labels", default="license_plate_results.json", help="ground truth JSON")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--json", default=None, help="write full report to this file")
+    p.add_argument("--baseline", default=None, help="earlier --json report to compare with")
+    p.add_argument("--strict", action="store_true", help="exit 2 when accuracy regressed vs baseline")
+    p.add_argument("--camera", default=None, help="apply this camera's profile from CAMERA_PROFILES (ROI, imgsz, conf)")
+    p.set_defaults(func=bench_accuracy)
+
+    p = sub.add_parser("evidence", help="payload size / forwarding latency per evidence image mode and transport")
+    p.add_argument("--images", default="images", help="image directory or glob")
+    p.add_argument("--labels", default="license_plate_results.json", help="plate boxes for crop mode")
+    p.add_argument("--modes", default="full,thumb,crop")
+    p.add_argument("--transports", default="base64,multipart,store")
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--json", default=None, help="write report to this file")
+    p.set_defaults(func=bench_evidence)
+
+    p = sub.add_parser("decode", help="decode time / peak memory: full vs reduced vs grayscale JPEG decode")
+    p.add_argument("--images", default="images", help="image directory or glob")
+    p.add_argument("--sizes", default="1920x1080,1280x720")
+    p.add_argument("--quality", type=int, default=90, help="JPEG quality of the re-encoded test frames")
+    p.add_argument("--limit", type=int, default=20, help="max images")
+    p.add_argument("--repeat", type=int, default=10)
+    p.add_argument("--json", default=None, help="write report to this file")
+    p.set_defaults(func=bench_decode)
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
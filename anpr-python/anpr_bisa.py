@@ -1,10 +1,16 @@
 # anpr_bisa.py
 import os
+import re
 import cv2
 import logging
+import time
+import threading
 import numpy as np
-from ultralytics import YOLO
-from paddleocr import PaddleOCR
+from contextlib import nullcontext
+
+from anpr_detector import load_detector, YOLO_BACKEND
+from anpr_metrics import STAGE_SECONDS, OCR_VARIANT_CALLS, PLATES_PER_FRAME
+from anpr_plate_grammar import decode, decode_text, ctc_steps, join_steps
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -14,61 +20,173 @@ YOLO_MODEL_PATH = os.getenv("YOLO_MODEL_PATH", "models/yolo/best.pt")
 PADDLE_OCR_DIR = os.getenv("PADDLE_OCR_DIR", "models/ocr")  # folder yang berisi inference.pdmodel/pdiparams/inference.yml
 YOLO_CONF_THRESH = float(os.getenv("YOLO_CONF_THRESH", 0.5))
 OCR_MIN_CONF = float(os.getenv("OCR_MIN_CONF", 0.35))  # min confidence untuk menerima hasil OCR
+OCR_BATCH = os.getenv("OCR_BATCH", "0") == "1"  # 1 = semua varian dalam satu batch recognizer (tanpa text detection PaddleOCR)
+OCR_REC_BATCH_NUM = int(os.getenv("OCR_REC_BATCH_NUM", 16))  # ukuran batch recognizer PaddleOCR
+OCR_CASCADE = os.getenv("OCR_CASCADE", "0") == "1"  # 1 = berhenti mencoba varian setelah skor cukup
+OCR_CASCADE_THRESHOLD = float(os.getenv("OCR_CASCADE_THRESHOLD", 8.0))  # pattern score * OCR confidence (max 10)
+CASCADE_STATS_WINDOW = int(os.getenv("CASCADE_STATS_WINDOW", 200))  # jumlah kemenangan sebelum statistik di-decay
+OCR_REC_ONLY = os.getenv("OCR_REC_ONLY", "0") == "1"  # 1 = lewati text detection PaddleOCR, crop YOLO langsung ke recognizer
+OCR_REC_IMAGE_SHAPE = tuple(int(v) for v in os.getenv("OCR_REC_IMAGE_SHAPE", "3,32,100").split(","))  # sesuai RecResizeImg di inference.yml
+OCR_TWO_LINE_ASPECT = float(os.getenv("OCR_TWO_LINE_ASPECT", 2.2))  # crop lebih sempit dari ini dicoba split 2 baris
+OCR_DESKEW_MAX_ANGLE = float(os.getenv("OCR_DESKEW_MAX_ANGLE", 15.0))  # derajat
+OCR_CHAR_PROBS = os.getenv("OCR_CHAR_PROBS", "1") == "1"  # 1 = decode grammar dari probabilitas per karakter (CTC)
+OCR_CPU_THREADS = int(os.getenv("OCR_CPU_THREADS", 0))  # 0 = default PaddleOCR
+INFERENCE_LOCK = os.getenv("INFERENCE_LOCK", "1") == "1"  # 1 = satu inference per model sekaligus (PaddleOCR / ultralytics tidak thread-safe)
+WARMUP_SIZES = [tuple(int(v) for v in s.split("x")) for s in os.getenv("WARMUP_SIZES", "640x480,1280x720,1920x1080").split(",")]
+
+
+# job workers, /stream and /process_batch threads share one model instance per process
+YOLO_LOCK = threading.Lock()
+OCR_LOCK = threading.Lock()
+
+
+def _model_lock(model, lock):
+    """lock, unless INFERENCE_LOCK is off or the model serializes its own calls (thread_safe = True)."""
+    if not INFERENCE_LOCK or getattr(type(model), "thread_safe", False):
+        return nullcontext()
+    return lock
+
+
+def _import_frameworks():
+    """
+    Import the heavy frameworks (PaddleOCR, plus ultralytics for the torch backend) on demand,
+    so importing this module stays cheap. Returns seconds spent.
+    """
+    t0 = time.perf_counter()
+    import paddleocr  # noqa: F401
+    if YOLO_BACKEND == "torch":
+        import ultralytics  # noqa: F401
+    return time.perf_counter() - t0
+
 
-def setup_models():
+def setup_models(timings=None, rec_only=None):
     """
     Load YOLO and PaddleOCR models. Return (yolo_model, ocr_model).
     Uses paths from environment variables or defaults above.
+    timings: optional dict, filled with import_s / yolo_load_s / ocr_load_s.
+    rec_only: None uses OCR_REC_ONLY env; True loads the recognizer without text detection
+              (pass the same value to recognize_plates / process_image_from_array).
     """
     yolo_model = None
     ocr_model = None
+    timings = {} if timings is None else timings
+    if rec_only is None:
+        rec_only = OCR_REC_ONLY
+
+    try:
+        timings["import_s"] = _import_frameworks()
+    except Exception as e:
+        logger.exception(f"Failed to import model frameworks: {e}")
+        return None, None
+    from paddleocr import PaddleOCR
+    ocr_threads = {"cpu_threads": OCR_CPU_THREADS} if OCR_CPU_THREADS > 0 else {}
 
     # Load YOLO
+    t0 = time.perf_counter()
     try:
         if not os.path.exists(YOLO_MODEL_PATH):
             logger.error(f"YOLO model not found at {YOLO_MODEL_PATH}")
         else:
-            logger.info(f"Loading YOLO model from {YOLO_MODEL_PATH}")
-            yolo_model = YOLO(YOLO_MODEL_PATH)
+            logger.info(f"Loading YOLO model from {YOLO_MODEL_PATH} (backend={YOLO_BACKEND})")
+            yolo_model = load_detector(YOLO_MODEL_PATH)
             logger.info("YOLO model loaded")
     except Exception as e:
         logger.exception(f"Failed to load YOLO model: {e}")
         yolo_model = None
+    timings["yolo_load_s"] = time.perf_counter() - t0
 
     # Load PaddleOCR
+    t0 = time.perf_counter()
     try:
         # Prefer user-provided inference model directory
         if os.path.isdir(PADDLE_OCR_DIR):
             logger.info(f"Loading PaddleOCR model from {PADDLE_OCR_DIR}")
-            # PaddleOCR will auto-detect detection+recognition models if provided in folder
-            ocr_model = PaddleOCR(
-                det=True,
-                rec=True,
-                use_angle_cls=False,
-                rec_model_dir=PADDLE_OCR_DIR,
-                show_log=False
-            )
-            logger.info("Custom PaddleOCR model loaded")
+            if rec_only:
+                # YOLO already localizes the plate: recognizer only, sized like models/ocr/inference.yml
+                ocr_model = PaddleOCR(
+                    det=False,
+                    rec=True,
+                    use_angle_cls=False,
+                    lang="en",
+                    rec_model_dir=PADDLE_OCR_DIR,
+                    rec_image_shape=",".join(str(v) for v in OCR_REC_IMAGE_SHAPE),
+                    rec_batch_num=OCR_REC_BATCH_NUM,
+                    show_log=False,
+                    **ocr_threads
+                )
+                logger.info("Custom PaddleOCR recognizer loaded (recognition-only mode)")
+            else:
+                # PaddleOCR will auto-detect detection+recognition models if provided in folder
+                ocr_model = PaddleOCR(
+                    det=True,
+                    rec=True,
+                    use_angle_cls=False,
+                    rec_model_dir=PADDLE_OCR_DIR,
+                    rec_batch_num=OCR_REC_BATCH_NUM,
+                    show_log=False,
+                    **ocr_threads
+                )
+                logger.info("Custom PaddleOCR model loaded")
         else:
             logger.info("PaddleOCR custom model dir not found, using default models")
-            ocr_model = PaddleOCR(use_angle_cls=False, det=True, rec=True, show_log=False)
+            ocr_model = PaddleOCR(use_angle_cls=False, det=not rec_only, rec=True, rec_batch_num=OCR_REC_BATCH_NUM, show_log=False, **ocr_threads)
     except Exception as e:
         logger.exception(f"Failed to initialize PaddleOCR: {e}")
         ocr_model = None
+    timings["ocr_load_s"] = time.perf_counter() - t0
 
     return yolo_model, ocr_model
 
 
+def pin_threads(n):
+    """
+    Limit intra-op threads of this process (one server worker) to n. OpenMP / MKL pools read
+    OMP_NUM_THREADS at import, PaddleOCR takes OCR_CPU_THREADS at load; this covers the rest.
+    """
+    if n <= 0:
+        return
+    cv2.setNumThreads(n)
+    if YOLO_BACKEND == "torch":
+        import torch
+        torch.set_num_threads(n)
+
+
+def warmup_models(yolo_model, ocr_model, sizes=None):
+    """
+    Run dummy inference so graph initialization / allocator growth happens before the first
+    real frame: YOLO on a blank frame per input size, and the recognizer on a single crop and
+    on a full variant batch. Returns seconds spent.
+    """
+    sizes = sizes or WARMUP_SIZES
+    t0 = time.perf_counter()
+    if yolo_model is not None:
+        for w, h in sizes:
+            try:
+                detect_plate_boxes(np.full((h, w, 3), 114, dtype=np.uint8), yolo_model)
+            except Exception as e:
+                logger.warning(f"YOLO warm-up {w}x{h} failed: {e}")
+    if ocr_model is not None:
+        crop = np.full((OCR_REC_IMAGE_SHAPE[1], OCR_REC_IMAGE_SHAPE[2], 3), 255, dtype=np.uint8)
+        cv2.putText(crop, "B1234CD", (2, OCR_REC_IMAGE_SHAPE[1] - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+        for n in (1, len(PREPROCS)):
+            try:
+                recognize_batch(ocr_model, [crop] * n, with_steps=OCR_CHAR_PROBS)
+            except Exception as e:
+                logger.warning(f"OCR warm-up batch {n} failed: {e}")
+    return time.perf_counter() - t0
+
+
 def _xyxy_int_array_from_boxes(boxes):
     """
     Helper: converts result.boxes to numpy arrays safely
-    boxes: Boxes object from ultralytics Results
+    boxes: Boxes object from ultralytics Results (torch tensors) or anpr_detector.DetBoxes (numpy)
     Returns arrays (xyxy_arr, conf_arr, cls_arr) or (None, None, None)
     """
     try:
-        xyxy = boxes.xyxy.cpu().numpy()  # shape (N,4)
-        conf = boxes.conf.cpu().numpy()  # shape (N,)
-        cls = boxes.cls.cpu().numpy()    # shape (N,)
+        as_np = lambda t: t.cpu().numpy() if hasattr(t, "cpu") else np.asarray(t)
+        xyxy = as_np(boxes.xyxy)  # shape (N,4)
+        conf = as_np(boxes.conf)  # shape (N,)
+        cls = as_np(boxes.cls)    # shape (N,)
         return xyxy.astype(int), conf, cls.astype(int)
     except Exception:
         # fallback: sometimes boxes is list of Box objects; handle generic iteration
@@ -90,35 +208,15 @@ def _xyxy_int_array_from_boxes(boxes):
 
 def post_process_license_plate(text):
     """
-    Simple post process to clean/format license plate string.
-    Keep it conservative and deterministic: uppercase, remove weird chars, try add spaces.
-    This function is intentionally simple — keep complex domain rules in separate helper if needed.
+    Clean/format a license plate string with the position-aware Indonesian plate grammar
+    (anpr_plate_grammar): letters stay letters in the region/suffix, digits in the number.
+    Text that does not resemble a plate is only uppercased and stripped of symbols.
     """
-    import re
-    if not text:
-        return ""
-    txt = text.upper()
-    # common replacements
-    subs = {
-        '@': '0', 'O': '0', 'Q': '0', 'D': '0',
-        'I': '1', 'L': '1', '|': '1', '!': '1',
-        'S': '5', 'Z': '2'
-    }
-    for k, v in subs.items():
-        txt = txt.replace(k, v)
-    # remove any non alnum or space
-    txt = re.sub(r'[^A-Z0-9 ]+', ' ', txt)
-    txt = ' '.join(txt.split())
-    # attempt to insert spaces for common patterns: 1-2 letters + numbers + 1-3 letters
-    no_space = txt.replace(" ", "")
-    import re
-    m = re.match(r'^([A-Z]{1,2})(\d{1,4})([A-Z]{0,3})$', no_space)
-    if m:
-        parts = [m.group(1), m.group(2)]
-        if m.group(3):
-            parts.append(m.group(3))
-        return " ".join(parts)
-    return txt
+    return decode_text(text)[0]
+
+
+_PLATE_1_RE = re.compile(r'^[A-Z]\d{1,4}[A-Z]{0,3}$')
+_PLATE_2_RE = re.compile(r'^[A-Z]{2}\d{1,4}[A-Z]{0,3}$')
 
 
 def calculate_plate_pattern_score(text):
@@ -126,14 +224,13 @@ def calculate_plate_pattern_score(text):
     Lightweight scoring that rewards patterns likely to be license plates.
     Use this to pick the best OCR candidate among preprocessing attempts.
     """
-    import re
     if not text:
         return 0.0
     t = text.replace(" ", "")
     score = 1.0
-    if re.match(r'^[A-Z]\d{1,4}[A-Z]{0,3}$', t):
+    if _PLATE_1_RE.match(t):
         score *= 10.0
-    elif re.match(r'^[A-Z]{2}\d{1,4}[A-Z]{0,3}$', t):
+    elif _PLATE_2_RE.match(t):
         score *= 9.0
     else:
         # some letters + digits mixture
@@ -147,110 +244,513 @@ def calculate_plate_pattern_score(text):
     return score
 
 
-def process_image_from_array(img, yolo_model, ocr_model):
+# Preprocessing list (kept small and robust)
+PREPROCS = [
+    ("original", lambda im: im),
+    ("gray_otsu", lambda im: cv2.threshold(cv2.cvtColor(im, cv2.COLOR_BGR2GRAY), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]),
+    ("median_blur_otsu", lambda im: cv2.threshold(cv2.medianBlur(cv2.cvtColor(im, cv2.COLOR_BGR2GRAY), 3), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]),
+    ("adaptive", lambda im: cv2.adaptiveThreshold(cv2.cvtColor(im, cv2.COLOR_BGR2GRAY), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)),
+    ("clahe", lambda im: cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8)).apply(cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)))
+]
+
+
+def _to_bgr(proc):
+    """Ensure 3-channel BGR for OCR (threshold variants come back single channel)."""
+    if proc.ndim == 2:
+        return cv2.cvtColor(proc, cv2.COLOR_GRAY2BGR)
+    return proc
+
+
+def _deskew_plate(plate_img):
     """
-    Core pipeline:
-    - Run YOLO detection to get candidate plate boxes
-    - For each box: crop -> try preprocessing techniques -> OCR -> choose best candidate
-    Return list of dicts: [{'text':..., 'confidence':..., 'bbox':[x1,y1,x2,y2], 'method':...}, ...]
+    Straighten a slightly rotated plate crop. Angle comes from minAreaRect over the
+    Otsu foreground; only small angles are corrected so YOLO crops are not flipped.
     """
-    if yolo_model is None or ocr_model is None:
-        logger.error("Models not loaded")
-        return []
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY) if plate_img.ndim == 3 else plate_img
+    _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    pts = cv2.findNonZero(bw)
+    if pts is None or len(pts) < 10:
+        return plate_img
+    angle = cv2.minAreaRect(pts)[-1]
+    # minAreaRect angle convention differs between OpenCV versions; normalize to [-45, 45)
+    if angle >= 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    if abs(angle) < 1.0 or abs(angle) > OCR_DESKEW_MAX_ANGLE:
+        return plate_img
+    h, w = plate_img.shape[:2]
+    m = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+    return cv2.warpAffine(plate_img, m, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
 
-    try:
-        # Run YOLO
-        results = yolo_model(img, conf=YOLO_CONF_THRESH)
-        plate_texts = []
 
-        for res in results:  # iterate result per image (should be one)
-            boxes = getattr(res, "boxes", None)
-            if boxes is None or len(boxes) == 0:
+def _split_two_line(plate_img):
+    """
+    Cheap two-line split: for crops that are not wide enough to be single-line, look for the
+    emptiest row (horizontal projection of Otsu ink) in the middle band and cut there.
+    Returns [whole] or [top, bottom].
+    """
+    h, w = plate_img.shape[:2]
+    if h == 0 or w / float(h) >= OCR_TWO_LINE_ASPECT:
+        return [plate_img]
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY) if plate_img.ndim == 3 else plate_img
+    _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    profile = bw.sum(axis=1).astype(np.float64)
+    lo, hi = int(h * 0.3), int(h * 0.7)
+    if hi - lo < 2:
+        return [plate_img]
+    cut = lo + int(np.argmin(profile[lo:hi]))
+    # only split on a real gap between two lines of ink
+    if profile[cut] > 0.5 * profile.mean():
+        return [plate_img]
+    return [plate_img[:cut], plate_img[cut:]]
+
+
+def _resize_for_rec(line_img):
+    """Resize a line to the recognizer input height, keeping aspect ratio."""
+    h, w = line_img.shape[:2]
+    if h == 0 or w == 0:
+        return line_img
+    target_h = OCR_REC_IMAGE_SHAPE[1]
+    new_w = max(1, int(round(w * target_h / float(h))))
+    return cv2.resize(line_img, (new_w, target_h), interpolation=cv2.INTER_AREA if h > target_h else cv2.INTER_CUBIC)
+
+
+def prepare_rec_lines(plate_img):
+    """
+    Recognition-only mode: deskew the YOLO crop, split two-line plates and resize each
+    line to the recognizer height. Returns list of BGR line images (top to bottom).
+    """
+    straight = _deskew_plate(plate_img)
+    return [_resize_for_rec(line) for line in _split_two_line(straight) if line.size > 0]
+
+
+def detect_plate_boxes(img, yolo_model, profile=None):
+    """
+    Run YOLO on one frame and return clamped plate boxes.
+    profile: anpr_profiles.CameraProfile; YOLO then only sees the camera ROI, with the
+             profile's input size and confidence threshold. Boxes stay in frame coordinates.
+    Returns list of ((x1, y1, x2, y2), det_conf).
+    """
+    boxes_out = []
+    full_h, full_w = img.shape[:2]
+    conf = YOLO_CONF_THRESH
+    kwargs = {}
+    ox = oy = 0
+    if profile is not None:
+        img, (ox, oy) = profile.crop(img)
+        if profile.conf is not None:
+            conf = profile.conf
+        if profile.imgsz:
+            kwargs["imgsz"] = profile.imgsz
+    h, w = img.shape[:2]
+    with _model_lock(yolo_model, YOLO_LOCK):
+        results = yolo_model(img, conf=conf, **kwargs)
+    for res in results:  # iterate result per image (should be one)
+        boxes = getattr(res, "boxes", None)
+        if boxes is None or len(boxes) == 0:
+            continue
+
+        xyxy_arr, conf_arr, cls_arr = _xyxy_int_array_from_boxes(boxes)
+        if xyxy_arr is None:
+            continue
+
+        for idx, box_coords in enumerate(xyxy_arr):
+            x1, y1, x2, y2 = box_coords.tolist()
+            det_conf = float(conf_arr[idx]) if conf_arr is not None else 0.0
+
+            # clamp bbox to image bounds
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(w, x2), min(h, y2)
+            if x2 <= x1 or y2 <= y1:
+                logger.debug("Invalid bbox, skipping")
                 continue
+            box = (x1 + ox, y1 + oy, x2 + ox, y2 + oy)
+            if profile is not None and not profile.contains(box, full_w, full_h):
+                continue
+            boxes_out.append((box, det_conf))
+    return boxes_out
+
+
+def _best_text_from_ocr_result(ocr_res):
+    """
+    Pick the highest-confidence recognized text from a det+rec PaddleOCR result.
+    ocr_res shape: list of [ [(box), (text, score)], ... ] for each detected text
+    Returns (text or None, confidence).
+    """
+    candidate_text = None
+    candidate_conf = 0.0
+    if ocr_res and len(ocr_res) > 0 and ocr_res[0]:
+        # iterate detected text regions
+        for item in ocr_res[0]:
+            if len(item) >= 2:
+                pair = item[1]
+                # pair may be (text, confidence)
+                if isinstance(pair, (list, tuple)) and len(pair) >= 2:
+                    txt = str(pair[0]).strip()
+                    conf_val = float(pair[1])
+                    if conf_val > candidate_conf:
+                        candidate_conf = conf_val
+                        candidate_text = txt
+    return candidate_text, candidate_conf
+
+
+def _recognize_ctc(recognizer, images):
+    """
+    Run PaddleOCR's TextRecognizer predictor directly to keep the CTC probability matrix
+    (same resize/normalize and batching as TextRecognizer.__call__). Returns a list of
+    (text, conf, (steps, gaps)), or None when the recognizer is not a CTC paddle predictor.
+    """
+    decoder = getattr(recognizer, "postprocess_op", None)
+    if (type(decoder).__name__ != "CTCLabelDecode" or getattr(recognizer, "use_onnx", False)
+            or not hasattr(recognizer, "resize_norm_img")):
+        return None
+    characters = decoder.character
+    _, img_h, img_w = recognizer.rec_image_shape[:3]
+    batch_num = getattr(recognizer, "rec_batch_num", OCR_REC_BATCH_NUM)
+    out = []
+    for start in range(0, len(images), batch_num):
+        chunk = images[start:start + batch_num]
+        max_ratio = max([img_w / float(img_h)] + [im.shape[1] / float(im.shape[0]) for im in chunk])
+        batch = np.concatenate([recognizer.resize_norm_img(im, max_ratio)[np.newaxis, :] for im in chunk]).copy()
+        recognizer.input_tensor.copy_from_cpu(batch)
+        recognizer.predictor.run()
+        probs = recognizer.output_tensors[0].copy_to_cpu()
+        for text, conf in decoder(probs):
+            out.append([str(text).strip(), float(conf)])
+        for i, row in enumerate(probs):
+            out[start + i].append(ctc_steps(row, characters))
+    return [tuple(r) for r in out]
+
+
+def recognize_batch(ocr_model, images, with_steps=False):
+    """
+    Recognition-only OCR over a list of BGR crops in a single recognizer batch.
+    Uses PaddleOCR's internal text_recognizer (batched by rec_batch_num) when available,
+    otherwise falls back to one ocr(det=False) call per image.
+    Returns list of (text, confidence) aligned with `images`; with_steps=True returns
+    (text, confidence, (steps, gaps)) with per-character CTC distributions for
+    anpr_plate_grammar.decode (steps None when the recognizer cannot provide them).
+    """
+    if not images:
+        return []
+    with _model_lock(ocr_model, OCR_LOCK):
+        return _recognize_batch(ocr_model, images, with_steps)
+
+
+def _recognize_batch(ocr_model, images, with_steps):
+    recognizer = getattr(ocr_model, "text_recognizer", None)
+    if with_steps and recognizer is not None:
+        try:
+            res = _recognize_ctc(recognizer, images)
+            if res is not None:
+                return res
+        except Exception as e:
+            logger.debug(f"CTC probabilities unavailable, using decoded text: {e}")
+    if recognizer is not None:
+        rec_res, _ = recognizer(images)
+        out = [(str(pair[0]).strip(), float(pair[1])) for pair in rec_res]
+    else:
+        out = []
+        for im in images:
+            res = ocr_model.ocr(im, det=False, rec=True, cls=False)
+            try:
+                pair = res[0][0]
+                out.append((str(pair[0]).strip(), float(pair[1])))
+            except (IndexError, TypeError):
+                out.append(("", 0.0))
+    if with_steps:
+        return [(text, conf, None) for text, conf in out]
+    return out
+
+
+class PreprocWinStats:
+    """
+    Per-camera statistics of which preprocessing variant won (same idea as
+    preprocessing_method in license_plate_results.json) plus OCR passes per plate.
+    Used by the cascade to try the usual winner first. Counts are halved once a
+    camera reaches CASCADE_STATS_WINDOW wins so the ordering follows lighting changes.
+    """
+
+    def __init__(self, window=None):
+        self.window = window or CASCADE_STATS_WINDOW
+        self._lock = threading.Lock()
+        self._wins = {}      # camera -> {method: count}
+        self._plates = {}    # camera -> plates recognized
+        self._passes = {}    # camera -> OCR passes spent
+
+    def ordered(self, camera):
+        """Return PREPROCS ordered by win count for this camera (ties keep default order)."""
+        with self._lock:
+            wins = dict(self._wins.get(camera, {}))
+        if not wins:
+            return list(PREPROCS)
+        return sorted(PREPROCS, key=lambda p: -wins.get(p[0], 0))
+
+    def record(self, camera, method, passes):
+        with self._lock:
+            self._plates[camera] = self._plates.get(camera, 0) + 1
+            self._passes[camera] = self._passes.get(camera, 0) + passes
+            if not method:
+                return
+            wins = self._wins.setdefault(camera, {})
+            wins[method] = wins.get(method, 0) + 1
+            if sum(wins.values()) >= self.window:
+                for k in wins:
+                    wins[k] //= 2
+
+    def snapshot(self):
+        """JSON-friendly view: {camera: {'wins': {...}, 'avg_ocr_passes': x}}"""
+        with self._lock:
+            out = {}
+            for camera, plates in self._plates.items():
+                out[str(camera)] = {
+                    "wins": dict(self._wins.get(camera, {})),
+                    "plates": plates,
+                    "avg_ocr_passes": self._passes.get(camera, 0) / max(1, plates),
+                }
+            return out
+
 
-            xyxy_arr, conf_arr, cls_arr = _xyxy_int_array_from_boxes(boxes)
-            if xyxy_arr is None:
+preproc_stats = PreprocWinStats()
+
+
+def _pick_best_candidate(candidates):
+    """
+    candidates: iterable of (method_name, raw_text, ocr_conf) or (method_name, raw_text, ocr_conf, steps)
+    where steps is (per-character distributions, gaps) from the recognizer or None.
+    With steps the grammar decoder picks the most likely valid plate and its sequence confidence;
+    otherwise the text is grammar-decoded and ocr_conf is discounted by how much it had to change.
+    Scores each with calculate_plate_pattern_score * confidence.
+    Returns (best_text, best_conf, best_method, best_score); best_text is "" when nothing usable.
+    """
+    best_text = ""
+    best_score = 0.0
+    best_conf = 0.0
+    best_method = None
+    for name, candidate_text, candidate_conf, *rest in candidates:
+        steps = rest[0] if rest else None
+        if steps is not None and steps[0]:
+            cleaned, candidate_conf = decode(*steps)
+            weight = candidate_conf
+        elif candidate_text:
+            cleaned, quality = decode_text(candidate_text)
+            weight = candidate_conf * quality
+        else:
+            continue
+        score = calculate_plate_pattern_score(cleaned)
+        weighted = score * weight
+        if weighted > best_score:
+            best_score = weighted
+            best_text = cleaned
+            best_conf = candidate_conf
+            best_method = name
+    return best_text, best_conf, best_method, best_score
+
+
+def _ocr_plates_loop(plate_imgs, ocr_model, preprocs, stop_score=None):
+    """
+    Legacy path: full det+rec PaddleOCR call per preprocessing variant per plate.
+    With stop_score set, stops trying variants for a plate once its best weighted score reaches it.
+    Returns list of (text, conf, method, score, passes).
+    """
+    picks = []
+    for plate_img in plate_imgs:
+        candidates = []
+        best = ("", 0.0, None, 0.0)
+        for name, fn in preprocs:
+            try:
+                t0 = time.perf_counter()
+                proc_3ch = _to_bgr(fn(plate_img))
+                t1 = time.perf_counter()
+                with _model_lock(ocr_model, OCR_LOCK):
+                    ocr_res = ocr_model.ocr(proc_3ch, det=True, rec=True)
+                STAGE_SECONDS.observe(t1 - t0, stage="preprocess")
+                STAGE_SECONDS.observe(time.perf_counter() - t1, stage="ocr")
+                OCR_VARIANT_CALLS.inc(variant=name)
+                candidate_text, candidate_conf = _best_text_from_ocr_result(ocr_res)
+                candidates.append((name, candidate_text, candidate_conf))
+            except Exception as e:
+                logger.debug(f"OCR preprocess {name} failed: {e}")
                 continue
+            best = _pick_best_candidate(candidates)
+            if stop_score is not None and best[3] >= stop_score:
+                break
+        picks.append(best + (len(candidates),))
+    return picks
+
+
+def _line_candidates(name, lines):
+    """
+    Build scoring candidates for one variant from its recognized lines.
+    lines: list of (text, conf) or (text, conf, steps) top to bottom. A two-line crop yields the joined
+    text plus each line alone, so a plate number with a date row below still wins.
+    """
+    if len(lines) == 1:
+        return [(name,) + tuple(lines[0])]
+    joined = " ".join(line[0] for line in lines if line[0])
+    joined_conf = min(line[1] for line in lines)
+    if all(len(line) > 2 and line[2] is not None for line in lines):
+        candidates = [(name, joined, joined_conf, join_steps([line[2] for line in lines]))]
+    else:
+        candidates = [(name, joined, joined_conf)]
+    candidates.extend((name,) + tuple(line) for line in lines)
+    return candidates
 
-            for idx, box_coords in enumerate(xyxy_arr):
-                x1, y1, x2, y2 = box_coords.tolist()
-                det_conf = float(conf_arr[idx]) if conf_arr is not None else 0.0
 
-                # clamp bbox to image bounds
-                h, w = img.shape[:2]
-                x1, y1 = max(0, x1), max(0, y1)
-                x2, y2 = min(w, x2), min(h, y2)
-                if x2 <= x1 or y2 <= y1:
-                    logger.debug("Invalid bbox, skipping")
+def _ocr_plates_batched(plate_imgs, ocr_model, preprocs, stop_score=None, plate_lines=None):
+    """
+    Batched path: every preprocessing variant of every plate in the frame is stacked
+    into one recognizer batch, then scored per plate exactly like the legacy loop.
+    With stop_score set (cascade), runs one recognizer batch per variant stage instead,
+    holding only the plates that have not yet reached stop_score.
+    plate_lines: optional per-plate list of line images (recognition-only mode);
+                 defaults to the whole crop as a single line.
+    Returns list of (text, conf, method, score, passes).
+    """
+    if plate_lines is None:
+        plate_lines = [[im] for im in plate_imgs]
+    stages = [preprocs] if stop_score is None else [[p] for p in preprocs]
+    per_plate = [{} for _ in plate_lines]  # method_name -> [(text, conf[, steps]) per line]
+    pending = list(range(len(plate_lines)))
+
+    def candidates_of(plate_idx):
+        out = []
+        for name, lines in per_plate[plate_idx].items():
+            out.extend(_line_candidates(name, lines))
+        return out
+
+    for stage in stages:
+        batch = []
+        owners = []  # (plate_idx, method_name, line_idx) per batch entry
+        t0 = time.perf_counter()
+        for plate_idx in pending:
+            for name, fn in stage:
+                try:
+                    procs = [_to_bgr(fn(line)) for line in plate_lines[plate_idx]]
+                except Exception as e:
+                    logger.debug(f"OCR preprocess {name} failed: {e}")
                     continue
+                for line_idx, proc in enumerate(procs):
+                    batch.append(proc)
+                    owners.append((plate_idx, name, line_idx))
+
+        t1 = time.perf_counter()
+        STAGE_SECONDS.observe(t1 - t0, stage="preprocess")
+        try:
+            rec_results = recognize_batch(ocr_model, batch, with_steps=OCR_CHAR_PROBS)
+            STAGE_SECONDS.observe(time.perf_counter() - t1, stage="ocr")
+        except Exception as e:
+            logger.debug(f"Batched OCR failed, falling back to per-variant loop: {e}")
+            return _ocr_plates_loop(plate_imgs, ocr_model, preprocs, stop_score)
+
+        for (plate_idx, name, line_idx), rec in zip(owners, rec_results):
+            per_plate[plate_idx].setdefault(name, []).append(rec)
+            OCR_VARIANT_CALLS.inc(variant=name)
+
+        if stop_score is not None:
+            pending = [i for i in pending if _pick_best_candidate(candidates_of(i))[3] < stop_score]
+            if not pending:
+                break
+
+    return [_pick_best_candidate(candidates_of(i)) + (len(per_plate[i]),) for i in range(len(plate_lines))]
+
+
+def recognize_plates(plate_imgs, ocr_model, camera=None, batch_ocr=None, cascade=None, rec_only=None, variants=None):
+    """
+    OCR half of the pipeline for already-cropped plates (see process_image_from_array for the flags).
+    variants: names of PREPROCS to try (camera profile); None tries all.
+    Returns list of (text, conf, method, score, passes) aligned with plate_imgs; text is "" when unreadable.
+    """
+    if batch_ocr is None:
+        batch_ocr = OCR_BATCH
+    if cascade is None:
+        cascade = OCR_CASCADE
+    if rec_only is None:
+        rec_only = OCR_REC_ONLY
+    if not plate_imgs:
+        return []
+
+    if cascade:
+        preprocs = preproc_stats.ordered(camera)
+        stop_score = OCR_CASCADE_THRESHOLD
+    else:
+        preprocs = PREPROCS
+        stop_score = None
+    if variants:
+        preprocs = [p for p in preprocs if p[0] in variants] or preprocs
+    if rec_only:
+        with STAGE_SECONDS.time(stage="rec_prepare"):
+            plate_lines = [prepare_rec_lines(im) for im in plate_imgs]
+        picks = _ocr_plates_batched(plate_imgs, ocr_model, preprocs, stop_score, plate_lines)
+    elif batch_ocr:
+        picks = _ocr_plates_batched(plate_imgs, ocr_model, preprocs, stop_score)
+    else:
+        picks = _ocr_plates_loop(plate_imgs, ocr_model, preprocs, stop_score)
+
+    for best_text, best_conf, best_method, _, passes in picks:
+        preproc_stats.record(camera, best_method, passes)
+    return picks
 
+
+def process_image_from_array(img, yolo_model, ocr_model, batch_ocr=None, camera=None, cascade=None, rec_only=None,
+                             frame=None, profile=None):
+    """
+    Core pipeline:
+    - Run YOLO detection to get candidate plate boxes
+    - For each box: crop -> try preprocessing techniques -> OCR -> choose best candidate
+    batch_ocr: None uses OCR_BATCH env (default off); True stacks all variants of all plates into
+               one recognizer batch on the whole crop (no PaddleOCR text detection, so a loose
+               YOLO box is read as is), False runs the legacy det+rec call per variant.
+    camera:    camera key (webcam_index / slot) for per-camera cascade statistics.
+    cascade:   None uses OCR_CASCADE env; True tries variants in learned per-camera order
+               and stops once pattern score * OCR confidence >= OCR_CASCADE_THRESHOLD.
+    rec_only:  None uses OCR_REC_ONLY env; True skips PaddleOCR text detection entirely and
+               feeds deskewed, resized (and two-line split) YOLO crops to the recognizer.
+    frame:     anpr_decode.DecodedFrame when img is a reduced-resolution decode (frame.image);
+               plates are then cropped at full resolution and bboxes refer to the original.
+    profile:   anpr_profiles.CameraProfile (ROI, detector input size, threshold, OCR variants).
+    Return list of dicts: [{'text':..., 'confidence':..., 'bbox':[x1,y1,x2,y2], 'method':...}, ...]
+    """
+    if yolo_model is None or ocr_model is None:
+        logger.error("Models not loaded")
+        return []
+
+    try:
+        t0 = time.perf_counter()
+        boxes = detect_plate_boxes(img, yolo_model, profile)
+        STAGE_SECONDS.observe(time.perf_counter() - t0, stage="detect")
+        crops = []
+        if frame is not None:
+            for (plate_img, full_box), (_, det_conf) in zip(frame.crops([b for b, _ in boxes]), boxes):
+                if plate_img.size:
+                    crops.append((plate_img, full_box, det_conf))
+        else:
+            for (x1, y1, x2, y2), det_conf in boxes:
                 plate_img = img[y1:y2, x1:x2]
                 if plate_img.size == 0:
                     continue
+                crops.append((plate_img, (x1, y1, x2, y2), det_conf))
+        if not crops:
+            PLATES_PER_FRAME.observe(0)
+            return []
+
+        picks = recognize_plates([c[0] for c in crops], ocr_model, camera, batch_ocr, cascade, rec_only,
+                                 variants=profile.preprocs if profile is not None else None)
 
-                # Preprocessing list (kept small and robust)
-                preprocs = [
-                    ("original", lambda im: im),
-                    ("gray_otsu", lambda im: cv2.threshold(cv2.cvtColor(im, cv2.COLOR_BGR2GRAY), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]),
-                    ("median_blur_otsu", lambda im: cv2.threshold(cv2.medianBlur(cv2.cvtColor(im, cv2.COLOR_BGR2GRAY), 3), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]),
-                    ("adaptive", lambda im: cv2.adaptiveThreshold(cv2.cvtColor(im, cv2.COLOR_BGR2GRAY), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)),
-                    ("clahe", lambda im: cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8)).apply(cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)))
-                ]
-
-                best_text = ""
-                best_score = 0.0
-                best_conf = 0.0
-                best_method = None
-
-                for name, fn in preprocs:
-                    try:
-                        proc = fn(plate_img)
-                        # ensure 3-channel BGR for OCR if needed
-                        if proc.ndim == 2:
-                            proc_3ch = cv2.cvtColor(proc, cv2.COLOR_GRAY2BGR)
-                        else:
-                            proc_3ch = proc
-
-                        # PaddleOCR expects BGR or path; use ocr_model.ocr(image, det=True, rec=True)
-                        ocr_res = ocr_model.ocr(proc_3ch, det=True, rec=True)
-                        # ocr_res shape: list of [ [(box), (text, score)], ... ] for each detected text
-                        # We'll take the highest-confidence recognized text for that preproc
-                        candidate_text = None
-                        candidate_conf = 0.0
-                        if ocr_res and len(ocr_res) > 0 and ocr_res[0]:
-                            # iterate detected text regions
-                            for item in ocr_res[0]:
-                                if len(item) >= 2:
-                                    pair = item[1]
-                                    # pair may be (text, confidence)
-                                    if isinstance(pair, (list, tuple)) and len(pair) >= 2:
-                                        txt = str(pair[0]).strip()
-                                        conf_val = float(pair[1])
-                                        if conf_val > candidate_conf:
-                                            candidate_conf = conf_val
-                                            candidate_text = txt
-
-                        if candidate_text:
-                            cleaned = post_process_license_plate(candidate_text)
-                            score = calculate_plate_pattern_score(cleaned)
-                            weighted = score * candidate_conf
-                            if weighted > best_score:
-                                best_score = weighted
-                                best_text = cleaned
-                                best_conf = candidate_conf
-                                best_method = name
-                    except Exception as e:
-                        logger.debug(f"OCR preprocess {name} failed: {e}")
-
-                if best_text:
-                    plate_texts.append({
-                        "text": best_text,
-                        "confidence": float(best_conf),
-                        "preprocessing": best_method,
-                        "bbox": [int(x1), int(y1), int(x2), int(y2)],
-                        "detection_confidence": float(det_conf)
-                    })
+        plate_texts = []
+        for (_, (x1, y1, x2, y2), det_conf), (best_text, best_conf, best_method, _, passes) in zip(crops, picks):
+            if best_text:
+                plate_texts.append({
+                    "text": best_text,
+                    "confidence": float(best_conf),
+                    "preprocessing": best_method,
+                    "bbox": [int(x1), int(y1), int(x2), int(y2)],
+                    "detection_confidence": float(det_conf),
+                    "ocr_passes": passes
+                })
 
+        PLATES_PER_FRAME.observe(len(plate_texts))
         return plate_texts
 
     except Exception as e:
@@ -0,0 +1,142 @@
+# anpr_capture.py
+"""
+Capture kamera terpisah dari inference.
+- LatestFrameCapture: satu thread per kamera membaca terus, hanya frame TERBARU yang disimpan
+  (single slot), jadi buffer V4L2 tidak penuh frame basi saat inference lambat.
+- SharedFrameBuffer: slot frame terbaru di shared memory untuk mode process-per-camera.
+"""
+import time
+import logging
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("anpr_capture")
+
+
+def open_source(source):
+    """cv2.VideoCapture for a device index ('0', 0) or a URL/path."""
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    cap = cv2.VideoCapture(source)
+    if cap.isOpened() and isinstance(source, int):
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class LatestFrameCapture:
+    def __init__(self, source, name=None, on_frame=None):
+        self.source = source
+        self.name = name or str(source)
+        self.on_frame = on_frame  # optional callback(frame), e.g. copy into shared memory
+        self.cap = open_source(source)
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._ts = 0.0
+        self._running = False
+        self._thread = None
+        self.dropped = 0  # frames overwritten before anyone consumed them
+        self._consumed_seq = 0
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name=f"capture-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(2)
+        self.cap.release()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _loop(self):
+        failures = 0
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret:
+                failures += 1
+                if failures in (1, 50):
+                    logger.error(f"[{self.name}] Gagal membaca kamera")
+                time.sleep(0.05)
+                continue
+            failures = 0
+            if self.on_frame is not None:
+                self.on_frame(frame)
+            with self._cond:
+                if self._seq != self._consumed_seq:
+                    self.dropped += 1
+                self._frame = frame
+                self._seq += 1
+                self._ts = time.time()
+                self._cond.notify_all()
+
+    def latest(self):
+        """(seq, frame, ts) of the newest frame without waiting; frame None before the first read."""
+        with self._cond:
+            return self._seq, self._frame, self._ts
+
+    def wait_newer(self, last_seq, timeout=1.0):
+        """Block until a frame newer than last_seq exists. Returns (seq, frame, ts) or (last_seq, None, 0)."""
+        with self._cond:
+            if self._seq == last_seq:
+                self._cond.wait(timeout)
+            if self._seq == last_seq or self._frame is None:
+                return last_seq, None, 0.0
+            self._consumed_seq = self._seq
+            return self._seq, self._frame, self._ts
+
+
+class SharedFrameBuffer:
+    """
+    Latest-frame slot in shared memory (fixed shape, uint8 BGR) plus a sequence counter.
+    Created in the parent; pass spec() to the child as a Process argument and attach() there.
+    """
+
+    def __init__(self, shape, name=None, create=True, seq=None, lock=None, ts=None, ctx=None):
+        ctx = ctx or mp.get_context()  # must match the context used to start the child processes
+        self.shape = tuple(shape)
+        nbytes = int(np.prod(self.shape))
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=nbytes)
+        self.array = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf)
+        self.seq = seq if seq is not None else ctx.Value("Q", 0, lock=False)
+        self.ts = ts if ts is not None else ctx.Value("d", 0.0, lock=False)
+        self.lock = lock if lock is not None else ctx.Lock()
+        self._owner = create
+
+    def spec(self):
+        return {"shape": self.shape, "name": self.shm.name, "seq": self.seq, "lock": self.lock, "ts": self.ts}
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec["shape"], name=spec["name"], create=False, seq=spec["seq"], lock=spec["lock"], ts=spec["ts"])
+
+    def write(self, frame):
+        if frame.shape != self.shape:
+            frame = cv2.resize(frame, (self.shape[1], self.shape[0]))
+        with self.lock:
+            self.array[...] = frame
+            self.seq.value += 1
+            self.ts.value = time.time()
+
+    def read_newer(self, last_seq):
+        """Copy of the newest frame if newer than last_seq: (seq, frame, ts), else (last_seq, None, 0)."""
+        with self.lock:
+            seq = self.seq.value
+            if seq == last_seq or seq == 0:
+                return last_seq, None, 0.0
+            return seq, self.array.copy(), self.ts.value
+
+    def close(self):
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
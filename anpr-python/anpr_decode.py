@@ -0,0 +1,155 @@
+# anpr_decode.py
+"""
+Decode JPEG dari kamera dengan resolusi secukupnya.
+YOLO hanya melihat frame yang diperkecil ke YOLO_IMGSZ, jadi frame didecode langsung di
+resolusi 1/2, 1/4 atau 1/8 (cv2.IMREAD_REDUCED_*, scaling DCT di libjpeg: lebih cepat dan
+buffer jauh lebih kecil) selama sisi terpanjang tetap >= ukuran input detector.
+Crop plat untuk OCR diambil dari decode resolusi penuh, hanya jika ada plat yang terlalu kecil
+di frame reduced (DECODE_MIN_PLATE_HEIGHT); frame tanpa plat tidak pernah didecode penuh.
+DECODE_GRAYSCALE=1: decode grayscale (tanpa upsampling chroma / konversi warna), untuk
+kamera IR / monokrom.
+"""
+import os
+import logging
+
+import cv2
+import numpy as np
+
+from anpr_detector import YOLO_IMGSZ
+
+logger = logging.getLogger("anpr_decode")
+
+DECODE_REDUCED = os.getenv("DECODE_REDUCED", "1") == "1"
+DECODE_GRAYSCALE = os.getenv("DECODE_GRAYSCALE", "0") == "1"
+DECODE_TARGET = int(os.getenv("DECODE_TARGET", YOLO_IMGSZ))  # sisi terpanjang minimum untuk detector
+DECODE_MIN_PLATE_HEIGHT = int(os.getenv("DECODE_MIN_PLATE_HEIGHT", 64))  # px di frame reduced; di bawah ini crop dari resolusi penuh
+
+_REDUCED_COLOR = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                  4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+_REDUCED_GRAY = {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+                 4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+
+# start-of-frame markers carry the image size (DHT 0xC4, JPG 0xC8 and DAC 0xCC are not SOF)
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(data):
+    """(width, height) from the JPEG SOF header without decoding, or None if data is not a JPEG."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    n = len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF or marker == 0x01 or 0xD0 <= marker <= 0xD7:  # fill byte / standalone markers
+            i += 1 if marker == 0xFF else 2
+            continue
+        length = (data[i + 2] << 8) | data[i + 3]
+        if marker in _SOF_MARKERS:
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return (width, height) if width and height else None
+        if marker == 0xDA:  # start of scan before any SOF
+            return None
+        i += 2 + length
+    return None
+
+
+def reduced_factor(width, height, target=None):
+    """Largest DCT scale (1, 2, 4, 8) that keeps the longest side >= target."""
+    target = target or DECODE_TARGET
+    longest = max(width, height)
+    factor = 1
+    for f in (2, 4, 8):
+        if longest / f >= target:
+            factor = f
+    return factor
+
+
+class DecodedFrame:
+    """
+    One camera frame: .image is what the detector sees (possibly reduced, always BGR),
+    boxes are mapped back to full-resolution coordinates and plates cropped by crops().
+    """
+
+    def __init__(self, data, image, full_size, gray=False):
+        self.data = data
+        self.image = image
+        self.full_size = full_size  # (width, height) of the original
+        self.gray = gray
+        h, w = image.shape[:2]
+        self.sx = full_size[0] / float(w)
+        self.sy = full_size[1] / float(h)
+
+    @property
+    def reduced(self):
+        return self.sx > 1.0 or self.sy > 1.0
+
+    def to_full(self, box):
+        """Box in .image coordinates -> clamped box in original coordinates."""
+        x1, y1, x2, y2 = box
+        fw, fh = self.full_size
+        return (max(0, int(x1 * self.sx)), max(0, int(y1 * self.sy)),
+                min(fw, int(round(x2 * self.sx))), min(fh, int(round(y2 * self.sy))))
+
+    def _decode_full(self):
+        flag = cv2.IMREAD_GRAYSCALE if self.gray else cv2.IMREAD_COLOR
+        return cv2.imdecode(np.frombuffer(self.data, np.uint8), flag)
+
+    def crops(self, boxes, min_height=None):
+        """
+        Plate crops for boxes in .image coordinates. Returns list of (crop_bgr, full_box).
+        Crops come from the reduced image when every plate is at least min_height px tall
+        there, otherwise the frame is decoded once at full resolution (copied crops only,
+        the full frame is not kept).
+        """
+        min_height = DECODE_MIN_PLATE_HEIGHT if min_height is None else min_height
+        if not boxes:
+            return []
+        full = None
+        if self.reduced and any(y2 - y1 < min_height for _, y1, _, y2 in boxes):
+            full = self._decode_full()
+            if full is None:
+                logger.debug("full-resolution decode failed, cropping reduced frame")
+        out = []
+        for box in boxes:
+            full_box = self.to_full(box)
+            if full is not None:
+                x1, y1, x2, y2 = full_box
+                crop = full[y1:y2, x1:x2].copy()
+                if crop.ndim == 2:
+                    crop = cv2.cvtColor(crop, cv2.COLOR_GRAY2BGR)
+            else:
+                x1, y1, x2, y2 = box
+                crop = self.image[y1:y2, x1:x2]
+            out.append((crop, full_box))
+        return out
+
+
+def decode_frame(data, target=None, reduced=None, gray=None, roi=None):
+    """
+    Decode uploaded image bytes for detection. Returns DecodedFrame or None if undecodable.
+    roi: (x1, y1, x2, y2) fractions the detector will crop to; the reduction keeps that
+    region (not the whole frame) >= target. Non-JPEG input (PNG, ...) is decoded at full resolution.
+    """
+    reduced = DECODE_REDUCED if reduced is None else reduced
+    gray = DECODE_GRAYSCALE if gray is None else gray
+    size = jpeg_size(data)
+    factor = 1
+    if reduced and size:
+        fx, fy = (roi[2] - roi[0], roi[3] - roi[1]) if roi else (1.0, 1.0)
+        factor = reduced_factor(size[0] * fx, size[1] * fy, target)
+    flag = (_REDUCED_GRAY if gray else _REDUCED_COLOR)[factor]
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+    if img is None:
+        return None
+    if img.ndim == 2:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)  # detector and OCR expect 3 channels
+    if size is None or factor == 1:
+        size = (img.shape[1], img.shape[0])
+    elif (size[0] > size[1]) != (img.shape[1] > img.shape[0]):
+        size = (size[1], size[0])  # imdecode applied EXIF rotation
+    return DecodedFrame(data, img, size, gray=gray)
@@ -0,0 +1,230 @@
+# anpr_detector.py
+"""
+Backend detector plat untuk CPU tanpa GPU.
+YOLO_BACKEND:
+  torch    -> ultralytics + PyTorch (models/yolo/best.pt), perilaku lama
+  onnx     -> ONNX Runtime CPUExecutionProvider
+  openvino -> ONNX Runtime OpenVINOExecutionProvider (paket onnxruntime-openvino), fallback CPU
+File ONNX dibuat sekali dari best.pt jika belum ada; INT8 (static quantization) dibuat dengan
+    python anpr_detector.py export --int8 --calib images
+Detector ONNX dipanggil sama seperti model ultralytics (detector(img, conf=...)) dan mengembalikan
+objek dengan .boxes.xyxy/.conf/.cls (numpy), jadi _xyxy_int_array_from_boxes tetap dipakai.
+"""
+import os
+import sys
+import glob
+import logging
+import argparse
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("anpr_detector")
+
+YOLO_BACKEND = os.getenv("YOLO_BACKEND", "torch")
+YOLO_ONNX_PATH = os.getenv("YOLO_ONNX_PATH", "models/yolo/best.onnx")
+YOLO_ONNX_INT8 = os.getenv("YOLO_ONNX_INT8", "0") == "1"  # pakai best.int8.onnx jika ada
+YOLO_IMGSZ = int(os.getenv("YOLO_IMGSZ", 640))
+YOLO_NMS_IOU = float(os.getenv("YOLO_NMS_IOU", 0.45))
+ORT_THREADS = int(os.getenv("ORT_THREADS", 0))  # 0 = default ONNX Runtime
+
+
+def int8_path(onnx_path):
+    root, ext = os.path.splitext(onnx_path)
+    return f"{root}.int8{ext}"
+
+
+def letterbox(img, size):
+    """Resize keeping aspect ratio and pad to size x size (ultralytics style, pad 114). Returns (img, scale, (padx, pady))."""
+    h, w = img.shape[:2]
+    scale = min(size / float(h), size / float(w))
+    nh, nw = int(round(h * scale)), int(round(w * scale))
+    resized = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    padx, pady = (size - nw) // 2, (size - nh) // 2
+    out = np.full((size, size, 3), 114, dtype=np.uint8)
+    out[pady:pady + nh, padx:padx + nw] = resized
+    return out, scale, (padx, pady)
+
+
+def to_blob(imgs, size):
+    """List of BGR frames -> NCHW float32 RGB blob plus per-image (scale, pad)."""
+    blobs, metas = [], []
+    for img in imgs:
+        boxed, scale, pad = letterbox(img, size)
+        blobs.append(boxed[:, :, ::-1].transpose(2, 0, 1))
+        metas.append((scale, pad, img.shape[:2]))
+    return np.ascontiguousarray(np.stack(blobs), dtype=np.float32) / 255.0, metas
+
+
+class DetBoxes:
+    """Minimal stand-in for ultralytics Boxes: numpy xyxy (N,4), conf (N,), cls (N,)."""
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.conf)
+
+
+class DetResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class OnnxPlateDetector:
+    thread_safe = True  # InferenceSession.run may be called from several threads
+
+    def __init__(self, onnx_path, provider="CPUExecutionProvider", imgsz=None, threads=None):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = ORT_THREADS if threads is None else threads
+        if threads:
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+        available = ort.get_available_providers()
+        if provider not in available:
+            logger.warning(f"{provider} not available ({available}), using CPUExecutionProvider")
+            provider = "CPUExecutionProvider"
+        self.session = ort.InferenceSession(onnx_path, sess_options=opts, providers=[provider])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        # fixed batch dimension -> frames go one by one; dynamic -> real batch
+        self.dynamic_batch = not isinstance(inp.shape[0], int)
+        self.dynamic_shape = not isinstance(inp.shape[2], int)  # exported with dynamic=True: any imgsz
+        self.imgsz = imgsz or (inp.shape[2] if isinstance(inp.shape[2], int) else YOLO_IMGSZ)
+        self.path = onnx_path
+        self.provider = provider
+        logger.info(f"ONNX detector {onnx_path} on {provider} (imgsz={self.imgsz}, dynamic batch={self.dynamic_batch})")
+
+    def __call__(self, img, conf=0.25, iou=None, imgsz=None, **_ignored):
+        imgs = img if isinstance(img, list) else [img]
+        iou = YOLO_NMS_IOU if iou is None else iou
+        size = self.imgsz
+        if imgsz and self.dynamic_shape:
+            size = max(32, int(imgsz) // 32 * 32)  # YOLO stride
+        if self.dynamic_batch:
+            blob, metas = to_blob(imgs, size)
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            outputs, metas = [], []
+            for im in imgs:
+                blob, meta = to_blob([im], size)
+                outputs.append(self.session.run(None, {self.input_name: blob})[0][0])
+                metas.extend(meta)
+        return [self._postprocess(out, meta, conf, iou) for out, meta in zip(outputs, metas)]
+
+    @staticmethod
+    def _postprocess(pred, meta, conf_thresh, iou_thresh):
+        """YOLOv8 head (4 + nc, anchors) -> DetResult in original image coordinates."""
+        scale, (padx, pady), (h, w) = meta
+        pred = pred.T  # (anchors, 4 + nc)
+        scores = pred[:, 4:]
+        cls = scores.argmax(axis=1)
+        conf = scores[np.arange(len(scores)), cls]
+        keep = conf >= conf_thresh
+        if not np.any(keep):
+            empty = np.zeros((0, 4), dtype=np.float32)
+            return DetResult(DetBoxes(empty, np.zeros(0, np.float32), np.zeros(0, np.int64)))
+        boxes, conf, cls = pred[keep, :4], conf[keep], cls[keep]
+        # cx, cy, w, h (letterboxed) -> x1, y1, x2, y2 (original)
+        xyxy = np.empty_like(boxes)
+        xyxy[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2 - padx) / scale
+        xyxy[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2 - pady) / scale
+        xyxy[:, 2] = (boxes[:, 0] + boxes[:, 2] / 2 - padx) / scale
+        xyxy[:, 3] = (boxes[:, 1] + boxes[:, 3] / 2 - pady) / scale
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+        xywh = np.column_stack([xyxy[:, 0], xyxy[:, 1], xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1]])
+        idx = cv2.dnn.NMSBoxes(xywh.tolist(), conf.tolist(), conf_thresh, iou_thresh)
+        idx = np.array(idx).reshape(-1)
+        return DetResult(DetBoxes(xyxy[idx].astype(np.float32), conf[idx].astype(np.float32), cls[idx].astype(np.int64)))
+
+
+def export_onnx(pt_path, onnx_path=None, imgsz=None, dynamic=True):
+    """Export best.pt to ONNX once via ultralytics. Returns the ONNX path."""
+    from ultralytics import YOLO
+
+    onnx_path = onnx_path or YOLO_ONNX_PATH
+    imgsz = imgsz or YOLO_IMGSZ
+    logger.info(f"Exporting {pt_path} -> ONNX (imgsz={imgsz}, dynamic={dynamic})")
+    exported = YOLO(pt_path).export(format="onnx", imgsz=imgsz, dynamic=dynamic, simplify=True)
+    if os.path.abspath(exported) != os.path.abspath(onnx_path):
+        os.replace(exported, onnx_path)
+    return onnx_path
+
+
+def quantize_int8(onnx_path, calib_dir, out_path=None, imgsz=None, max_images=200):
+    """Static INT8 quantization (QDQ, per-channel) calibrated on our own gate images."""
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    imgsz = imgsz or YOLO_IMGSZ
+    out_path = out_path or int8_path(onnx_path)
+    files = sorted(f for f in glob.glob(os.path.join(calib_dir, "**", "*"), recursive=True)
+                   if f.lower().endswith((".jpg", ".jpeg", ".png")))[:max_images]
+    if not files:
+        raise ValueError(f"no calibration images in {calib_dir}")
+
+    class Reader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.input_name = input_name
+            self._iter = iter(files)
+
+        def get_next(self):
+            for f in self._iter:
+                img = cv2.imread(f)
+                if img is not None:
+                    return {self.input_name: to_blob([img], imgsz)[0]}
+            return None
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    prepped = out_path + ".prep.onnx"
+    quant_pre_process(onnx_path, prepped)
+    logger.info(f"Calibrating INT8 on {len(files)} images from {calib_dir}")
+    quantize_static(prepped, out_path, Reader(input_name), quant_format=QuantFormat.QDQ,
+                    per_channel=True, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    os.remove(prepped)
+    return out_path
+
+
+def load_detector(pt_path, backend=None):
+    """Return a callable detector for YOLO_BACKEND (ultralytics model for 'torch')."""
+    backend = backend or YOLO_BACKEND
+    if backend == "torch":
+        from ultralytics import YOLO
+        return YOLO(pt_path)
+
+    onnx_path = YOLO_ONNX_PATH
+    if not os.path.exists(onnx_path):
+        export_onnx(pt_path, onnx_path)
+    if YOLO_ONNX_INT8:
+        if os.path.exists(int8_path(onnx_path)):
+            onnx_path = int8_path(onnx_path)
+        else:
+            logger.warning(f"{int8_path(onnx_path)} not found, run 'python anpr_detector.py export --int8'; using FP32")
+    provider = "OpenVINOExecutionProvider" if backend == "openvino" else "CPUExecutionProvider"
+    return OnnxPlateDetector(onnx_path, provider=provider)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export / quantize the YOLO plate detector for CPU backends")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("export", help="best.pt -> ONNX (and optional INT8)")
+    p.add_argument("--weights", default=os.getenv("YOLO_MODEL_PATH", "models/yolo/best.pt"))
+    p.add_argument("--onnx", default=YOLO_ONNX_PATH)
+    p.add_argument("--imgsz", type=int, default=YOLO_IMGSZ)
+    p.add_argument("--int8", action="store_true", help="also write static INT8 model")
+    p.add_argument("--calib", default="images", help="calibration image directory")
+    args = parser.parse_args()
+
+    path = export_onnx(args.weights, args.onnx, args.imgsz)
+    print(f"ONNX: {path}")
+    if args.int8:
+        print(f"INT8: {quantize_int8(path, args.calib, imgsz=args.imgsz)}")
+    sys.exit(0)
@@ -1,10 +1,19 @@
+import os
 import cv2
+import json
 import time
-import requests
-import base64
 import logging
-from ultralytics import YOLO
-from paddleocr import PaddleOCR
+import threading
+import multiprocessing as mp
+
+from anpr_bisa import setup_models, detect_plate_boxes, recognize_plates
+from anpr_profiles import camera_profiles
+from anpr_batcher import BatchingDetector
+from anpr_capture import LatestFrameCapture, SharedFrameBuffer
+from anpr_forwarder import LaravelForwarder
+from anpr_evidence import attach_evidence, evidence_jpeg
+from anpr_tracker import PlateTracker
+from anpr_motion import MotionGate, MOTION_GATE, MOTION_ROI
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,68 +24,143 @@ logger = logging.getLogger(__name__)
 
 # Laravel API endpoint untuk ANPR result
 LARAVEL_API = "http://10.218.100.27:8000/api/anpr/result"
-
-YOLO_MODEL_PATH = "models/yolo/best.pt"
-OCR_MODEL_DIR = "models/ocr"
+OUTBOX_PATH = os.getenv("DUAL_CAM_OUTBOX_PATH", "outbox_dual_cam.sqlite")
 
 CAMERA_1_ID = 0   # Pintu Masuk (webcam_index=1)
 CAMERA_2_ID = 1   # Pintu Keluar (webcam_index=2)
 
-# Debounce untuk avoid duplicate detection
+# Daftar kamera (N kamera) dari file JSON; jika tidak ada pakai 2 kamera di atas
+CAMERA_CONFIG = os.getenv("CAMERA_CONFIG", "cameras.json")
+# thread  = satu proses, capture + inference per kamera di thread sendiri
+# process = satu proses inference per kamera, frame lewat shared memory (pakai semua core)
+CAMERA_MODE = os.getenv("CAMERA_MODE", "thread")
+SHOW_WINDOWS = os.getenv("DUAL_CAM_SHOW", "1") == "1"
+# Kamera realtime: crop YOLO langsung ke recognizer. Variabel sendiri: OCR_REC_ONLY (anpr_bisa /
+# server) default 0, jadi satu nama env tidak berarti kebalikannya di sini
+REC_ONLY = os.getenv("DUAL_CAM_REC_ONLY", "1") == "1"
+
+DEFAULT_CAMERAS = [
+    {"webcam_index": 1, "source": CAMERA_1_ID, "label": "MASUK", "slot_name": "Slot-1"},
+    {"webcam_index": 2, "source": CAMERA_2_ID, "label": "KELUAR", "slot_name": "Slot-1"},
+]
+
+# Debounce untuk avoid duplicate detection (plat sama dari track baru, mis. setelah tertutup orang)
 DEBOUNCE_SECONDS = 4
 
 # ==========================
 # LOAD MODEL
 # ==========================
 
-print("Loading YOLO model...")
-yolo = YOLO(YOLO_MODEL_PATH)
+# Diisi load_runtime(): di proses utama (mode thread) atau di tiap proses kamera (mode process)
+yolo = None
+ocr = None
+forwarder = None
+_ocr_lock = threading.Lock()  # PaddleOCR predictor tidak thread-safe
+
 
-print("Loading OCR model...")
-ocr = PaddleOCR(
-    use_angle_cls=False,
-    lang="en",
-    det=False,
-    rec=True,
-    rec_model_dir=OCR_MODEL_DIR
-)
+def load_runtime(outbox_path, cameras_sharing_yolo=1):
+    """Load models + forwarder for this process. Several camera threads share YOLO through the batcher."""
+    global yolo, ocr, forwarder
+    print("Loading YOLO + OCR models...")
+    yolo, ocr = setup_models(rec_only=REC_ONLY)
+    if yolo is not None and cameras_sharing_yolo > 1:
+        yolo = BatchingDetector(yolo, max_batch=cameras_sharing_yolo)
+    forwarder = LaravelForwarder(LARAVEL_API, outbox_path=outbox_path)
+
+
+def load_camera_config(path=CAMERA_CONFIG):
+    """
+    cameras.json: {"cameras": [{"webcam_index": 1, "source": 0, "label": "MASUK",
+                                "slot_name": "Slot-1", "motion_roi": "0,0.4,1,1"}, ...]}
+    """
+    if not os.path.exists(path):
+        return DEFAULT_CAMERAS
+    with open(path) as f:
+        data = json.load(f)
+    cameras = data.get("cameras", []) if isinstance(data, dict) else data
+    for cam in cameras:
+        cam.setdefault("label", f"CAM{cam['webcam_index']}")
+        cam.setdefault("slot_name", "Slot-1")
+    return cameras
 
 # ==========================
 # FUNGSI ANPR
 # ==========================
 
-def extract_plate(frame):
-    """Deteksi plat lalu OCR."""
+class Lane:
+    """State per kamera: tracker + debounce plat terakhir yang dikirim."""
+
+    def __init__(self, webcam_index, label, slot_name=None, motion_roi=None):
+        self.webcam_index = webcam_index
+        self.label = label
+        self.slot_name = slot_name
+        self.tracker = PlateTracker()
+        # ROI gerakan per kamera: motion_roi di cameras.json, MOTION_ROI_<n>, fallback MOTION_ROI
+        roi = motion_roi or os.getenv(f"MOTION_ROI_{webcam_index}", MOTION_ROI)
+        self.gate = MotionGate(roi=roi) if MOTION_GATE else None
+        self.last_plate = None
+        self.last_sent = 0.0
+
+
+def process_lane_frame(lane, frame):
+    """
+    Deteksi plat tiap frame, OCR hanya track yang butuh bacaan baru, lalu kembalikan
+    event konsensus (satu per kendaraan) yang lolos debounce.
+    Frame tanpa gerakan (motion gate) tidak masuk YOLO sama sekali; YOLO hanya melihat ROI profil kamera.
+    """
     try:
-        results = yolo(frame)[0]
-
-        for box in results.boxes:
-            cls = int(box.cls[0])
-            if cls == 0:  # class 'plate'
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                crop = frame[y1:y2, x1:x2]
-
-                # OCR
-                ocr_result = ocr.ocr(crop)
-                if ocr_result and ocr_result[0]:
-                    text = ocr_result[0][0][0]
-                    # Clean format: uppercase, no spaces
-                    text = text.upper().replace(' ', '')
-                    return text, (x1, y1, x2, y2)
-
-        return None, None
+        if lane.gate is not None and not lane.gate.check(frame):
+            return _debounced_events(lane)
+        profile = camera_profiles().get(lane.webcam_index, lane.slot_name)  # re-read when the file changes
+        boxes = detect_plate_boxes(frame, yolo, profile)
+        tracks = lane.tracker.update(boxes)
+        to_read = [t for t in tracks if lane.tracker.wants_read(t)]
+        if to_read:
+            crops = [frame[t.bbox[1]:t.bbox[3], t.bbox[0]:t.bbox[2]] for t in to_read]
+            with _ocr_lock:
+                picks = recognize_plates(crops, ocr, camera=lane.webcam_index, rec_only=REC_ONLY,
+                                         variants=profile.preprocs)
+            for track, (text, conf, _, _, _) in zip(to_read, picks):
+                lane.tracker.add_read(track, text, conf, evidence=frame)
     except Exception as e:
-        logger.error(f"Error in extract_plate: {e}")
-        return None, None
+        logger.error(f"[{lane.label}] Error processing frame: {e}")
+
+    return _debounced_events(lane)
+
 
+def _lane_from_config(cam):
+    return Lane(cam["webcam_index"], cam["label"], cam.get("slot_name"), cam.get("motion_roi"))
 
-def send_to_laravel(plate_text, webcam_index, frame=None, slot_name=None):
+
+def _handle_events(lane, events):
+    for event in events:
+        logger.info(f"[{lane.label}] Plat: {event['plate']} (track {event['track_id']}, "
+                    f"{event['reads']} reads, agreement {event['agreement']:.2f})")
+        # evidence = frame of the best read of this vehicle, also when the track closes after it left
+        send_to_laravel(event["plate"], webcam_index=lane.webcam_index, frame=event["evidence"],
+                        slot_name=lane.slot_name, bbox=event["evidence_bbox"])
+
+
+def _debounced_events(lane):
+    events = []
+    now = time.time()
+    for event in lane.tracker.pop_events(now):
+        if event["plate"] == lane.last_plate and now - lane.last_sent < DEBOUNCE_SECONDS:
+            continue
+        lane.last_plate = event["plate"]
+        lane.last_sent = now
+        events.append(event)
+    return events
+
+
+def send_to_laravel(plate_text, webcam_index, frame=None, slot_name=None, bbox=None):
     """
-    Kirim hasil ANPR ke Laravel API.
+    Kirim hasil ANPR ke Laravel API (lewat forwarder, non-blocking).
     Args:
         plate_text: Nomor plat (format: BA3242CD)
         webcam_index: 1 untuk masuk, 2 untuk keluar
-        frame: Frame gambar (optional)
+        frame: Frame bacaan terbaik (optional), dikirim sesuai EVIDENCE_IMAGE / EVIDENCE_TRANSPORT
+        bbox: box plat pada frame tersebut (untuk EVIDENCE_IMAGE=crop)
     """
     try:
         payload = {
@@ -87,28 +171,17 @@ def send_to_laravel(plate_text, webcam_index, frame=None, slot_name=None):
 
         # Include image jika tersedia
         if frame is not None:
-            _, buffer = cv2.imencode('.jpg', frame)
-            img_bytes = buffer.tobytes()
-            payload["image_base64"] = base64.b64encode(img_bytes).decode('utf-8')
-
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
+            attach_evidence(payload, evidence_jpeg(frame=frame, bbox=bbox))
 
         # Include slot_name if provided
         if slot_name:
             payload['slot_name'] = slot_name
 
-        response = requests.post(LARAVEL_API, json=payload, headers=headers, timeout=10)
-        
-        if response.status_code in (200, 201):
-            logger.info(f"[WEBCAM {webcam_index}] Plate {plate_text} sent to Laravel: {response.json()}")
-            return True
-        else:
-            logger.warning(f"[WEBCAM {webcam_index}] Laravel error {response.status_code}: {response.text}")
-            return False
-            
+        # Outbox + flusher thread: loop kamera tidak menunggu Laravel, event tidak hilang saat Laravel down
+        row_id = forwarder.enqueue(payload)
+        logger.info(f"[WEBCAM {webcam_index}] Plate {plate_text} queued for Laravel (outbox #{row_id})")
+        return True
+
     except Exception as e:
         logger.error(f"[WEBCAM {webcam_index}] Error sending to Laravel: {e}")
         return False
@@ -118,57 +191,145 @@ def send_to_laravel(plate_text, webcam_index, frame=None, slot_name=None):
 # MAIN LOOP
 # ==========================
 
+def _lane_worker(lane, capture, stop):
+    """Inference thread per camera: always takes the newest frame, never a queued stale one."""
+    last_seq = 0
+    while not stop.is_set():
+        seq, frame, _ = capture.wait_newer(last_seq, timeout=0.5)
+        if frame is None:
+            # no new frame: still close tracks of a car that left
+            _handle_events(lane, _debounced_events(lane))
+            continue
+        last_seq = seq
+        _handle_events(lane, process_lane_frame(lane, frame))
+
+
+def _display_loop(captures, stop):
+    """imshow must run on the main thread; shows the newest frame of every camera until 'q'."""
+    while not stop.is_set():
+        for name, capture in captures:
+            _, frame, _ = capture.latest()
+            if frame is not None and SHOW_WINDOWS:
+                cv2.imshow(f"ANPR {name}", frame)
+        key = cv2.waitKey(30) & 0xFF if SHOW_WINDOWS else -1
+        if key == ord('q'):
+            stop.set()
+        elif not SHOW_WINDOWS:
+            time.sleep(0.1)
+
+
+def run_threaded(cameras):
+    """One process: a capture thread and an inference thread per camera."""
+    load_runtime(OUTBOX_PATH, cameras_sharing_yolo=len(cameras))
+    forwarder.start()
+
+    stop = threading.Event()
+    captures, lanes, workers = [], [], []
+    try:
+        for cam in cameras:
+            capture = LatestFrameCapture(cam["source"], cam["label"])
+            captures.append((cam["label"], capture))
+            if not capture.is_opened():
+                logger.error(f"Kamera {cam['label']} ({cam['source']}) tidak ditemukan!")
+                return
+
+        lanes = [_lane_from_config(cam) for cam in cameras]
+        for lane, (_, capture) in zip(lanes, captures):
+            capture.start()
+            t = threading.Thread(target=_lane_worker, args=(lane, capture, stop), name=f"lane-{lane.label}",
+                                 daemon=True)
+            t.start()
+            workers.append(t)
+
+        _display_loop(captures, stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # also on a camera that failed to open or an error: the outbox flusher must let go of its lock
+        stop.set()
+        for t in workers:
+            t.join(5)
+        for _, capture in captures:
+            capture.stop()
+        cv2.destroyAllWindows()
+        forwarder.stop()
+    for lane, (_, capture) in zip(lanes, captures):
+        logger.info(f"[{lane.label}] tracker stats: {lane.tracker.stats}, stale frames dropped: {capture.dropped}")
+        if lane.gate is not None:
+            logger.info(f"[{lane.label}] motion gate: {lane.gate.stats()}")
+
+
+def _camera_process(cam, buffer_spec, stop):
+    """Entry point of one camera process (mode process): own models, own outbox, frames from shared memory."""
+    logging.basicConfig(level=logging.INFO)
+    load_runtime(f"{os.path.splitext(OUTBOX_PATH)[0]}_cam{cam['webcam_index']}.sqlite")
+    forwarder.start()
+    buffer = SharedFrameBuffer.attach(buffer_spec)
+    lane = _lane_from_config(cam)
+    last_seq = 0
+    try:
+        while not stop.is_set():
+            seq, frame, _ = buffer.read_newer(last_seq)
+            if frame is None:
+                _handle_events(lane, _debounced_events(lane))
+                time.sleep(0.005)
+                continue
+            last_seq = seq
+            _handle_events(lane, process_lane_frame(lane, frame))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        forwarder.stop()
+        buffer.close()
+        logger.info(f"[{lane.label}] tracker stats: {lane.tracker.stats}")
+
+
+def run_processes(cameras):
+    """Capture threads in this process, one inference process per camera reading shared memory."""
+    ctx = mp.get_context("spawn")  # children load their own models, nothing heavy inherited
+    stop = ctx.Event()
+    captures, buffers, procs = [], [], []
+    try:
+        for cam in cameras:
+            capture = LatestFrameCapture(cam["source"], cam["label"]).start()
+            _, first, _ = capture.wait_newer(0, timeout=5.0)
+            if first is None:
+                logger.error(f"Kamera {cam['label']} ({cam['source']}) tidak ditemukan!")
+                capture.stop()
+                return
+            buffer = SharedFrameBuffer(first.shape, ctx=ctx)
+            capture.on_frame = buffer.write
+            captures.append((cam["label"], capture))
+            buffers.append(buffer)
+            p = ctx.Process(target=_camera_process, args=(cam, buffer.spec(), stop), name=f"anpr-{cam['label']}")
+            p.start()
+            procs.append(p)
+
+        _display_loop(captures, stop)
+    except KeyboardInterrupt:
+        stop.set()
+    finally:
+        stop.set()
+        for p in procs:
+            p.join(10)
+        for _, capture in captures:
+            capture.stop()
+        for buffer in buffers:
+            buffer.close()
+        cv2.destroyAllWindows()
+
+
 def main():
-    cam1 = cv2.VideoCapture(CAMERA_1_ID)
-    cam2 = cv2.VideoCapture(CAMERA_2_ID)
-
-    if not cam1.isOpened() or not cam2.isOpened():
-        logger.error("Kamera tidak ditemukan!")
-        return
-
-    print("\n=== ANPR Dual Camera RUNNING ===")
-    print("Camera 1 (Webcam Index 1) = Pintu MASUK")
-    print("Camera 2 (Webcam Index 2) = Pintu KELUAR\n")
-
-    last_detect_time_in = 0
-    last_detect_time_out = 0
-
-    while True:
-        ret1, frame1 = cam1.read()
-        ret2, frame2 = cam2.read()
-
-        if not ret1 or not ret2:
-            logger.error("Gagal membaca kamera!")
-            break
-
-        # -------------------------
-        # Kamera Pintu Masuk (Webcam Index = 1)
-        # -------------------------
-        plate_in, box_in = extract_plate(frame1)
-        if plate_in and time.time() - last_detect_time_in > DEBOUNCE_SECONDS:
-            logger.info(f"[MASUK] Plat: {plate_in}")
-            send_to_laravel(plate_in, webcam_index=1, frame=frame1, slot_name='Slot-1')
-            last_detect_time_in = time.time()
-
-        # -------------------------
-        # Kamera Pintu Keluar (Webcam Index = 2)
-        # -------------------------
-        plate_out, box_out = extract_plate(frame2)
-        if plate_out and time.time() - last_detect_time_out > DEBOUNCE_SECONDS:
-            logger.info(f"[KELUAR] Plat: {plate_out}")
-            send_to_laravel(plate_out, webcam_index=2, frame=frame2, slot_name='Slot-1')
-            last_detect_time_out = time.time()
-
-        # Tampilkan feed
-        cv2.imshow("ANPR ENTRY CAM (Webcam 1)", frame1)
-        cv2.imshow("ANPR EXIT CAM (Webcam 2)", frame2)
-
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cam1.release()
-    cam2.release()
-    cv2.destroyAllWindows()
+    cameras = load_camera_config()
+    print(f"\n=== ANPR Camera Runner ({CAMERA_MODE} mode, {len(cameras)} kamera) ===")
+    for cam in cameras:
+        print(f"Camera {cam['source']} (Webcam Index {cam['webcam_index']}) = {cam['label']}")
+    print()
+
+    if CAMERA_MODE == "process":
+        run_processes(cameras)
+    else:
+        run_threaded(cameras)
     logger.info("ANPR system stopped")
 
 
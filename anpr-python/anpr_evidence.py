@@ -0,0 +1,159 @@
+# anpr_evidence.py
+"""
+Bukti gambar untuk event ANPR yang dikirim ke Laravel.
+EVIDENCE_IMAGE     : full (gambar asli, tanpa re-encode jika bytes upload tersedia) | thumb (frame diperkecil)
+                     | crop (area plat + margin) | none
+EVIDENCE_TRANSPORT : base64 (image_base64 di JSON, perilaku lama)
+                     | multipart (file 'image' biner; outbox hanya menyimpan hash, file di EvidenceStore)
+                     | store (hanya image_sha256 + image_url; Laravel mengambil gambar dari GET /evidence/<sha256>)
+EvidenceStore menyimpan JPEG berdasarkan SHA-256 isinya (content-addressed), jadi frame yang sama
+tidak disimpan dua kali.
+"""
+import os
+import re
+import base64
+import hashlib
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("anpr_evidence")
+
+EVIDENCE_IMAGE = os.getenv("EVIDENCE_IMAGE", "thumb")
+EVIDENCE_TRANSPORT = os.getenv("EVIDENCE_TRANSPORT", "base64")
+EVIDENCE_THUMB_WIDTH = int(os.getenv("EVIDENCE_THUMB_WIDTH", 640))
+EVIDENCE_JPEG_QUALITY = int(os.getenv("EVIDENCE_JPEG_QUALITY", 80))
+EVIDENCE_CROP_MARGIN = float(os.getenv("EVIDENCE_CROP_MARGIN", 0.25))  # fraksi ukuran plat di tiap sisi
+EVIDENCE_STORE_DIR = os.getenv("EVIDENCE_STORE_DIR", "evidence")
+EVIDENCE_STORE_MAX_MB = float(os.getenv("EVIDENCE_STORE_MAX_MB", 2048))
+EVIDENCE_PUBLIC_URL = os.getenv("EVIDENCE_PUBLIC_URL", "http://localhost:5000")  # base URL yang dipakai Laravel
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+MULTIPART_KEY = "_evidence_sha256"  # payload key: forwarder uploads this stored file as multipart 'image'
+
+
+def _encode(img, quality=None):
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality or EVIDENCE_JPEG_QUALITY])
+    return buf.tobytes() if ok else None
+
+
+def evidence_jpeg(image_bytes=None, frame=None, bbox=None, mode=None):
+    """
+    JPEG bytes to attach to an event, or None.
+    image_bytes: the original upload (returned untouched for mode 'full');
+    frame: decoded BGR frame if the caller already has one; bbox: plate [x1, y1, x2, y2].
+    """
+    mode = mode or EVIDENCE_IMAGE
+    if mode == "none" or (image_bytes is None and frame is None):
+        return None
+    if mode == "full" and image_bytes is not None:
+        return image_bytes
+    if frame is None:
+        frame = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+
+    if mode == "crop" and bbox is not None:
+        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = bbox
+        mx = int((x2 - x1) * EVIDENCE_CROP_MARGIN)
+        my = int((y2 - y1) * EVIDENCE_CROP_MARGIN)
+        crop = frame[max(0, y1 - my):min(h, y2 + my), max(0, x1 - mx):min(w, x2 + mx)]
+        if crop.size:
+            return _encode(crop)
+    if mode in ("thumb", "crop"):  # crop without a bbox falls back to the thumbnail
+        h, w = frame.shape[:2]
+        if w > EVIDENCE_THUMB_WIDTH:
+            frame = cv2.resize(frame, (EVIDENCE_THUMB_WIDTH, int(h * EVIDENCE_THUMB_WIDTH / float(w))),
+                               interpolation=cv2.INTER_AREA)
+        return _encode(frame)
+    return _encode(frame, quality=95)
+
+
+class EvidenceStore:
+    """Content-addressed JPEG store: <dir>/<sha[:2]>/<sha>.jpg, oldest files pruned above max_mb."""
+
+    def __init__(self, directory=None, max_mb=None):
+        self.directory = directory or EVIDENCE_STORE_DIR
+        self.max_bytes = int((max_mb or EVIDENCE_STORE_MAX_MB) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._puts = 0
+
+    def path(self, sha):
+        return os.path.join(self.directory, sha[:2], f"{sha}.jpg")
+
+    def put(self, data):
+        sha = hashlib.sha256(data).hexdigest()
+        path = self.path(sha)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        with self._lock:
+            self._puts += 1
+            prune = self._puts % 100 == 0
+        if prune:
+            self.prune()
+        return sha
+
+    def get(self, sha):
+        if not SHA256_RE.match(sha or ""):
+            return None
+        try:
+            with open(self.path(sha), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def prune(self):
+        """Delete oldest files until the store is below max_bytes."""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".jpg"):
+                    p = os.path.join(root, name)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in files)
+        for _, size, p in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(p)
+                total -= size
+            except OSError:
+                pass
+
+
+_default_store = None
+
+
+def default_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = EvidenceStore()
+    return _default_store
+
+
+def attach_evidence(payload, jpeg, transport=None, store=None):
+    """Add the image to a Laravel payload according to EVIDENCE_TRANSPORT. Returns payload."""
+    if not jpeg:
+        return payload
+    transport = transport or EVIDENCE_TRANSPORT
+    if transport == "base64":
+        payload["image_base64"] = base64.b64encode(jpeg).decode("ascii")
+        return payload
+    sha = (store or default_store()).put(jpeg)
+    if transport == "multipart":
+        payload[MULTIPART_KEY] = sha
+    else:
+        payload["image_sha256"] = sha
+        payload["image_url"] = f"{EVIDENCE_PUBLIC_URL.rstrip('/')}/evidence/{sha}"
+    return payload
@@ -0,0 +1,348 @@
+# anpr_forwarder.py
+"""
+Forwarder hasil ANPR ke Laravel.
+- satu requests.Session (keep-alive, connection pool) untuk semua POST
+- event yang gagal (timeout / koneksi / 5xx) disimpan di outbox SQLite di disk
+- thread flusher mengirim ulang outbox berurutan dengan exponential backoff,
+  beberapa event per siklus (atau satu POST batch jika LARAVEL_BATCH_PATH di-set)
+Payload dengan bukti multipart (anpr_evidence) dikirim sebagai form + file 'image'.
+Event 4xx tidak di-retry (payload salah), dipindah ke status 'dead' agar antrian tidak macet;
+batch yang ditolak 4xx dikirim ulang satu per satu supaya hanya event yang salah yang mati.
+Baris 'dead' dihapus setelah FORWARD_DEAD_RETENTION detik.
+"""
+import os
+import json
+import base64
+import time
+import random
+import sqlite3
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process, always the flusher
+    fcntl = None
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from anpr_evidence import MULTIPART_KEY, default_store
+
+logger = logging.getLogger("anpr_forwarder")
+
+FORWARD_OUTBOX_PATH = os.getenv("FORWARD_OUTBOX_PATH", "outbox.sqlite")
+FORWARD_TIMEOUT = float(os.getenv("FORWARD_TIMEOUT", 5))  # detik per POST
+FORWARD_BACKOFF_BASE = float(os.getenv("FORWARD_BACKOFF_BASE", 0.5))
+FORWARD_BACKOFF_MAX = float(os.getenv("FORWARD_BACKOFF_MAX", 60))
+FORWARD_BATCH_SIZE = int(os.getenv("FORWARD_BATCH_SIZE", 20))
+FORWARD_POOL_SIZE = int(os.getenv("FORWARD_POOL_SIZE", 4))
+LARAVEL_BATCH_PATH = os.getenv("LARAVEL_BATCH_PATH", "")  # kosong = kirim event satu per satu saat flush
+FORWARD_POLL_SECONDS = float(os.getenv("FORWARD_POLL_SECONDS", 1.0))  # cek outbox yang diisi proses lain
+FORWARD_DEAD_RETENTION = float(os.getenv("FORWARD_DEAD_RETENTION", 7 * 24 * 3600))  # detik; 0 = simpan selamanya
+
+
+class RetryableError(Exception):
+    pass
+
+
+class Outbox:
+    """Append-only SQLite queue; rows are delivered strictly in id order."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = self._open()
+        self._pid = os.getpid()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " last_error TEXT)"
+        )
+        return conn
+
+    @property
+    def _conn(self):
+        # a SQLite connection must not be used across fork (gunicorn preload): reopen in the child
+        if self._pid != os.getpid():
+            self._db = self._open()
+            self._pid = os.getpid()
+        return self._db
+
+    def put(self, payload):
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO outbox (payload, created_at) VALUES (?, ?)",
+                (json.dumps(payload), time.time()),
+            )
+            return cur.lastrowid
+
+    def peek(self, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload, attempts FROM outbox WHERE status = 'pending' ORDER BY id LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [(row_id, json.loads(payload), attempts) for row_id, payload, attempts in rows]
+
+    def ack(self, row_ids):
+        if not row_ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in row_ids])
+
+    def fail(self, row_id, error, dead=False):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?, status = ? WHERE id = ?",
+                (str(error)[:500], "dead" if dead else "pending", row_id),
+            )
+
+    def purge_dead(self, older_than):
+        """Delete dead rows created before older_than (unix time). Returns rows removed."""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM outbox WHERE status = 'dead' AND created_at < ?", (older_than,))
+            return cur.rowcount
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return dict(rows)
+
+    def pending(self):
+        return self.counts().get("pending", 0)
+
+
+class LaravelForwarder:
+    def __init__(self, url, token=None, outbox_path=None, timeout=None, batch_size=None,
+                 batch_url=None, backoff_base=None, backoff_max=None, pool_size=None, evidence_store=None,
+                 dead_retention=None):
+        self.url = url
+        self.batch_url = batch_url
+        self.timeout = timeout or FORWARD_TIMEOUT
+        self.batch_size = batch_size or FORWARD_BATCH_SIZE
+        self.backoff_base = backoff_base or FORWARD_BACKOFF_BASE
+        self.backoff_max = backoff_max or FORWARD_BACKOFF_MAX
+        self.dead_retention = FORWARD_DEAD_RETENTION if dead_retention is None else dead_retention
+        self.outbox = Outbox(outbox_path or FORWARD_OUTBOX_PATH)
+        self.evidence_store = evidence_store or default_store()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size or FORWARD_POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json", "Accept": "application/json"})
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+        self._backoff = 0.0
+        self._next_attempt = 0.0
+        self._next_purge = 0.0
+        self._stats_lock = threading.Lock()
+        self.stats = {"sent": 0, "queued": 0, "replayed": 0, "errors": 0, "dead": 0}
+
+    # ---------------------------------------------------------------- public
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._flush_loop, name="laravel-forwarder", daemon=True)
+            self._thread.start()
+            if self.outbox.pending():
+                logger.info(f"Outbox has {self.outbox.pending()} pending events, replaying")
+                self._wake.set()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()  # releases the flusher lock
+            self._lock_file = None
+        self._stop.clear()
+
+    def send(self, payload):
+        """
+        Try to deliver one event now. If older events are still waiting in the outbox,
+        or delivery fails with a retryable error, the event is queued instead so order is kept.
+        Returns (success_bool, response_json_or_text). Queued events return
+        (False, {"queued": True, "outbox_id": id}).
+        """
+        if self.outbox.pending() == 0:
+            try:
+                body = self._post(self.url, payload)
+                self._count("sent")
+                return True, body
+            except RetryableError as e:
+                logger.warning(f"Laravel unavailable ({e}), queueing event to outbox")
+                self._count("errors")
+            except requests.HTTPError as e:
+                # 4xx: payload problem, retrying will not help
+                self._count("errors")
+                return False, e.response.text if e.response is not None else str(e)
+        row_id = self.outbox.put(payload)
+        self._count("queued")
+        self._wake.set()
+        return False, {"queued": True, "outbox_id": row_id}
+
+    def enqueue(self, payload):
+        """Queue without trying inline (fire-and-forget callers)."""
+        row_id = self.outbox.put(payload)
+        self._count("queued")
+        self._wake.set()
+        return row_id
+
+    def flush(self):
+        """Deliver one batch from the outbox. Returns number of delivered events; raises RetryableError."""
+        rows = self.outbox.peek(self.batch_size)
+        if not rows:
+            return 0
+        if self.batch_url:
+            try:
+                self._post(self.batch_url, {"events": [self._inline_evidence(p) for _, p, _ in rows]})
+                self.outbox.ack([row_id for row_id, _, _ in rows])
+                self._count("replayed", len(rows))
+                return len(rows)
+            except requests.HTTPError as e:
+                # 4xx on the whole batch: one bad event (or no batch route); find it one by one below
+                logger.warning(f"Batch of {len(rows)} rejected ({e}), replaying events one by one")
+
+        delivered = []
+        try:
+            for row_id, payload, _ in rows:
+                try:
+                    self._post(self.url, payload)
+                except requests.HTTPError as e:
+                    # drop poison event to the dead state; keep going with the rest
+                    self.outbox.fail(row_id, e, dead=True)
+                    self._count("dead")
+                    continue
+                delivered.append(row_id)
+        except RetryableError as e:
+            self.outbox.fail(row_id, e)
+            raise
+        finally:
+            self.outbox.ack(delivered)
+            self._count("replayed", len(delivered))
+        return len(delivered)
+
+    def purge(self, now=None):
+        """Drop dead rows older than dead_retention. Returns rows removed."""
+        if self.dead_retention <= 0:
+            return 0
+        removed = self.outbox.purge_dead((now or time.time()) - self.dead_retention)
+        if removed:
+            logger.info(f"Purged {removed} dead outbox events older than {self.dead_retention:.0f}s")
+        return removed
+
+    def snapshot(self):
+        with self._stats_lock:
+            out = dict(self.stats)
+        out["outbox"] = self.outbox.counts()
+        out["backoff_s"] = self._backoff
+        return out
+
+    # -------------------------------------------------------------- internals
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _post(self, url, payload):
+        try:
+            if isinstance(payload, dict) and MULTIPART_KEY in payload:
+                # evidence as a binary file part; the outbox row only holds its hash
+                fields = {k: v for k, v in payload.items() if k != MULTIPART_KEY and v is not None}
+                image = self.evidence_store.get(payload[MULTIPART_KEY])
+                files = {"image": (f"{payload[MULTIPART_KEY]}.jpg", image, "image/jpeg")} if image else None
+                r = self.session.post(url, data=fields, files=files, timeout=self.timeout,
+                                      headers={"Content-Type": None})
+            else:
+                r = self.session.post(url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise RetryableError(str(e))
+        if r.status_code >= 500 or r.status_code == 429:
+            raise RetryableError(f"HTTP {r.status_code}")
+        if r.status_code >= 400:
+            logger.error(f"Laravel responded {r.status_code}: {r.text}")
+            r.raise_for_status()
+        try:
+            return r.json()
+        except ValueError:
+            return r.text
+
+    def _inline_evidence(self, payload):
+        """Batch bodies are JSON: multipart evidence is sent as image_base64 there."""
+        if MULTIPART_KEY not in payload:
+            return payload
+        payload = dict(payload)
+        image = self.evidence_store.get(payload.pop(MULTIPART_KEY))
+        if image:
+            payload["image_base64"] = base64.b64encode(image).decode("ascii")
+        return payload
+
+    def _acquire_flusher_lock(self):
+        """
+        Several server workers may share one outbox file; only the process holding
+        <outbox>.lock replays it, so events are not delivered twice or out of order.
+        """
+        if fcntl is None:
+            return True
+        if self._lock_file is None:
+            self._lock_file = open(self.outbox.path + ".lock", "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _flush_loop(self):
+        while not self._acquire_flusher_lock():
+            # another worker is the flusher; take over if it exits
+            if self._stop.wait(FORWARD_POLL_SECONDS):
+                return
+        while not self._stop.is_set():
+            delay = self._next_attempt - time.time()
+            if delay > 0:
+                # backing off: new events only wake us once the delay has passed
+                self._stop.wait(delay)
+            else:
+                # timeout: events queued by other worker processes do not set our _wake
+                self._wake.wait(FORWARD_POLL_SECONDS)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                if time.time() >= self._next_purge:
+                    self.purge()
+                    self._next_purge = time.time() + 3600
+                while self.flush():
+                    pass
+                self._backoff = 0.0
+                self._next_attempt = 0.0
+            except RetryableError as e:
+                self._count("errors")
+                self._backoff = min(self.backoff_max, max(self.backoff_base, self._backoff * 2))
+                # jitter so several gate boxes do not hammer Laravel in lockstep
+                self._next_attempt = time.time() + self._backoff * random.uniform(0.8, 1.2)
+                logger.warning(f"Outbox replay failed ({e}), retry in {self._backoff:.1f}s "
+                               f"({self.outbox.pending()} pending)")
+            except Exception:
+                logger.exception("Outbox flush error")
+                self._backoff = self.backoff_max
+                self._next_attempt = time.time() + self._backoff
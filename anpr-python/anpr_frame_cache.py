@@ -0,0 +1,90 @@
+# anpr_frame_cache.py
+"""
+Cache hasil ANPR untuk frame yang hampir sama (mobil diam di depan palang).
+Key = difference hash (dHash) 64-bit dari frame grayscale yang diperkecil, per kamera.
+Lookup cocok jika jarak Hamming <= max_distance dan entry belum lewat TTL; tiap kamera
+menyimpan paling banyak max_entries entry (LRU).
+Server meng-hash ROI detector dari profil kamera, bukan frame penuh, dan tidak mengirim ulang
+event ke Laravel untuk frame yang kena cache.
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("anpr_frame_cache")
+
+FRAME_CACHE = os.getenv("FRAME_CACHE", "1") == "1"
+FRAME_CACHE_TTL = float(os.getenv("FRAME_CACHE_TTL", 3.0))  # detik
+FRAME_CACHE_MAX = int(os.getenv("FRAME_CACHE_MAX", 32))  # entry per kamera
+FRAME_CACHE_MAX_DISTANCE = int(os.getenv("FRAME_CACHE_MAX_DISTANCE", 4))  # bit berbeda dari 64
+
+
+def dhash(img, hash_size=8):
+    """64-bit difference hash: sign of horizontal gradient on a (hash_size+1) x hash_size thumbnail."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class FrameResultCache:
+    def __init__(self, ttl=None, max_entries=None, max_distance=None):
+        self.ttl = FRAME_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries or FRAME_CACHE_MAX
+        self.max_distance = FRAME_CACHE_MAX_DISTANCE if max_distance is None else max_distance
+        self._lock = threading.Lock()
+        self._cams = {}  # camera -> OrderedDict(hash -> (stored_at, value))
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, camera, frame_hash):
+        """Return cached value for a near-duplicate frame of this camera, or None."""
+        now = time.time()
+        with self._lock:
+            entries = self._cams.get(camera)
+            if entries:
+                for key in [k for k, (t, _) in entries.items() if now - t > self.ttl]:
+                    del entries[key]
+                best_key = None
+                best_dist = self.max_distance + 1
+                for key in entries:
+                    d = hamming(key, frame_hash)
+                    if d < best_dist:
+                        best_key, best_dist = key, d
+                        if d == 0:
+                            break
+                if best_key is not None:
+                    entries.move_to_end(best_key)
+                    self.hits += 1
+                    return entries[best_key][1]
+            self.misses += 1
+            return None
+
+    def put(self, camera, frame_hash, value):
+        with self._lock:
+            entries = self._cams.setdefault(camera, OrderedDict())
+            entries[frame_hash] = (time.time(), value)
+            entries.move_to_end(frame_hash)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": sum(len(e) for e in self._cams.values()),
+                "ttl_s": self.ttl,
+                "max_distance": self.max_distance,
+            }
@@ -0,0 +1,211 @@
+# anpr_jobs.py
+"""
+Bounded background job queue for anpr_api_server async mode.
+Jobs run on a fixed pool of worker threads; when the queue is full, submit() refuses
+instead of growing without limit so camera clients can back off.
+Result callbacks only go to hosts in callback_hosts, so a client cannot make the server
+POST to arbitrary internal addresses.
+Job records live in a JobStore (SQLite); with a file path every gunicorn worker answers
+/jobs/<id>, whichever worker took the job.
+"""
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+
+logger = logging.getLogger("anpr_jobs")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class CallbackNotAllowed(ValueError):
+    pass
+
+
+class JobStore:
+    """Job records in SQLite, shared by every process that opens the same path."""
+
+    FIELDS = ("id", "status", "submitted_at", "started_at", "finished_at", "result", "http_status")
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = self._open()
+        self._pid = os.getpid()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " submitted_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL,"
+            " result TEXT,"
+            " http_status INTEGER)"
+        )
+        return conn
+
+    @property
+    def _conn(self):
+        # a SQLite connection must not be used across fork (gunicorn preload): reopen in the child
+        if self._pid != os.getpid():
+            self._db = self._open()
+            self._pid = os.getpid()
+        return self._db
+
+    def put(self, job_id, submitted_at):
+        with self._lock:
+            self._conn.execute("INSERT INTO jobs (id, status, submitted_at) VALUES (?, 'queued', ?)",
+                               (job_id, submitted_at))
+
+    def update(self, job_id, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                               (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(self.FIELDS)} FROM jobs WHERE id = ?",
+                                     (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(self.FIELDS, row))
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def delete(self, job_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def expire(self, cutoff):
+        """Drop finished jobs that finished before cutoff."""
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,))
+
+
+class JobManager:
+    def __init__(self, workers=2, max_queue=32, result_ttl=600, callback_hosts=(), store_path=None):
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.callback_hosts = {h.strip().lower() for h in callback_hosts if h.strip()}
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.store = JobStore(store_path or ":memory:")
+        self._lock = threading.Lock()
+        self._threads = []
+        # stats
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"anpr-job-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        logger.info(f"Job workers started: {self.workers} (max queue {self._queue.maxsize})")
+
+    def submit(self, fn, *args, callback_url=None, **kwargs):
+        """
+        Queue fn(*args, **kwargs). fn returns (result_dict, http_status). Returns job id;
+        raises QueueFull, or CallbackNotAllowed when callback_url is not http(s) to an allowed host.
+        """
+        if callback_url and not self.callback_allowed(callback_url):
+            raise CallbackNotAllowed(f"callback host not allowed: {urlsplit(callback_url).hostname}")
+        self._expire()
+        job_id = uuid.uuid4().hex
+        submitted = time.time()
+        self.store.put(job_id, submitted)
+        try:
+            self._queue.put_nowait((job_id, submitted, callback_url, fn, args, kwargs))
+        except queue.Full:
+            self.store.delete(job_id)
+            with self._lock:
+                self._rejected += 1
+            raise QueueFull()
+        return job_id
+
+    def callback_allowed(self, url):
+        parts = urlsplit(url)
+        return parts.scheme in ("http", "https") and (parts.hostname or "").lower() in self.callback_hosts
+
+    def get(self, job_id):
+        """Job record (also of jobs taken by another worker sharing store_path), or None."""
+        return self.store.get(job_id)
+
+    def stats(self):
+        """Queue and timing figures of this process only."""
+        with self._lock:
+            done = self._completed + self._failed
+            return {
+                "workers": self.workers,
+                "queue_depth": self._queue.qsize(),
+                "queue_max": self._queue.maxsize,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_s": self._wait_total / done if done else 0.0,
+                "max_wait_s": self._wait_max,
+                "avg_run_s": self._run_total / done if done else 0.0,
+            }
+
+    def _worker(self):
+        while True:
+            job_id, submitted, callback_url, fn, args, kwargs = self._queue.get()
+            started = time.time()
+            self.store.update(job_id, status="running", started_at=started)
+            try:
+                result, http_status = fn(*args, **kwargs)
+                status = "done"
+            except Exception as e:
+                logger.exception(f"Job {job_id} failed")
+                result, http_status = {"success": False, "message": str(e)}, 500
+                status = "failed"
+            finished = time.time()
+            self.store.update(job_id, status=status, finished_at=finished, result=result, http_status=http_status)
+            with self._lock:
+                wait = started - submitted
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._run_total += finished - started
+                if status == "done":
+                    self._completed += 1
+                else:
+                    self._failed += 1
+            if callback_url:
+                self._send_callback(callback_url, job_id, status, http_status, result)
+            self._queue.task_done()
+
+    def _send_callback(self, url, job_id, status, http_status, result):
+        payload = {"job_id": job_id, "status": status, "http_status": http_status, "result": result}
+        try:
+            r = requests.post(url, json=payload, timeout=10)
+            if r.status_code >= 300:
+                logger.warning(f"Job {job_id} callback responded {r.status_code}")
+        except Exception as e:
+            logger.warning(f"Job {job_id} callback failed: {e}")
+
+    def _expire(self):
+        """Drop finished jobs older than result_ttl so the job table stays small."""
+        self.store.expire(time.time() - self.result_ttl)
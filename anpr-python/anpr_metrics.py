@@ -0,0 +1,351 @@
+# anpr_metrics.py
+"""
+Metrik ringan (tanpa dependency) untuk pipeline ANPR, format teks Prometheus di /metrics.
+- Counter, Histogram (bucket tetap), Gauge (nilai atau fungsi yang dibaca saat scrape)
+- biaya per observasi: satu lock + bisect, aman dibiarkan menyala terus
+- multi-worker (gunicorn): jika METRICS_DIR di-set, tiap proses menulis snapshot ke
+  METRICS_DIR/<pid>.json dan /metrics menjumlahkan counter/histogram semua worker;
+  gauge diberi label pid. File worker yang sudah mati dilipat ke METRICS_DIR/dead.json (counter
+  dan histogram saja) lalu dihapus, jadi total tetap monoton dan direktori tidak terus tumbuh.
+"""
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no multi-worker gunicorn
+    fcntl = None
+
+logger = logging.getLogger("anpr_metrics")
+
+METRICS = os.getenv("METRICS", "1") == "1"
+METRICS_DIR = os.getenv("METRICS_DIR", "")  # kosong = satu proses, tanpa agregasi file
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", 5.0))
+
+_capture = threading.local()
+
+ARCHIVE_FILE = "dead.json"  # counters / histograms of workers that exited
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + list(extra or [])
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, n=1, **labels):
+        if not METRICS:
+            return
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+    def dump(self):
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def render(self, series):
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in series]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values = {}  # key -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        samples = getattr(_capture, "samples", None)
+        if samples is not None:
+            samples.append((self.name, _label_key(self.labelnames, labels), value))
+        if not METRICS:
+            return
+        key = _label_key(self.labelnames, labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[idx] += 1
+            row[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def dump(self):
+        with self._lock:
+            return [[list(k), list(v)] for k, v in self._values.items()]
+
+    @staticmethod
+    def merge(a, b):
+        return [x + y for x, y in zip(a, b)]
+
+    def render(self, series):
+        lines = []
+        for key, row in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(row[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+@contextmanager
+def capture_samples():
+    """
+    Collect the raw histogram observations made by this thread inside the block as
+    (metric_name, label_values, value), e.g. for exact per-stage percentiles in benchmarks.
+    """
+    previous = getattr(_capture, "samples", None)
+    _capture.samples = []
+    try:
+        yield _capture.samples
+    finally:
+        _capture.samples = previous
+
+
+class Gauge:
+    """
+    Current value. Either set() explicitly or give fn, called at scrape time, returning a number
+    or a dict {label value tuple: number}. kind='counter' exposes a monotonic value read from
+    elsewhere (e.g. forwarder stats) as a counter.
+    """
+
+    def __init__(self, name, help_text, labelnames=(), fn=None, kind="gauge"):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dump(self):
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception as e:
+                logger.debug(f"metric {self.name} callback failed: {e}")
+                return []
+            if isinstance(value, dict):
+                return [[list(k if isinstance(k, tuple) else (k,)), v] for k, v in value.items()]
+            return [[[], value]]
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def render(self, series):
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in series]
+
+
+class Registry:
+    def __init__(self, directory=None):
+        self.directory = METRICS_DIR if directory is None else directory
+        self._metrics = {}
+        self._thread = None
+
+    def _add(self, metric):
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, labelnames=(), fn=None, kind="gauge"):
+        return self._add(Gauge(name, help_text, labelnames, fn, kind))
+
+    def snapshot(self):
+        return {name: m.dump() for name, m in self._metrics.items()}
+
+    # -------------------------------------------------------- multi-process
+
+    def start_writer(self):
+        """Periodically publish this process's snapshot to METRICS_DIR (no-op without it)."""
+        if not self.directory or self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._write_loop, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def _write_loop(self):
+        while True:
+            self.write_snapshot()
+            time.sleep(METRICS_FLUSH_SECONDS)
+
+    def write_snapshot(self):
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        try:
+            with open(path + ".tmp", "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.debug(f"cannot write metrics snapshot: {e}")
+
+    def _collect(self):
+        """{pid: snapshot} for this process plus every other worker that published one."""
+        own = os.getpid()
+        snapshots = {own: self.snapshot()}
+        if not self.directory or not os.path.isdir(self.directory):
+            return snapshots
+        for fname in os.listdir(self.directory):
+            if not fname.endswith(".json"):
+                continue
+            try:
+                pid = int(fname[:-5])
+            except ValueError:
+                continue
+            if pid == own:
+                continue
+            if not _alive(pid):
+                self._reap(pid)
+                continue
+            try:
+                with open(os.path.join(self.directory, fname)) as f:
+                    snapshots[pid] = json.load(f)
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def _read_archive(self):
+        try:
+            with open(os.path.join(self.directory, ARCHIVE_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _reap(self, pid):
+        """Fold the snapshot of exited worker pid into ARCHIVE_FILE (gauges dropped) and remove it."""
+        path = os.path.join(self.directory, f"{pid}.json")
+        claimed = f"{path}.reap{os.getpid()}"
+        try:
+            os.rename(path, claimed)  # several live workers may scrape at once: one of them wins
+        except OSError:
+            return
+        try:
+            with open(claimed) as f:
+                dead = json.load(f)
+        except (OSError, ValueError):
+            dead = {}
+        archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+        with open(archive_path + ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            archive = self._read_archive()
+            for name, series in dead.items():
+                metric = self._metrics.get(name)
+                if metric is None or metric.kind == "gauge":
+                    continue
+                merged = {tuple(k): v for k, v in archive.get(name, [])}
+                for key, value in series:
+                    key = tuple(key)
+                    merged[key] = metric.merge(merged[key], value) if key in merged else value
+                archive[name] = [[list(k), v] for k, v in merged.items()]
+            with open(archive_path + ".tmp", "w") as f:
+                json.dump(archive, f)
+            os.replace(archive_path + ".tmp", archive_path)
+        os.remove(claimed)
+
+    # ------------------------------------------------------------- exposition
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        snapshots = self._collect()
+        archived = self._read_archive() if self.directory else {}
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            if metric.kind == "gauge" and len(snapshots) > 1:
+                # point-in-time values do not add up across workers: one series per pid
+                for pid, snap in sorted(snapshots.items()):
+                    if not _alive(pid):
+                        continue
+                    for key, value in snap.get(name, []):
+                        lines.append(f"{name}{_format_labels(metric.labelnames, key, [('pid', pid)])} "
+                                     f"{_format_value(value)}")
+                continue
+            merged = {}
+            for snap in list(snapshots.values()) + [archived]:
+                for key, value in snap.get(name, []):
+                    key = tuple(key)
+                    merged[key] = metric.merge(merged[key], value) if key in merged else value
+            lines.extend(metric.render(sorted(merged.items())))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# pipeline metrics shared by anpr_bisa and anpr_api_server
+STAGE_SECONDS = REGISTRY.histogram(
+    "anpr_stage_seconds", "Latency per pipeline stage", ["stage"])
+OCR_VARIANT_CALLS = REGISTRY.counter(
+    "anpr_ocr_variant_images_total", "Images sent to the OCR recognizer per preprocessing variant", ["variant"])
+PLATES_PER_FRAME = REGISTRY.histogram(
+    "anpr_plates_per_frame", "Plates read per processed frame", buckets=(0, 1, 2, 3, 5))
@@ -0,0 +1,89 @@
+# anpr_motion.py
+"""
+Motion gate murah untuk loop kamera kontinu.
+Frame diperkecil ke grayscale (lebar MOTION_WIDTH), dipotong ke ROI, lalu dibandingkan
+dengan background running-average. Inference hanya dijalankan jika ada perubahan, dan tetap
+dijalankan selama MOTION_HOLD_SECONDS setelah gerakan berhenti (mobil berhenti di palang).
+"""
+import os
+import time
+import logging
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("anpr_motion")
+
+MOTION_GATE = os.getenv("MOTION_GATE", "1") == "1"
+MOTION_WIDTH = int(os.getenv("MOTION_WIDTH", 160))  # lebar frame kecil untuk differencing
+MOTION_ROI = os.getenv("MOTION_ROI", "0,0,1,1")  # x1,y1,x2,y2 dalam fraksi frame
+MOTION_PIXEL_DELTA = int(os.getenv("MOTION_PIXEL_DELTA", 25))  # beda intensitas per pixel
+MOTION_MIN_AREA = float(os.getenv("MOTION_MIN_AREA", 0.01))  # fraksi pixel ROI yang harus berubah
+MOTION_HOLD_SECONDS = float(os.getenv("MOTION_HOLD_SECONDS", 2.0))
+MOTION_BG_ALPHA = float(os.getenv("MOTION_BG_ALPHA", 0.05))  # kecepatan adaptasi background
+
+
+def parse_roi(value):
+    """'x1,y1,x2,y2' (fractions) -> tuple of floats; invalid -> full frame."""
+    try:
+        x1, y1, x2, y2 = (float(v) for v in str(value).split(","))
+        if 0 <= x1 < x2 <= 1 and 0 <= y1 < y2 <= 1:
+            return x1, y1, x2, y2
+    except ValueError:
+        pass
+    logger.warning(f"Invalid ROI {value!r}, using full frame")
+    return 0.0, 0.0, 1.0, 1.0
+
+
+class MotionGate:
+    def __init__(self, roi=None, width=None, pixel_delta=None, min_area=None, hold_seconds=None, alpha=None):
+        self.roi = parse_roi(roi or MOTION_ROI) if not isinstance(roi, tuple) else roi
+        self.width = MOTION_WIDTH if width is None else width
+        self.pixel_delta = MOTION_PIXEL_DELTA if pixel_delta is None else pixel_delta
+        self.min_area = MOTION_MIN_AREA if min_area is None else min_area
+        self.hold_seconds = MOTION_HOLD_SECONDS if hold_seconds is None else hold_seconds
+        self.alpha = MOTION_BG_ALPHA if alpha is None else alpha  # 0 = fixed background
+        self._bg = None
+        self._last_motion = None
+        self.frames = 0
+        self.skipped = 0
+
+    def _small_gray(self, frame):
+        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = self.roi
+        crop = frame[int(y1 * h):int(y2 * h), int(x1 * w):int(x2 * w)]
+        ch, cw = crop.shape[:2]
+        scale = self.width / float(max(1, cw))
+        small = cv2.resize(crop, (self.width, max(1, int(ch * scale))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def check(self, frame, now=None):
+        """Return True if inference should run on this frame."""
+        now = time.time() if now is None else now
+        self.frames += 1
+        gray = self._small_gray(frame)
+        if self._bg is None or self._bg.shape != gray.shape:
+            self._bg = gray.astype(np.float32)
+            self._last_motion = now
+            return True
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._bg))
+        changed = np.count_nonzero(diff > self.pixel_delta) / float(diff.size)
+        cv2.accumulateWeighted(gray, self._bg, self.alpha)
+
+        if changed >= self.min_area:
+            self._last_motion = now
+            return True
+        if self._last_motion is not None and now - self._last_motion <= self.hold_seconds:
+            return True
+        self.skipped += 1
+        return False
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skipped_fraction": self.skipped / self.frames if self.frames else 0.0,
+        }
@@ -0,0 +1,197 @@
+# anpr_plate_grammar.py
+"""
+Decoder plat nomor Indonesia berbasis tata bahasa: kode wilayah (1-2 huruf), nomor (1-4 digit,
+tidak diawali 0), seri (0-3 huruf).
+Input: per karakter sebuah distribusi {char: prob} (dari output CTC recognizer, atau dibuat dari
+teks OCR biasa lewat tabel kebingungan huruf/angka). Semua segmentasi yang mungkin dicoba dan
+setiap posisi hanya boleh memilih kelas karakter yang sah (huruf / angka), jadi 'O' di nomor
+menjadi '0' tetapi 'D' di seri tetap 'D'. Kode wilayah yang dikenal mendapat prior.
+"""
+import math
+import re
+
+import numpy as np
+
+REGION_CODES = frozenset((
+    "A", "B", "D", "E", "F", "G", "H", "K", "L", "M", "N", "P", "R", "S", "T", "W", "Z",
+    "AA", "AB", "AD", "AE", "AG", "BA", "BB", "BD", "BE", "BG", "BH", "BK", "BL", "BM", "BN", "BP",
+    "DA", "DB", "DC", "DD", "DE", "DG", "DH", "DK", "DL", "DM", "DN", "DR", "DS", "DT",
+    "EA", "EB", "ED", "KB", "KH", "KT", "KU", "PA", "PB",
+))
+REGIONS_BY_LEN = {n: tuple(sorted(c for c in REGION_CODES if len(c) == n)) for n in (1, 2)}
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+DIGITS = "0123456789"
+
+# what the recognizer confuses across classes (read char -> intended alternatives)
+CONFUSIONS = {
+    "O": "0", "Q": "0", "D": "0", "U": "0", "I": "1", "L": "1", "J": "1", "T": "7",
+    "Z": "2", "S": "5", "B": "8", "G": "6", "A": "4",
+    "0": "OD", "1": "I", "2": "Z", "4": "A", "5": "S", "6": "G", "7": "T", "8": "B",
+    "@": "0O", "|": "1I", "!": "1I", "$": "5S",
+}
+
+TEXT_CHAR_PROB = 0.9      # probability given to the character actually read (text-only input)
+MIN_PROB = 1e-4           # floor for characters missing from a step distribution
+REGION_PRIOR = 0.05       # penalty factor for a prefix that is not a known region code
+TRIM_PROB = 0.1           # penalty factor per dropped leading/trailing character (border noise)
+GAP_PROB = 0.05           # penalty factor per space read inside a group ('B 1387 DKC' has two gaps)
+MIN_TEXT_QUALITY = 0.3   # below this the text is not treated as a plate (returned cleaned, as read)
+NON_PLATE_QUALITY = 0.1  # quality of such non-plate text, so any real plate read outranks it
+MAX_TRIM = 2
+MAX_PREFIX, MAX_DIGITS, MAX_SUFFIX = 2, 4, 3
+
+PLATE_RE = re.compile(r"^([A-Z]{1,2})(\d{1,4})([A-Z]{0,3})$")
+_NON_ALNUM_RE = re.compile(r"[^A-Z0-9 ]+")
+
+_LOG_MIN = math.log(MIN_PROB)
+_LOG_REGION = math.log(REGION_PRIOR)
+_LOG_TRIM = math.log(TRIM_PROB)
+_LOG_GAP = math.log(GAP_PROB)
+
+
+def text_to_steps(text):
+    """
+    Plain OCR text -> (steps, gaps): steps is a list of {char: prob} spreading a little mass to
+    cross-class confusions, gaps the step indices that were preceded by a separator.
+    """
+    steps = []
+    gaps = set()
+    for ch in text.upper():
+        alts = CONFUSIONS.get(ch, "")
+        if ch.isalnum() and ch.isascii():
+            step = {ch: TEXT_CHAR_PROB}
+            share = (1.0 - TEXT_CHAR_PROB) / len(alts) if alts else 0.0
+        elif alts:
+            step = {}
+            share = 1.0 / len(alts)
+        else:
+            if steps:
+                gaps.add(len(steps))  # spaces, dashes, dots: separators only
+            continue
+        for alt in alts:
+            step[alt] = step.get(alt, 0.0) + share
+        steps.append(step)
+    gaps.discard(len(steps))
+    return steps, gaps
+
+
+def ctc_steps(probs, characters, blank=0, top_k=5):
+    """
+    Greedy CTC collapse keeping the distribution of each emitted character.
+    probs: (T, C) softmax output of one image; characters: index -> char (index `blank` is blank).
+    Returns (steps, gaps) like text_to_steps: {char: prob} (top_k) per emitted character and the
+    step indices preceded by a space token.
+    """
+    best = probs.argmax(axis=1)
+    steps = []
+    prev = blank
+    frame_of_step = []
+    for t, idx in enumerate(best):
+        if idx != blank and idx != prev:
+            frame_of_step.append(t)
+        elif idx != blank and probs[t, idx] > probs[frame_of_step[-1], idx]:
+            frame_of_step[-1] = t  # same character continues: keep its most confident frame
+        prev = idx
+    gaps = set()
+    for t in frame_of_step:
+        if characters[best[t]] == " ":
+            if steps:
+                gaps.add(len(steps))  # space token (use_space_char models) only separates groups
+            continue
+        row = probs[t]
+        top = np.argpartition(-row, min(top_k, len(row) - 1))[:top_k]
+        steps.append({str(characters[i]).upper(): float(row[i]) for i in top if i != blank and characters[i] != " "})
+    gaps.discard(len(steps))
+    return steps, gaps
+
+
+def _best_of(step, alphabet):
+    ch, p = max(((c, step.get(c, 0.0)) for c in alphabet), key=lambda kv: kv[1])
+    return ch, math.log(max(p, MIN_PROB))
+
+
+def decode(steps, gaps=()):
+    """
+    Most likely valid plate for per-character distributions. gaps: step indices preceded by a
+    separator; a segmentation that puts one inside a group is penalized.
+    Returns (plate formatted 'B 1387 DKC', confidence 0..1 = geometric mean per input character)
+    or ("", 0.0) when no segmentation is possible.
+    """
+    n = len(steps)
+    if n < 2:
+        return "", 0.0
+    letters = [_best_of(s, LETTERS) for s in steps]
+    digits = [_best_of(s, DIGITS) for s in steps]
+    lead_digits = [_best_of(s, DIGITS[1:]) for s in steps]
+
+    def logp(i, ch):
+        return math.log(max(steps[i].get(ch, 0.0), MIN_PROB))
+
+    best_total, best_plate = -math.inf, ""
+    for head in range(min(MAX_TRIM, n) + 1):
+        for tail in range(min(MAX_TRIM, n) - head + 1):
+            kept = n - head - tail
+            trim_cost = (head + tail) * _LOG_TRIM
+            for p in range(1, MAX_PREFIX + 1):
+                for d in range(1, MAX_DIGITS + 1):
+                    s = kept - p - d
+                    if s < 0 or s > MAX_SUFFIX:
+                        continue
+                    bounds = {head, head + p, head + p + d, n - tail}
+                    gap_cost = sum(_LOG_GAP for g in gaps if g not in bounds)
+                    lo = head
+                    # prefix: best known region code vs best free letters with the prior penalty
+                    free = [letters[lo + i] for i in range(p)]
+                    prefix = "".join(c for c, _ in free)
+                    prefix_lp = sum(lp for _, lp in free) + (0.0 if prefix in REGION_CODES else _LOG_REGION)
+                    for code in REGIONS_BY_LEN[p]:
+                        lp = sum(logp(lo + i, code[i]) for i in range(p))
+                        if lp > prefix_lp:
+                            prefix, prefix_lp = code, lp
+                    lo += p
+                    num = [lead_digits[lo]] + [digits[lo + i] for i in range(1, d)]
+                    lo += d
+                    suf = [letters[lo + i] for i in range(s)]
+                    total = trim_cost + gap_cost + prefix_lp + sum(lp for _, lp in num) + sum(lp for _, lp in suf)
+                    if total > best_total:
+                        best_total = total
+                        parts = [prefix, "".join(c for c, _ in num)]
+                        if suf:
+                            parts.append("".join(c for c, _ in suf))
+                        best_plate = " ".join(parts)
+    if not best_plate:
+        return "", 0.0
+    return best_plate, math.exp(best_total / n)
+
+
+def join_steps(parts):
+    """Concatenate (steps, gaps) of several text lines; each line break counts as a gap."""
+    steps, gaps = [], set()
+    for part_steps, part_gaps in parts:
+        if steps and part_steps:
+            gaps.add(len(steps))
+        gaps.update(g + len(steps) for g in part_gaps)
+        steps.extend(part_steps)
+    return steps, gaps
+
+
+def decode_text(text):
+    """
+    Grammar decode of plain OCR text. Returns (plate, quality) where quality is 1.0 for a read
+    that already fits the grammar and drops with every coercion / trim / misplaced gap.
+    Text that does not look like a plate at all comes back cleaned and unchanged with
+    quality NON_PLATE_QUALITY.
+    """
+    if not text:
+        return "", 0.0
+    plate, conf = decode(*text_to_steps(text))
+    quality = min(1.0, conf / TEXT_CHAR_PROB)
+    if not plate or quality < MIN_TEXT_QUALITY:
+        return clean_text(text), NON_PLATE_QUALITY
+    return plate, quality
+
+
+def clean_text(text):
+    """Uppercase, non-alphanumerics to spaces, collapsed whitespace (no character substitution)."""
+    return " ".join(_NON_ALNUM_RE.sub(" ", text.upper()).split())
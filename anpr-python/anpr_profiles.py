@@ -0,0 +1,177 @@
+# anpr_profiles.py
+"""
+Profil detector per kamera (camera_profiles.json), dibaca ulang otomatis saat file berubah.
+Tiap kamera gerbang hanya melihat plat di area tetap, jadi frame dipotong ke ROI sebelum YOLO
+(lebih cepat dan deteksi palsu di luar jalur hilang), dengan ukuran input, threshold dan
+varian preprocessing OCR sendiri:
+
+    {
+      "default": {"conf": 0.5},
+      "profiles": {
+        "1": {"roi": [0, 0.4, 1, 1], "imgsz": 480, "conf": 0.45, "preprocs": ["original", "clahe"]},
+        "2": {"roi": [[0.1, 0.5], [0.9, 0.45], [1, 1], [0, 1]]},
+        "Slot-2": {"conf": 0.6}
+      }
+    }
+
+Key: "<slot_name>:<webcam_index>", lalu webcam_index, lalu slot_name, lalu "default".
+roi: persegi [x1, y1, x2, y2] atau poligon [[x, y], ...], semua dalam fraksi frame. Untuk poligon
+area di luar poligon diisi abu-abu (114, seperti padding letterbox) dan deteksi yang titik
+tengahnya di luar poligon dibuang.
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("anpr_profiles")
+
+CAMERA_PROFILES = os.getenv("CAMERA_PROFILES", "camera_profiles.json")
+PROFILE_RELOAD_SECONDS = float(os.getenv("PROFILE_RELOAD_SECONDS", 2.0))  # interval cek mtime file
+
+
+class CameraProfile:
+    def __init__(self, name="default", roi=None, imgsz=None, conf=None, preprocs=None):
+        self.name = name
+        self.imgsz = int(imgsz) if imgsz else None
+        self.conf = float(conf) if conf is not None else None
+        self.preprocs = tuple(preprocs) if preprocs else None
+        self.polygon = None  # (N, 2) fractions, only for non-rectangular ROIs
+        self.rect = None     # (x1, y1, x2, y2) fractions
+        if roi:
+            if all(isinstance(v, (int, float)) for v in roi):
+                x1, y1, x2, y2 = (float(v) for v in roi)
+            else:
+                self.polygon = np.array(roi, dtype=np.float32).reshape(-1, 2)
+                (x1, y1), (x2, y2) = self.polygon.min(axis=0), self.polygon.max(axis=0)
+            if not (0 <= x1 < x2 <= 1 and 0 <= y1 < y2 <= 1):
+                raise ValueError(f"invalid roi {roi!r}")
+            self.rect = (float(x1), float(y1), float(x2), float(y2))
+        self._masks = {}
+
+    @classmethod
+    def from_dict(cls, name, data, base=None):
+        merged = dict(base or {})
+        merged.update(data or {})
+        return cls(name, merged.get("roi"), merged.get("imgsz"), merged.get("conf"), merged.get("preprocs"))
+
+    def _pixel_rect(self, w, h):
+        x1, y1, x2, y2 = self.rect
+        return int(x1 * w), int(y1 * h), max(int(x1 * w) + 1, int(round(x2 * w))), max(int(y1 * h) + 1, int(round(y2 * h)))
+
+    def _mask(self, w, h):
+        """Boolean mask (outside polygon) of the ROI crop for a w x h frame; cached per frame size."""
+        mask = self._masks.get((w, h))
+        if mask is None:
+            x1, y1, x2, y2 = self._pixel_rect(w, h)
+            pts = np.round(self.polygon * (w, h) - (x1, y1)).astype(np.int32)
+            inside = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+            cv2.fillPoly(inside, [pts], 1)
+            mask = self._masks[(w, h)] = inside == 0
+        return mask
+
+    def crop(self, img):
+        """Frame -> (detector input, (offset_x, offset_y)). Without ROI the frame itself."""
+        if self.rect is None:
+            return img, (0, 0)
+        h, w = img.shape[:2]
+        x1, y1, x2, y2 = self._pixel_rect(w, h)
+        sub = img[y1:y2, x1:x2]
+        if self.polygon is not None:
+            sub = sub.copy()
+            sub[self._mask(w, h)] = 114
+        return sub, (x1, y1)
+
+    def contains(self, box, w, h):
+        """True if the centre of box (frame coordinates) lies inside the ROI polygon."""
+        if self.polygon is None:
+            return True
+        cx, cy = (box[0] + box[2]) / 2.0 / w, (box[1] + box[3]) / 2.0 / h
+        return cv2.pointPolygonTest(self.polygon.reshape(-1, 1, 2), (float(cx), float(cy)), False) >= 0
+
+    def to_dict(self):
+        roi = self.polygon.tolist() if self.polygon is not None else (list(self.rect) if self.rect else None)
+        return {"roi": roi, "imgsz": self.imgsz, "conf": self.conf,
+                "preprocs": list(self.preprocs) if self.preprocs else None}
+
+
+DEFAULT_PROFILE = CameraProfile()
+
+
+class ProfileStore:
+    """
+    Profiles from a JSON file, re-read when its mtime changes (checked at most every
+    reload_seconds on lookup, so no watcher thread and it works per gunicorn worker).
+    A broken file is logged and the previous profiles stay active.
+    """
+
+    def __init__(self, path=None, reload_seconds=None):
+        self.path = path or CAMERA_PROFILES
+        self.reload_seconds = PROFILE_RELOAD_SECONDS if reload_seconds is None else reload_seconds
+        self._lock = threading.Lock()
+        self._default = DEFAULT_PROFILE
+        self._profiles = {}
+        self._mtime = None
+        self._checked = 0.0
+        self.reloads = 0
+        self._maybe_reload(force=True)
+
+    def _maybe_reload(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked < self.reload_seconds:
+            return
+        self._checked = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            self._mtime = mtime
+            if mtime is None:
+                self._default, self._profiles = DEFAULT_PROFILE, {}
+                return
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+                base = data.get("default", {})
+                default = CameraProfile.from_dict("default", base)
+                profiles = {str(k): CameraProfile.from_dict(str(k), v, base)
+                            for k, v in data.get("profiles", {}).items()}
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                logger.warning(f"Cannot load {self.path}, keeping previous profiles: {e}")
+                return
+            self._default, self._profiles = default, profiles
+            self.reloads += 1
+            logger.info(f"Loaded {len(profiles)} camera profiles from {self.path}")
+
+    def get(self, webcam_index=None, slot_name=None):
+        self._maybe_reload()
+        profiles = self._profiles
+        for key in (f"{slot_name}:{webcam_index}", webcam_index, slot_name):
+            if key is not None and str(key) in profiles:
+                return profiles[str(key)]
+        return self._default
+
+    def snapshot(self):
+        self._maybe_reload()
+        return {"path": self.path, "reloads": self.reloads, "default": self._default.to_dict(),
+                "profiles": {k: p.to_dict() for k, p in self._profiles.items()}}
+
+
+_store = None
+
+
+def camera_profiles():
+    """Process-wide ProfileStore for CAMERA_PROFILES."""
+    global _store
+    if _store is None:
+        _store = ProfileStore()
+    return _store
@@ -0,0 +1,274 @@
+# anpr_reconcile.py
+"""
+Indeks plat yang sedang parkir, untuk mencocokkan bacaan KELUAR dengan bacaan MASUK walau
+OCR salah satu karakter (8 vs B, 0 vs D). Laravel mencari kendaraan keluar dengan car_no yang
+sama persis, jadi plat kanonik (bacaan saat masuk) ikut dikirim sebagai canonical_plate.
+
+- Jarak: edit distance berbobot. Substitusi antar karakter yang sering tertukar (kelas dari
+  anpr_plate_grammar.CONFUSIONS, mis. {0, O, D, Q, U}) murah, substitusi lain / sisip / hapus
+  mahal.
+- Lookup: indeks symmetric-deletion atas "skeleton" plat (karakter diganti wakil kelasnya).
+  BK-tree dengan jarak berbobot ini terlalu kasar untuk memangkas (radius 3 tetap mengunjungi
+  ~15% node, ~6 ms untuk 5000 plat); indeks deletion hanya menghitung jarak untuk beberapa
+  kandidat, jauh di bawah 1 ms. Kunci per plat tumbuh dengan MAX_DISTANCE // EDIT_COST.
+- Jarak terdekat yang seri antara dua plat berbeda = ambigu, tidak dipilih.
+- Isi indeks diambil dari Laravel (GET /anpr/parked) saat start dan tiap RECONCILE_REFRESH_SECONDS,
+  plus event masuk/keluar yang lewat server ini (event selama fetch berjalan diterapkan ulang di
+  atas daftar baru; plat keluar baru dihapus setelah Laravel menerima event-nya). Tiap worker gunicorn punya indeks sendiri;
+  bacaan keluar yang tidak ketemu langsung me-refresh (paling sering tiap RECONCILE_MISS_REFRESH_SECONDS)
+  lalu dicari sekali lagi, supaya masuk yang dilihat worker lain / anpr_dual_cam tetap cocok.
+"""
+import os
+import time
+import logging
+import threading
+
+from anpr_plate_grammar import CONFUSIONS
+
+logger = logging.getLogger("anpr_reconcile")
+
+RECONCILE = os.getenv("RECONCILE", "1") == "1"
+RECONCILE_CONFUSION_COST = int(os.getenv("RECONCILE_CONFUSION_COST", 1))  # 8<->B, 0<->D, ...
+RECONCILE_EDIT_COST = int(os.getenv("RECONCILE_EDIT_COST", 3))  # substitusi lain, sisip, hapus
+RECONCILE_MAX_DISTANCE = int(os.getenv("RECONCILE_MAX_DISTANCE", 3))  # default: satu edit atau 3 kebingungan
+RECONCILE_REFRESH_SECONDS = float(os.getenv("RECONCILE_REFRESH_SECONDS", 300))
+RECONCILE_MISS_REFRESH_SECONDS = float(os.getenv("RECONCILE_MISS_REFRESH_SECONDS", 30))
+RECONCILE_PARKED_PATH = os.getenv("RECONCILE_PARKED_PATH", "anpr/parked")  # relatif ke LARAVEL_API_URL
+
+
+def _confusion_classes(confusions):
+    """Union-find over the alphanumeric confusion pairs -> {char: class id}."""
+    parent = {}
+
+    def find(c):
+        parent.setdefault(c, c)
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
+
+    for read, alts in confusions.items():
+        for alt in alts:
+            if read.isalnum() and alt.isalnum():
+                parent[find(read)] = find(alt)
+    return {c: find(c) for c in parent}
+
+
+CONFUSION_CLASS = _confusion_classes(CONFUSIONS)
+
+
+def normalize_plate(plate):
+    return (plate or "").upper().replace(" ", "")
+
+
+def plate_distance(a, b, confusion_cost=None, edit_cost=None):
+    """Weighted Levenshtein distance between two normalized plates (integer)."""
+    cc = RECONCILE_CONFUSION_COST if confusion_cost is None else confusion_cost
+    ec = RECONCILE_EDIT_COST if edit_cost is None else edit_cost
+    if a == b:
+        return 0
+    prev = [j * ec for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        cur = [i * ec]
+        ka = CONFUSION_CLASS.get(ca)
+        for j, cb in enumerate(b, 1):
+            if ca == cb:
+                sub = prev[j - 1]
+            elif ka is not None and ka == CONFUSION_CLASS.get(cb):
+                sub = prev[j - 1] + cc
+            else:
+                sub = prev[j - 1] + ec
+            cur.append(min(sub, prev[j] + ec, cur[j - 1] + ec))
+        prev = cur
+    return prev[-1]
+
+
+def skeleton(plate):
+    """Plate with every confusable character replaced by its class representative."""
+    return "".join(CONFUSION_CLASS.get(c, c) for c in plate)
+
+
+def _deletions(text, k):
+    """text plus every string obtained by deleting up to k characters."""
+    out = {text}
+    frontier = {text}
+    for _ in range(k):
+        frontier = {s[:i] + s[i + 1:] for s in frontier for i in range(len(s))}
+        out |= frontier
+    return out
+
+
+class DeletionIndex:
+    """
+    Symmetric-deletion index over plate skeletons. Confusions vanish in the skeleton, so a plate
+    within max_distance of a read differs from it by at most max_distance // edit_cost real
+    edits, and two skeletons that close share a key made by that many deletions from each.
+    Lookup = a few dict probes plus plate_distance on the handful of candidates.
+    """
+
+    def __init__(self, max_distance, edit_cost=None):
+        self.max_distance = max_distance
+        self.k = max_distance // (RECONCILE_EDIT_COST if edit_cost is None else edit_cost)
+        self._buckets = {}
+
+    def _keys(self, plate):
+        return _deletions(skeleton(plate), self.k)
+
+    def add(self, plate):
+        for key in self._keys(plate):
+            self._buckets.setdefault(key, set()).add(plate)
+
+    def remove(self, plate):
+        for key in self._keys(plate):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(plate)
+                if not bucket:
+                    del self._buckets[key]
+
+    def search(self, plate):
+        """[(distance, plate)] within max_distance, nearest first."""
+        candidates = set()
+        for key in self._keys(plate):
+            candidates.update(self._buckets.get(key, ()))
+        found = [(plate_distance(plate, c), c) for c in candidates]
+        return sorted(f for f in found if f[0] <= self.max_distance)
+
+
+class ParkedIndex:
+    """
+    Plates currently inside, with fuzzy lookup for exit reads. fetch() -> iterable of plates
+    currently parked (from Laravel); None = only events seen by this process.
+    """
+
+    def __init__(self, fetch=None, max_distance=None, refresh_seconds=None, miss_refresh_seconds=None):
+        self.fetch = fetch
+        self.max_distance = RECONCILE_MAX_DISTANCE if max_distance is None else max_distance
+        self.refresh_seconds = RECONCILE_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self.miss_refresh_seconds = (RECONCILE_MISS_REFRESH_SECONDS if miss_refresh_seconds is None
+                                     else miss_refresh_seconds)
+        self._lock = threading.Lock()
+        self._index = DeletionIndex(self.max_distance)
+        self._plates = set()
+        self._journal = None  # add / remove calls made while a fetch is in flight
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {"exact": 0, "fuzzy": 0, "ambiguous": 0, "miss": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def __len__(self):
+        return len(self._plates)
+
+    def add(self, plate):
+        plate = normalize_plate(plate)
+        if not plate:
+            return
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((True, plate))
+            if plate not in self._plates:
+                self._plates.add(plate)
+                self._index.add(plate)
+
+    def remove(self, plate):
+        plate = normalize_plate(plate)
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((False, plate))
+            if plate in self._plates:
+                self._plates.discard(plate)
+                self._index.remove(plate)
+
+    def replace(self, plates):
+        """
+        Swap in a fresh set of parked plates (e.g. from Laravel). Entries and exits seen while
+        refresh() was fetching it are replayed on top, since the fetched list may predate them.
+        """
+        plates = {normalize_plate(p) for p in plates if normalize_plate(p)}
+        index = DeletionIndex(self.max_distance)
+        for plate in plates:
+            index.add(plate)
+        with self._lock:
+            for added, plate in self._journal or ():
+                if added and plate not in plates:
+                    plates.add(plate)
+                    index.add(plate)
+                elif not added and plate in plates:
+                    plates.discard(plate)
+                    index.remove(plate)
+            self._journal = None
+            self._plates, self._index = plates, index
+
+    def match(self, plate):
+        """
+        Exit read -> (canonical plate or None, distance or None). None when nothing is within
+        max_distance, or when two different parked plates are equally near.
+        """
+        plate = normalize_plate(plate)
+        found = self._search(plate)
+        if not found and self.refresh(min_age=self.miss_refresh_seconds):
+            # entry seen by another worker / process: reload once (fetch timeout bounds the wait)
+            found = self._search(plate)
+        if found == 0:
+            self.stats["exact"] += 1
+            return plate, 0
+        if not found:
+            self.stats["miss"] += 1
+            return None, None
+        if len(found) > 1 and found[1][0] == found[0][0]:
+            self.stats["ambiguous"] += 1
+            logger.info(f"Exit read {plate} ambiguous: {[p for d, p in found if d == found[0][0]]}")
+            return None, found[0][0]
+        self.stats["fuzzy"] += 1
+        return found[0][1], found[0][0]
+
+    def _search(self, plate):
+        """0 for an exact hit, else the [(distance, plate)] found in the index."""
+        with self._lock:
+            if plate in self._plates:
+                return 0
+            return self._index.search(plate)
+
+    def refresh(self, min_age=0.0):
+        """Reload from fetch() unless the last reload is younger than min_age. Returns True if reloaded."""
+        if self.fetch is None or not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            if time.time() - self._last_refresh < min_age:
+                return False
+            self._last_refresh = time.time()
+            with self._lock:
+                self._journal = []
+            try:
+                plates = list(self.fetch())
+            except Exception as e:
+                with self._lock:
+                    self._journal = None
+                self.stats["refresh_errors"] += 1
+                logger.warning(f"Cannot load parked plates: {e}")
+                return False
+            self.replace(plates)
+            self.stats["refreshes"] += 1
+            logger.info(f"Parked plate index rebuilt: {len(self)} plates")
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def start(self):
+        """Background thread: reload now, then every refresh_seconds."""
+        if self._thread is None and self.fetch is not None:
+            self._thread = threading.Thread(target=self._loop, name="parked-index", daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refresh_seconds)
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        return dict(self.stats, parked=len(self), max_distance=self.max_distance)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Reprocess arsip snapshot secara offline dengan pool proses (pengganti script sekali jalan yang
+menghasilkan license_plate_results.json).
+
+Usage:
+    python anpr_reprocess.py images/ "archive/2024-*/**/*.jpg" -o results.jsonl --workers 4
+    python anpr_reprocess.py images/ -o results.jsonl --legacy-json license_plate_results.json
+
+- Tiap worker memuat model sekali (initializer pool), lalu hanya menerima path gambar.
+- Hasil ditulis per gambar sebagai JSON Lines begitu selesai:
+      {"image": "images/test1.jpg", "plates": [{"text", "confidence", "preprocessing_method",
+       "bbox", "detection_confidence"}], "elapsed_ms": 812.3}
+  gambar yang gagal mendapat "error" dan dicoba lagi pada run berikutnya.
+- Resume: gambar yang sudah ada (tanpa error) di file output dilewati; baris terakhir yang
+  terpotong (proses dibunuh) dibuang dulu. --restart untuk mulai dari awal.
+- Progress (jumlah, gambar/s, ETA) ke stderr tiap --progress-seconds.
+- Thread per worker: --threads (default cpu_count // workers), lewat OMP_NUM_THREADS dkk. seperti
+  gunicorn.conf.py supaya workers x threads tidak melebihi jumlah core.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import logging
+import multiprocessing
+
+from anpr_batch import IMAGE_EXTENSIONS
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger("anpr_reprocess")
+
+THREAD_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "OCR_CPU_THREADS", "ORT_THREADS")
+MODELS_NOT_LOADED = "models not loaded"
+
+
+def iter_image_paths(inputs):
+    """Sorted, de-duplicated image files from directories (recursive) and glob patterns."""
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            files = (os.path.join(root, f) for root, _, names in os.walk(item) for f in names)
+        else:
+            files = glob.glob(item, recursive=True)
+        for f in sorted(files):
+            f = os.path.normpath(f)
+            if f.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(f) and f not in seen:
+                seen.add(f)
+                yield f
+
+
+def load_checkpoint(path):
+    """
+    Images already done in an existing JSONL output. A torn last line (killed mid-write) is
+    cut off so appended lines stay parseable; lines with "error" are not counted as done.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            logger.warning(f"{path}: dropping incomplete last line")
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            row = json.loads(line)
+        except ValueError:
+            continue
+        if "error" not in row:
+            done.add(row["image"])
+    return done
+
+
+def to_result_schema(plate):
+    """Pipeline plate dict -> the license_plate_results.json entry format."""
+    return {
+        "text": plate["text"],
+        "confidence": plate["confidence"],
+        "preprocessing_method": plate.get("preprocessing"),
+        "bbox": plate["bbox"],
+        "detection_confidence": plate["detection_confidence"],
+    }
+
+
+# per worker process, set by _init_worker
+_worker = {}
+
+
+def _init_worker(threads, camera):
+    # must not raise: Pool replaces a worker whose initializer fails, forever. Without models
+    # every task answers MODELS_NOT_LOADED and run() aborts.
+    try:
+        from anpr_bisa import setup_models, pin_threads
+        from anpr_profiles import DEFAULT_PROFILE, camera_profiles
+        yolo, ocr = setup_models()
+        if yolo is not None and ocr is not None:
+            pin_threads(threads)
+        _worker.update(yolo=yolo, ocr=ocr, profile=camera_profiles().get(camera) if camera else DEFAULT_PROFILE)
+    except Exception as e:
+        logger.exception(f"worker init failed: {e}")
+
+
+def _process_path(path):
+    from anpr_bisa import process_image_from_array
+    from anpr_decode import decode_frame
+    t0 = time.perf_counter()
+    row = {"image": path}
+    try:
+        if _worker.get("yolo") is None or _worker.get("ocr") is None:
+            raise RuntimeError(MODELS_NOT_LOADED)
+        with open(path, "rb") as f:
+            data = f.read()
+        profile = _worker["profile"]
+        frame = decode_frame(data, target=profile.imgsz, roi=profile.rect)
+        if frame is None:
+            raise ValueError("cannot decode image")
+        plates = process_image_from_array(frame.image, _worker["yolo"], _worker["ocr"], frame=frame, profile=profile)
+        row["plates"] = [to_result_schema(p) for p in plates]
+    except Exception as e:
+        row["error"] = str(e)
+    row["elapsed_ms"] = round(1000.0 * (time.perf_counter() - t0), 1)
+    return row
+
+
+class Progress:
+    """Done / total, throughput over the run and ETA on stderr ('\\r'-updated on a terminal)."""
+
+    def __init__(self, total, skipped, interval, stream=sys.stderr):
+        self.total, self.skipped, self.interval, self.stream = total, skipped, interval, stream
+        self.done = self.plates = self.errors = 0
+        self.started = self._last = time.monotonic()
+        self.tty = stream.isatty()
+
+    def update(self, row):
+        self.done += 1
+        self.plates += len(row.get("plates") or [])
+        self.errors += "error" in row
+        if time.monotonic() - self._last >= self.interval:
+            self.show()
+
+    def line(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rate = self.done / elapsed
+        remaining = self.total - self.done
+        eta = remaining / rate if rate > 0 else float("inf")
+        eta_s = f"{int(eta // 3600)}h{int(eta % 3600 // 60):02d}m{int(eta % 60):02d}s" if rate > 0 else "?"
+        return (f"{self.done + self.skipped}/{self.total + self.skipped} "
+                f"({100.0 * (self.done + self.skipped) / max(1, self.total + self.skipped):.1f}%) "
+                f"{rate:.2f} img/s, plates {self.plates}, errors {self.errors}, ETA {eta_s}")
+
+    def show(self, final=False):
+        self._last = time.monotonic()
+        end = "\n" if final or not self.tty else ""
+        print(("\r" if self.tty else "") + self.line(), end=end, file=self.stream, flush=True)
+
+
+def write_legacy_json(jsonl_path, out_path):
+    """Collapse the JSONL output into the single {image: [plates]} dict of license_plate_results.json."""
+    results = {}
+    with open(jsonl_path) as f:
+        for line in f:
+            row = json.loads(line)
+            if "error" not in row and row.get("plates"):
+                results[row["image"]] = row["plates"]
+    with open(out_path, "w") as f:
+        json.dump(results, f, indent=2)
+    return len(results)
+
+
+def run(args):
+    workers = args.workers or max(1, os.cpu_count() // max(1, args.threads or 1))
+    threads = args.threads or max(1, os.cpu_count() // workers)
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    done = load_checkpoint(args.output)
+    paths = [p for p in iter_image_paths(args.inputs) if p not in done]
+    skipped = len(done)
+    if args.limit:
+        paths = paths[:args.limit]
+    print(f"{len(paths)} images to process ({skipped} already in {args.output}), "
+          f"{workers} workers x {threads} threads", file=sys.stderr)
+    if not paths:
+        return 0
+
+    # spawned workers read these at import of torch / paddle / onnxruntime
+    for var in THREAD_VARS:
+        os.environ[var] = str(threads)
+    progress = Progress(len(paths), skipped, args.progress_seconds)
+    ctx = multiprocessing.get_context("spawn")  # no inherited ORT / OpenMP thread pools
+    status = 0
+    with open(args.output, "a") as out, ctx.Pool(workers, initializer=_init_worker,
+                                                  initargs=(threads, args.camera)) as pool:
+        last_sync = time.monotonic()
+        for row in pool.imap_unordered(_process_path, paths, chunksize=args.chunksize):
+            if row.get("error") == MODELS_NOT_LOADED:
+                print("\nModels not loaded in worker, abort", file=sys.stderr)
+                pool.terminate()
+                status = 1
+                break
+            out.write(json.dumps(row) + "\n")
+            out.flush()
+            progress.update(row)
+            if time.monotonic() - last_sync >= args.progress_seconds:
+                os.fsync(out.fileno())
+                last_sync = time.monotonic()
+    progress.show(final=True)
+    if args.legacy_json and status == 0:
+        n = write_legacy_json(args.output, args.legacy_json)
+        print(f"{n} images with plates written to {args.legacy_json}", file=sys.stderr)
+    return status
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Offline ANPR reprocessing of image directories / globs")
+    parser.add_argument("inputs", nargs="+", help="image directories (recursive) or glob patterns (** allowed)")
+    parser.add_argument("-o", "--output", default="reprocess_results.jsonl", help="JSON Lines output, also the checkpoint")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (0 = cpu_count // threads)")
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads per worker (0 = cpu_count // workers)")
+    parser.add_argument("--chunksize", type=int, default=4, help="paths handed to a worker at a time")
+    parser.add_argument("--camera", default=None, help="apply this camera's profile from CAMERA_PROFILES (ROI, imgsz, conf)")
+    parser.add_argument("--limit", type=int, default=0, help="process at most this many new images")
+    parser.add_argument("--restart", action="store_true", help="discard the existing output instead of resuming")
+    parser.add_argument("--progress-seconds", type=float, default=2.0)
+    parser.add_argument("--legacy-json", default=None, help="also write a license_plate_results.json style dict")
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(run(build_parser().parse_args()))
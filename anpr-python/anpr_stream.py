@@ -0,0 +1,373 @@
+# anpr_stream.py
+"""
+Ingestion streaming untuk klien kamera: satu request HTTP panjang per kamera, bukan POST per frame.
+Klien mengirim body chunked multipart/x-mixed-replace (MJPEG: satu part JPEG per frame) ke
+POST /stream; server membalas di koneksi yang sama dengan NDJSON (satu event JSON per baris).
+- thread pembaca menyimpan hanya frame TERBARU (single slot); frame yang tertimpa sebelum sempat
+  diproses dihitung sebagai dropped, jadi inference yang lambat tidak membuat antrian basi
+- tiap stream punya tracker + debounce sendiri (seperti lajur anpr_dual_cam): satu event per kendaraan
+- event: {"type": "plate", ...}, {"type": "stats", ...} tiap STREAM_STATS_SECONDS, {"type": "end", ...}
+FrameStreamClient adalah klien socket tanpa dependency (dipakai webcam_capture.py) yang menulis
+frame dan membaca event secara bersamaan.
+"""
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from urllib.parse import urlsplit
+
+from anpr_tracker import PlateTracker
+
+logger = logging.getLogger("anpr_stream")
+
+STREAM_BOUNDARY = os.getenv("STREAM_BOUNDARY", "anprframe")
+STREAM_MAX_FRAME_BYTES = int(os.getenv("STREAM_MAX_FRAME_BYTES", 8 * 1024 * 1024))
+STREAM_STATS_SECONDS = float(os.getenv("STREAM_STATS_SECONDS", 5.0))
+STREAM_IDLE_TIMEOUT = float(os.getenv("STREAM_IDLE_TIMEOUT", 30.0))  # detik tanpa frame sebelum stream ditutup
+STREAM_DEBOUNCE_SECONDS = float(os.getenv("STREAM_DEBOUNCE_SECONDS", os.getenv("DEBOUNCE_SECONDS", 4.0)))
+
+
+class StreamError(Exception):
+    pass
+
+
+def boundary_from_content_type(content_type):
+    """'multipart/x-mixed-replace; boundary=xyz' -> 'xyz' (STREAM_BOUNDARY if absent)."""
+    for param in (content_type or "").split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "boundary" and value:
+            return value.strip('"')
+    return STREAM_BOUNDARY
+
+
+class _BufferedReader:
+    """Minimal buffered reader over a raw socket file whose read(n) returns what is available."""
+
+    def __init__(self, raw, chunk=65536):
+        self.raw = raw
+        self.chunk = chunk
+        self.buf = b""
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        data = self.raw.read(self.chunk)
+        if not data:
+            self.eof = True
+            return False
+        self.buf += data
+        return True
+
+    def readline(self, limit=8192):
+        while b"\n" not in self.buf:
+            if len(self.buf) > limit:
+                raise StreamError("header line too long")
+            if not self._fill():
+                line, self.buf = self.buf, b""
+                return line
+        line, _, self.buf = self.buf.partition(b"\n")
+        return line + b"\n"
+
+    def read_exact(self, n):
+        while len(self.buf) < n:
+            if not self._fill():
+                raise StreamError("stream ended inside a frame")
+        data, self.buf = self.buf[:n], self.buf[n:]
+        return data
+
+
+def _read_exact(stream, n):
+    parts = []
+    while n > 0:
+        data = stream.read(n)
+        if not data:
+            raise StreamError("stream ended inside a frame")
+        parts.append(data)
+        n -= len(data)
+    return b"".join(parts)
+
+
+def read_multipart_frames(stream, boundary=None, max_bytes=None):
+    """
+    Yield the body of each part of a multipart/x-mixed-replace stream. Parts with a
+    Content-Length header are read exactly; without it the part runs to the next boundary.
+    Only readline() / read(n) of exactly what is needed: wsgi.input blocks until a read is
+    satisfied, so reading ahead would hold a frame back until the next one arrives.
+    """
+    boundary = (boundary or STREAM_BOUNDARY).encode()
+    max_bytes = max_bytes or STREAM_MAX_FRAME_BYTES
+    dash = b"--" + boundary
+    line = stream.readline(8192)
+    while line:
+        line = line.strip()
+        if not line:
+            line = stream.readline(8192)
+            continue
+        if line == dash + b"--":
+            return
+        if line != dash:
+            raise StreamError(f"expected boundary, got {line[:40]!r}")
+        length = None
+        while True:
+            header = stream.readline(8192).strip()
+            if not header:
+                break
+            name, _, value = header.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value.strip())
+        if length is not None:
+            if length > max_bytes:
+                raise StreamError(f"frame of {length} bytes exceeds {max_bytes}")
+            yield _read_exact(stream, length)
+            line = stream.readline(8192)
+            continue
+        # no Content-Length: collect lines up to the next boundary line
+        body = bytearray()
+        while True:
+            line = stream.readline(65536)
+            if not line or line.rstrip() in (dash, dash + b"--"):
+                break
+            body += line
+            if len(body) > max_bytes:
+                raise StreamError("frame too large")
+        if body.endswith(b"\r\n"):
+            del body[-2:]
+        if body:
+            yield bytes(body)
+
+
+class LatestSlot:
+    """Single-slot handoff: put() overwrites an unconsumed item (counted as dropped)."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self.received += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Newest item, or None on timeout / when closed and empty."""
+        with self._cond:
+            if self._item is None and not self.closed:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class StreamLane:
+    """Tracker + debounce for one streaming camera: one event per vehicle."""
+
+    def __init__(self, webcam_index, slot_name=None, debounce_seconds=None):
+        self.webcam_index = webcam_index
+        self.slot_name = slot_name
+        self.debounce_seconds = STREAM_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        self.tracker = PlateTracker()
+        self.last_plate = None
+        self.last_sent = 0.0
+
+    def pop_events(self, now=None):
+        now = time.time() if now is None else now
+        events = []
+        for event in self.tracker.pop_events(now):
+            if event["plate"] == self.last_plate and now - self.last_sent < self.debounce_seconds:
+                continue
+            self.last_plate = event["plate"]
+            self.last_sent = now
+            events.append(event)
+        return events
+
+
+class StreamSession:
+    """
+    One streaming connection. process(data, final) runs the pipeline on the newest frame
+    (data None = no new frame, only flush finished tracks; final = stream ended, flush all
+    tracks) and returns a list of event dicts.
+    """
+
+    def __init__(self, stream, process, boundary=None, stats_seconds=None, idle_timeout=None):
+        self.stream = stream
+        self.process = process
+        self.boundary = boundary
+        self.stats_seconds = STREAM_STATS_SECONDS if stats_seconds is None else stats_seconds
+        self.idle_timeout = STREAM_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self.slot = LatestSlot()
+        self.processed = 0
+        self.error = None
+        self._last_frame = time.time()
+
+    def _read_loop(self):
+        try:
+            for data in read_multipart_frames(self.stream, self.boundary):
+                self._last_frame = time.time()
+                self.slot.put(data)
+        except Exception as e:  # client gone / malformed body
+            self.error = str(e)
+            logger.info(f"stream reader stopped: {e}")
+        finally:
+            self.slot.close()
+
+    def stats(self):
+        return {"received": self.slot.received, "processed": self.processed, "dropped": self.slot.dropped}
+
+    def events(self):
+        """Generator of NDJSON lines; runs until the client ends the body or goes idle."""
+        threading.Thread(target=self._read_loop, name="stream-reader", daemon=True).start()
+        last_stats = time.time()
+        while True:
+            data = self.slot.get(timeout=0.5)
+            if data is None and self.slot.closed:
+                break
+            if data is None and time.time() - self._last_frame > self.idle_timeout:
+                self.error = "idle timeout"
+                break
+            if data is not None:
+                self.processed += 1
+            for event in self.process(data, False):
+                yield json.dumps(event) + "\n"
+            if self.stats_seconds and time.time() - last_stats >= self.stats_seconds:
+                last_stats = time.time()
+                yield json.dumps(dict(self.stats(), type="stats")) + "\n"
+        # tracks still open when the client stopped: emit what they have
+        for event in self.process(None, True):
+            yield json.dumps(event) + "\n"
+        yield json.dumps(dict(self.stats(), type="end", error=self.error)) + "\n"
+
+
+class FrameStreamClient:
+    """
+    Client for POST /stream over a raw socket: frames go out as chunked multipart parts while
+    a reader thread parses the NDJSON response and calls on_event(dict) for every line.
+    """
+
+    def __init__(self, url, on_event=None, boundary=None, timeout=10.0):
+        self.url = url
+        self.on_event = on_event or (lambda event: None)
+        self.boundary = boundary or STREAM_BOUNDARY
+        self.timeout = timeout
+        self.sock = None
+        self.status = None
+        self.error = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        parts = urlsplit(self.url)
+        self.sock = socket.create_connection((parts.hostname, parts.port or 80), timeout=self.timeout)
+        self.sock.settimeout(None)  # the response may stay silent while frames are being processed
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        head = (f"POST {path} HTTP/1.1\r\n"
+                f"Host: {parts.netloc}\r\n"
+                f"Content-Type: multipart/x-mixed-replace; boundary={self.boundary}\r\n"
+                "Transfer-Encoding: chunked\r\n"
+                "Accept: application/x-ndjson\r\n\r\n")
+        self.sock.sendall(head.encode("latin-1"))
+        self._reader = threading.Thread(target=self._read_loop, name="stream-events", daemon=True)
+        self._reader.start()
+        return self
+
+    @property
+    def alive(self):
+        return self.sock is not None and self.error is None
+
+    def _send_chunk(self, data):
+        with self._lock:
+            if not self.alive:
+                raise StreamError(self.error or "not connected")
+            try:
+                self.sock.sendall(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            except OSError as e:
+                self.error = str(e)
+                raise StreamError(str(e))
+
+    def send(self, jpeg):
+        head = (f"--{self.boundary}\r\nContent-Type: image/jpeg\r\n"
+                f"Content-Length: {len(jpeg)}\r\n\r\n").encode()
+        self._send_chunk(head + jpeg + b"\r\n")
+
+    def close(self, wait=5.0):
+        """End the body and wait (up to `wait` s) for the server's final 'end' event."""
+        if self.sock is None:
+            return
+        try:
+            if self.alive:
+                self._send_chunk(f"--{self.boundary}--\r\n".encode())
+                with self._lock:
+                    self.sock.sendall(b"0\r\n\r\n")
+        except (OSError, StreamError):
+            pass
+        if self._reader is not None:
+            self._reader.join(wait)
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        self.sock = None
+
+    def _read_loop(self):
+        try:
+            reader = _BufferedReader(self.sock.makefile("rb", buffering=0), chunk=4096)
+            status_line = reader.readline().decode("latin-1").split()
+            self.status = int(status_line[1]) if len(status_line) > 1 else None
+            headers = {}
+            while True:
+                line = reader.readline().decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+            if self.status != 200:
+                self.error = f"HTTP {self.status}"
+            pending = b""
+            while True:
+                if chunked:
+                    size = int(reader.readline().split(b";")[0].strip() or b"0", 16)
+                    if size == 0:
+                        break
+                    data = reader.read_exact(size)
+                    reader.read_exact(2)
+                else:  # HTTP/1.0 style: body runs until the server closes
+                    if not reader.buf and not reader._fill():
+                        break
+                    data, reader.buf = reader.buf, b""
+                pending += data
+                while b"\n" in pending:
+                    line, _, pending = pending.partition(b"\n")
+                    if line.strip():
+                        self._emit(line)
+        except (OSError, StreamError, ValueError) as e:
+            if self.error is None:
+                self.error = str(e)
+        finally:
+            if self.error is None:
+                self.error = "stream closed"
+
+    def _emit(self, line):
+        try:
+            event = json.loads(line)
+        except ValueError:
+            logger.debug(f"non-JSON stream line: {line[:80]!r}")
+            return
+        try:
+            self.on_event(event)
+        except Exception:
+            logger.exception("stream on_event callback failed")
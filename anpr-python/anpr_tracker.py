@@ -0,0 +1,195 @@
+# anpr_tracker.py
+"""
+Multi-frame plate tracker untuk kamera realtime.
+Setiap box YOLO dihubungkan ke track (IoU, fallback jarak centroid). Sebuah track hanya
+di-OCR beberapa kali (TRACK_OCR_READS, tiap TRACK_OCR_INTERVAL frame); hasil OCR digabung
+dengan voting per karakter (bobot = confidence OCR) dan tiap kendaraan menghasilkan satu event.
+Bukti (frame + bbox) yang dikirim bersama event diambil dari bacaan dengan confidence tertinggi,
+bukan dari frame saat event keluar (saat itu kendaraan bisa sudah meninggalkan gambar).
+"""
+import os
+import time
+import logging
+from collections import Counter, defaultdict
+
+logger = logging.getLogger("anpr_tracker")
+
+TRACK_IOU = float(os.getenv("TRACK_IOU", 0.3))
+TRACK_MAX_AGE = float(os.getenv("TRACK_MAX_AGE", 1.0))  # detik tanpa deteksi sebelum track ditutup
+TRACK_OCR_READS = int(os.getenv("TRACK_OCR_READS", 3))  # OCR per track sebelum konsensus dikirim
+TRACK_OCR_INTERVAL = int(os.getenv("TRACK_OCR_INTERVAL", 2))  # frame antar OCR pada track yang sama
+TRACK_MIN_READS = int(os.getenv("TRACK_MIN_READS", 2))  # minimal bacaan untuk kirim saat track hilang
+
+
+def iou(a, b):
+    ax1, ay1, ax2, ay2 = a
+    bx1, by1, bx2, by2 = b
+    iw = max(0, min(ax2, bx2) - max(ax1, bx1))
+    ih = max(0, min(ay2, by2) - max(ay1, by1))
+    inter = iw * ih
+    if inter == 0:
+        return 0.0
+    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - inter
+    return inter / float(union)
+
+
+def _centroid_close(a, b):
+    """Fallback match for low frame rates: centroids within half a plate width."""
+    acx, acy = (a[0] + a[2]) / 2.0, (a[1] + a[3]) / 2.0
+    bcx, bcy = (b[0] + b[2]) / 2.0, (b[1] + b[3]) / 2.0
+    reach = 0.5 * max(a[2] - a[0], b[2] - b[0])
+    return abs(acx - bcx) <= reach and abs(acy - bcy) <= reach
+
+
+def vote_plate(reads):
+    """
+    Fuse OCR reads of one vehicle. reads: list of (text, conf).
+    Reads are compared without spaces; the length with the most confidence mass wins,
+    then each position takes the character with the most confidence mass.
+    Returns (text, agreement) where agreement is the mean winning share per position (0..1).
+    """
+    reads = [(t.replace(" ", ""), c) for t, c in reads if t and t.strip()]
+    if not reads:
+        return "", 0.0
+    length_mass = Counter()
+    for text, conf in reads:
+        length_mass[len(text)] += conf
+    length = length_mass.most_common(1)[0][0]
+
+    columns = [defaultdict(float) for _ in range(length)]
+    for text, conf in reads:
+        if len(text) != length:
+            continue
+        for i, ch in enumerate(text):
+            columns[i][ch] += conf
+
+    chars = []
+    shares = []
+    for col in columns:
+        ch, mass = max(col.items(), key=lambda kv: kv[1])
+        chars.append(ch)
+        shares.append(mass / sum(col.values()))
+    return "".join(chars), sum(shares) / len(shares)
+
+
+class Track:
+    __slots__ = ("id", "bbox", "det_conf", "first_seen", "last_seen", "frames",
+                 "last_read_frame", "reads", "emitted", "best_conf", "best_evidence", "best_bbox")
+
+    def __init__(self, track_id, bbox, det_conf, now):
+        self.id = track_id
+        self.bbox = bbox
+        self.det_conf = det_conf
+        self.first_seen = now
+        self.last_seen = now
+        self.frames = 1
+        self.last_read_frame = None
+        self.reads = []
+        self.emitted = False
+        self.best_conf = -1.0
+        self.best_evidence = None
+        self.best_bbox = None
+
+
+class PlateTracker:
+    def __init__(self, iou_thresh=None, max_age=None, ocr_reads=None, ocr_interval=None, min_reads=None):
+        self.iou_thresh = TRACK_IOU if iou_thresh is None else iou_thresh
+        self.max_age = TRACK_MAX_AGE if max_age is None else max_age
+        self.ocr_reads = ocr_reads or TRACK_OCR_READS
+        self.ocr_interval = ocr_interval or TRACK_OCR_INTERVAL
+        self.min_reads = min_reads or TRACK_MIN_READS
+        self.tracks = {}
+        self._next_id = 1
+        self.stats = {"frames": 0, "ocr_calls": 0, "detections": 0, "events": 0}
+
+    def update(self, boxes, now=None):
+        """
+        boxes: list of ((x1, y1, x2, y2), det_conf) for the current frame.
+        Returns the tracks seen in this frame (new or matched), in box order.
+        """
+        now = time.time() if now is None else now
+        self.stats["frames"] += 1
+        self.stats["detections"] += len(boxes)
+
+        # greedy matching, best IoU first
+        pairs = []
+        for bi, (bbox, _) in enumerate(boxes):
+            for tid, tr in self.tracks.items():
+                score = iou(bbox, tr.bbox)
+                if score >= self.iou_thresh or _centroid_close(bbox, tr.bbox):
+                    pairs.append((score, bi, tid))
+        pairs.sort(reverse=True)
+
+        matched = {}
+        used_tracks = set()
+        for _, bi, tid in pairs:
+            if bi in matched or tid in used_tracks:
+                continue
+            matched[bi] = tid
+            used_tracks.add(tid)
+
+        seen = []
+        for bi, (bbox, det_conf) in enumerate(boxes):
+            if bi in matched:
+                tr = self.tracks[matched[bi]]
+                tr.bbox, tr.det_conf, tr.last_seen = bbox, det_conf, now
+                tr.frames += 1
+            else:
+                tr = Track(self._next_id, bbox, det_conf, now)
+                self.tracks[tr.id] = tr
+                self._next_id += 1
+            seen.append(tr)
+        return seen
+
+    def wants_read(self, track):
+        """True if this track should be OCR'd on the current frame."""
+        if track.emitted or len(track.reads) >= self.ocr_reads:
+            return False
+        if track.last_read_frame is None:
+            return True
+        return track.frames - track.last_read_frame >= self.ocr_interval
+
+    def add_read(self, track, text, conf, evidence=None):
+        """
+        Record one OCR read of track. evidence: whatever the caller needs to rebuild the
+        evidence image of this read (frame, or (bytes, frame)); kept for the best read only.
+        """
+        self.stats["ocr_calls"] += 1
+        track.last_read_frame = track.frames
+        if text:
+            track.reads.append((text, conf))
+            if conf > track.best_conf:
+                track.best_conf = conf
+                track.best_evidence = evidence
+                track.best_bbox = track.bbox
+
+    def pop_events(self, now=None):
+        """
+        Consensus events ready to send: tracks that collected ocr_reads reads, or tracks that
+        disappeared with at least min_reads reads. Expired tracks are dropped.
+        Returns list of dicts {track_id, plate, agreement, reads, bbox, first_seen, evidence, evidence_bbox};
+        evidence / evidence_bbox belong to the highest-confidence read (evidence None if not given).
+        """
+        now = time.time() if now is None else now
+        events = []
+        for tid in list(self.tracks):
+            tr = self.tracks[tid]
+            expired = now - tr.last_seen > self.max_age
+            if not tr.emitted and (len(tr.reads) >= self.ocr_reads or (expired and len(tr.reads) >= self.min_reads)):
+                plate, agreement = vote_plate(tr.reads)
+                tr.emitted = True
+                if plate:
+                    self.stats["events"] += 1
+                    events.append({
+                        "track_id": tr.id,
+                        "plate": plate,
+                        "agreement": agreement,
+                        "reads": len(tr.reads),
+                        "bbox": tr.bbox,
+                        "first_seen": tr.first_seen,
+                        "evidence": tr.best_evidence,
+                        "evidence_bbox": tr.best_bbox,
+                    })
+            if expired:
+                del self.tracks[tid]
+        return events
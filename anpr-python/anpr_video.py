@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Audit rekaman DVR: ANPR atas file video, bukan kamera live.
+
+Usage:
+    python anpr_video.py rekaman_gerbang1.mp4 --webcam-index 1 --start 00:12:30 --end 00:20:00
+    python anpr_video.py rekaman.mp4 --stride 3 --no-motion -o events.jsonl --snapshots out/audit
+
+- VideoFileSource: decode di thread sendiri ke antrean terbatas (tidak ada frame yang dibuang
+  seperti kamera live; decode menunggu kalau inference tertinggal). Frame antara sampel
+  (--stride) hanya di-grab, tidak di-retrieve/konversi warna. Seek dengan --start / --end.
+- Motion gate (anpr_motion) pada waktu video: frame tanpa gerakan di ROI tidak mungkin berisi
+  kendaraan baru, jadi tidak masuk YOLO. Ini yang membuat proses lebih cepat dari realtime di CPU.
+- Tracker + debounce sama dengan /stream (StreamLane), tapi "sekarang" = timestamp video,
+  jadi TRACK_MAX_AGE / debounce berlaku dalam detik rekaman, berapa pun kecepatan proses.
+- Tiap event satu baris JSON dengan video_ts (detik sejak awal file, saat kendaraan pertama
+  terlihat) dan video_time (HH:MM:SS.mmm); dengan --recorded-at juga timestamp wall clock.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+
+import cv2
+
+from anpr_motion import MotionGate, MOTION_ROI
+from anpr_stream import StreamLane
+from anpr_evidence import evidence_jpeg
+
+logger = logging.getLogger("anpr_video")
+
+VIDEO_STRIDE = int(os.getenv("VIDEO_STRIDE", 2))  # proses 1 dari N frame
+VIDEO_MOTION = os.getenv("VIDEO_MOTION", "1") == "1"
+VIDEO_QUEUE = int(os.getenv("VIDEO_QUEUE", 8))  # frame ter-decode yang menunggu inference
+REC_ONLY = os.getenv("VIDEO_REC_ONLY", "1") == "1"  # seperti DUAL_CAM_REC_ONLY: crop YOLO langsung ke recognizer
+
+
+def parse_time(value):
+    """'HH:MM:SS(.ms)', 'MM:SS' or seconds -> seconds (None stays None)."""
+    if value is None or value == "":
+        return None
+    seconds = 0.0
+    for part in str(value).split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def format_time(seconds):
+    ms = int(round(seconds * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+
+class VideoFileSource:
+    """
+    Background decoder for a video file. Iterating yields (frame_index, video_ts, frame) for
+    every sampled frame that passed the motion gate, in order; ends at end of file or `end`.
+    """
+
+    def __init__(self, path, stride=None, start=None, end=None, motion=None, motion_roi=None, queue_size=None):
+        self.path = path
+        self.stride = max(1, stride or VIDEO_STRIDE)
+        self.start = start or 0.0
+        self.end = end
+        self.gate = MotionGate(roi=motion_roi or MOTION_ROI) if (VIDEO_MOTION if motion is None else motion) else None
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"cannot open video {path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self.duration = self.frame_count / self.fps if self.frame_count else None
+        if self.start:
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, self.start * 1000.0)  # containers may land on the previous keyframe
+        self.position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES) or 0)
+        self._queue = queue.Queue(maxsize=queue_size or VIDEO_QUEUE)
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"frames": 0, "sampled": 0, "motion_skipped": 0, "yielded": 0}
+        self.last_ts = self.position / self.fps
+
+    def start_decoding(self):
+        self._thread = threading.Thread(target=self._loop, name=f"video-{os.path.basename(self.path)}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        while self._thread is not None and self._thread.is_alive():
+            try:
+                self._queue.get_nowait()  # unblock a decoder waiting on a full queue
+            except queue.Empty:
+                self._thread.join(0.1)
+        self.cap.release()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _loop(self):
+        try:
+            index = self.position
+            while not self._stop.is_set():
+                ts = index / self.fps
+                if self.end is not None and ts > self.end:
+                    break
+                sample = (index - self.position) % self.stride == 0
+                if not self.cap.grab():
+                    break
+                self.stats["frames"] += 1
+                self.last_ts = ts
+                index += 1
+                if not sample:
+                    continue
+                ok, frame = self.cap.retrieve()
+                if not ok:
+                    continue
+                self.stats["sampled"] += 1
+                if self.gate is not None and not self.gate.check(frame, now=ts):
+                    self.stats["motion_skipped"] += 1
+                    continue
+                if not self._put((index - 1, ts, frame)):
+                    break
+        except Exception as e:
+            logger.exception(f"video decode failed: {e}")
+        finally:
+            self._put(None)
+
+    def __iter__(self):
+        if self._thread is None:
+            self.start_decoding()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self.stats["yielded"] += 1
+            yield item
+
+
+class VideoAudit:
+    """
+    Tracker + debounce over a VideoFileSource, driven by video time.
+    detect(frame) -> [((x1, y1, x2, y2), det_conf)], read(crops) -> [(text, conf), ...];
+    wired to detect_plate_boxes / recognize_plates by main().
+    """
+
+    def __init__(self, detect, read, webcam_index=1, slot_name=None, recorded_at=None):
+        self.detect = detect
+        self.read = read
+        self.lane = StreamLane(webcam_index, slot_name)
+        self.recorded_at = recorded_at
+
+    def _event(self, event, emitted_ts):
+        frame_index, frame = event["evidence"] if event["evidence"] is not None else (None, None)
+        out = {
+            "type": "plate",
+            "plate": event["plate"],
+            "video_ts": round(event["first_seen"], 3),
+            "video_time": format_time(event["first_seen"]),
+            "emitted_ts": round(emitted_ts, 3),
+            "frame_index": frame_index,
+            "track_id": event["track_id"],
+            "agreement": round(event["agreement"], 3),
+            "reads": event["reads"],
+            "bbox": [int(v) for v in event["evidence_bbox"] or event["bbox"]],
+            "webcam_index": self.lane.webcam_index,
+        }
+        if self.recorded_at is not None:
+            out["timestamp"] = self.recorded_at + event["first_seen"]
+        return out, frame
+
+    def process(self, frame_index, ts, frame):
+        """One sampled frame. Returns [(event, evidence_frame)]."""
+        tracker = self.lane.tracker
+        boxes = self.detect(frame)
+        tracks = tracker.update(boxes, now=ts)
+        to_read = [t for t in tracks if tracker.wants_read(t)]
+        if to_read:
+            crops = [frame[t.bbox[1]:t.bbox[3], t.bbox[0]:t.bbox[2]] for t in to_read]
+            for track, (text, conf) in zip(to_read, self.read(crops)):
+                tracker.add_read(track, text, conf, evidence=(frame_index, frame))
+        return [self._event(e, ts) for e in self.lane.pop_events(ts)]
+
+    def finish(self, ts):
+        """End of video: close every open track as if it had left the frame."""
+        return [self._event(e, ts) for e in self.lane.pop_events(ts + self.lane.tracker.max_age + 1.0)]
+
+    def run(self, source):
+        """Generator of (event, evidence_frame) over the whole source."""
+        for frame_index, ts, frame in source:
+            for item in self.process(frame_index, ts, frame):
+                yield item
+        for item in self.finish(source.last_ts):
+            yield item
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANPR over recorded video (DVR footage)")
+    parser.add_argument("video", help="video file")
+    parser.add_argument("--webcam-index", type=int, default=1, help="gate camera the footage is from (profile + events)")
+    parser.add_argument("--slot-name", default=None)
+    parser.add_argument("--start", default=None, help="seek to this video time (HH:MM:SS or seconds)")
+    parser.add_argument("--end", default=None, help="stop at this video time")
+    parser.add_argument("--stride", type=int, default=VIDEO_STRIDE, help="process 1 of every N frames")
+    parser.add_argument("--no-motion", dest="motion", action="store_false", default=VIDEO_MOTION,
+                        help="run detection on every sampled frame, not only on motion")
+    parser.add_argument("--motion-roi", default=None, help="x1,y1,x2,y2 fractions (default MOTION_ROI)")
+    parser.add_argument("--recorded-at", type=float, default=None,
+                        help="unix time of the first frame; adds a wall clock timestamp to events")
+    parser.add_argument("-o", "--output", default=None, help="JSON Lines events file (default stdout)")
+    parser.add_argument("--snapshots", default=None, help="directory for one evidence JPEG per event")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from anpr_bisa import setup_models, detect_plate_boxes, recognize_plates
+    from anpr_profiles import camera_profiles
+    yolo, ocr = setup_models(rec_only=REC_ONLY)
+    if yolo is None or ocr is None:
+        print("Models not loaded, abort", file=sys.stderr)
+        return 1
+
+    def detect(frame):
+        return detect_plate_boxes(frame, yolo, camera_profiles().get(args.webcam_index, args.slot_name))
+
+    def read(crops):
+        profile = camera_profiles().get(args.webcam_index, args.slot_name)
+        picks = recognize_plates(crops, ocr, camera=args.webcam_index, rec_only=REC_ONLY,
+                                 variants=profile.preprocs)
+        return [(text, conf) for text, conf, _, _, _ in picks]
+
+    source = VideoFileSource(args.video, stride=args.stride, start=parse_time(args.start), end=parse_time(args.end),
+                             motion=args.motion, motion_roi=args.motion_roi)
+    audit = VideoAudit(detect, read, args.webcam_index, args.slot_name, args.recorded_at)
+    if args.snapshots:
+        os.makedirs(args.snapshots, exist_ok=True)
+    out = open(args.output, "a") if args.output else sys.stdout
+    started, events = time.perf_counter(), 0
+    try:
+        for event, frame in audit.run(source):
+            if args.snapshots and frame is not None:
+                jpeg = evidence_jpeg(frame=frame, bbox=event["bbox"])
+                if jpeg is not None:
+                    name = f"{event['video_time'].replace(':', '-')}_{event['plate']}.jpg"
+                    with open(os.path.join(args.snapshots, name), "wb") as f:
+                        f.write(jpeg)
+                    event["snapshot"] = name
+            out.write(json.dumps(event) + "\n")
+            out.flush()
+            events += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.stop()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - started
+    covered = source.last_ts - source.start
+    print(f"{events} events, {format_time(covered)} of video in {elapsed:.1f}s "
+          f"({covered / max(elapsed, 1e-6):.1f}x realtime), {source.stats}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+# gunicorn.conf.py
+"""
+Production serving: ANPR_WORKERS proses worker untuk anpr_api_server.
+
+    gunicorn -c gunicorn.conf.py anpr_api_server:app
+
+- ANPR_PRELOAD=1: model dimuat sekali di master sebelum fork (tanpa inference), worker berbagi
+  halaman bobot model secara copy-on-write. Tiap worker lalu pin thread, warm-up dan baru ready.
+- ANPR_WORKER_THREADS: thread intra-op per worker (default cpu_count // ANPR_WORKERS) supaya
+  workers x threads tidak melebihi jumlah core.
+- ANPR_WORKER_CLASS=gthread (default): POST /stream (mode default webcam_capture) adalah koneksi
+  kamera yang panjang; worker sync memegangnya sendirian sampai dibunuh setelah timeout, dan dua
+  kamera sudah menghabiskan ANPR_WORKERS=2. ANPR_HTTP_THREADS = koneksi bersamaan per worker.
+  Thread-thread itu memakai model yang sama; INFERENCE_LOCK=1 (default) menjaga satu panggilan
+  YOLO / OCR per model sekaligus, decode dan tracker tetap paralel. Jangan matikan
+  INFERENCE_LOCK dengan gthread. ANPR_WORKER_CLASS=sync hanya untuk klien mode post.
+- Status job async (/jobs/<id>) ada di JOB_STORE_PATH (SQLite), bisa di-poll dari worker mana pun.
+- Outbox Laravel dipakai bersama; hanya satu worker yang me-replay (file lock).
+- /metrics menjumlahkan metrik semua worker lewat snapshot di METRICS_DIR (default direktori
+  sementara baru per master; METRICS_DIR yang di-set sendiri dikosongkan saat master start).
+"""
+import os
+import tempfile
+import multiprocessing
+
+workers = int(os.getenv("ANPR_WORKERS", 2))
+_threads = int(os.getenv("ANPR_WORKER_THREADS", 0)) or max(1, multiprocessing.cpu_count() // workers)
+
+# must be in the environment before torch / paddle / onnxruntime are imported
+os.environ["ANPR_WORKER_THREADS"] = str(_threads)
+for _var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "OCR_CPU_THREADS", "ORT_THREADS"):
+    os.environ.setdefault(_var, str(_threads))
+# fresh directory per master so counters of a previous run are not added in
+if not os.getenv("METRICS_DIR"):
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="anpr_metrics_")
+
+bind = f"0.0.0.0:{os.getenv('ANPR_PORT', 5000)}"
+worker_class = os.getenv("ANPR_WORKER_CLASS", "gthread")
+threads = int(os.getenv("ANPR_HTTP_THREADS", 4)) if worker_class == "gthread" else 1
+preload_app = os.getenv("ANPR_PRELOAD", "1") == "1"
+timeout = int(os.getenv("ANPR_WORKER_TIMEOUT", 120))  # warm-up runs inside each worker
+
+
+def on_starting(server):
+    # a configured METRICS_DIR outlives the master: drop the previous run's worker snapshots
+    directory = os.environ["METRICS_DIR"]
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith((".json", ".tmp")) or ".json.reap" in name:
+                os.remove(os.path.join(directory, name))
+
+
+def when_ready(server):
+    # runs in the master after preload_app, before the first worker is forked
+    if not preload_app:
+        return
+    import gc
+    import anpr_api_server
+
+    anpr_api_server.load_models()
+    # move everything loaded so far out of GC tracking so collections in the workers
+    # do not touch (and un-share) those pages
+    gc.freeze()
+    server.log.info(f"Models preloaded in master, forking {workers} workers x {_threads} threads")
+
+
+def post_fork(server, worker):
+    import anpr_api_server
+
+    anpr_api_server.init_worker()
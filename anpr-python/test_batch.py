@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test script untuk anpr_batch: tar dibaca dari stream yang tidak bisa seek, zip, multipart yang
+di-parse bertahap lewat Flask, dan hasil NDJSON yang keluar per gambar dengan jumlah gambar di
+memori terbatas.
+"""
+
+import io
+import json
+import time
+import tarfile
+import zipfile
+import threading
+
+from flask import Flask, Response, request
+
+from anpr_batch import BatchError, iter_batch_images, run_batch
+
+
+class _Pipe(io.RawIOBase):
+    """Forward-only stream like wsgi.input: no seek/tell."""
+
+    def __init__(self, data):
+        self._buf = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        chunk = self._buf.read(len(b))
+        b[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def _tar(files):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for name, data in files:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def test_archives():
+    files = [("cam1/a.jpg", b"A"), ("notes.txt", b"skip"), ("cam1/b.JPEG", b"BB")]
+    assert list(iter_batch_images("application/gzip", _Pipe(_tar(files)))) == [("cam1/a.jpg", b"A"),
+                                                                              ("cam1/b.JPEG", b"BB")]
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in files:
+            zf.writestr(name, data)
+    assert [n for n, _ in iter_batch_images("application/zip", _Pipe(buf.getvalue()))] == ["cam1/a.jpg",
+                                                                                          "cam1/b.JPEG"]
+    try:
+        iter_batch_images("application/json", io.BytesIO(b"{}"))
+        raise AssertionError("json body must be rejected")
+    except BatchError:
+        pass
+
+
+def test_run_batch_bounded_and_streamed():
+    state = {"read": 0, "max_ahead": 0, "done": 0}
+    lock = threading.Lock()
+
+    def items():
+        for i in range(20):
+            with lock:
+                state["read"] += 1
+                state["max_ahead"] = max(state["max_ahead"], state["read"] - state["done"])
+            yield f"{i}.jpg", b"x" if i != 7 else b"bad"
+
+    def process(name, data):
+        time.sleep(0.01)
+        with lock:
+            state["done"] += 1
+        if data == b"bad":
+            raise ValueError("cannot decode image")
+        return {"plate": "B1234CD", "plates": [{"text": "B1234CD"}]}
+
+    lines = run_batch(items(), process, workers=2)
+    first = json.loads(next(lines))
+    assert first["type"] == "result" and state["read"] < 20  # first result before the whole input is read
+    rows = [first] + [json.loads(line) for line in lines]
+    summary = rows.pop()
+    assert summary["type"] == "summary" and summary["images"] == 20 and summary["errors"] == 1
+    assert summary["plates"] == 19 and sorted(r["index"] for r in rows) == list(range(20))
+    assert [r["error"] for r in rows if "error" in r] == ["cannot decode image"]
+    assert state["max_ahead"] <= 5  # window of workers * 2, plus the item being read
+
+
+def test_multipart_endpoint():
+    app = Flask("batch-test")
+
+    @app.route("/process_batch", methods=["POST"])
+    def process_batch():
+        items = iter_batch_images(request.content_type, request.stream)
+        return Response(run_batch(items, lambda name, data: {"size": len(data)}), mimetype="application/x-ndjson")
+
+    resp = app.test_client().post("/process_batch", content_type="multipart/form-data", data={
+        "image": [(io.BytesIO(b"1234"), "a.jpg"), (io.BytesIO(b"12"), "b.jpg")]})
+    rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert {r["name"]: r["size"] for r in rows[:-1]} == {"a.jpg": 4, "b.jpg": 2}
+    assert rows[-1]["images"] == 2
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All batch tests passed")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script untuk anpr_batcher.BatchingDetector dengan model palsu: pemanggil bersamaan
+digabung jadi satu batch, kwargs berbeda tidak dicampur, dan tiap pemanggil menerima hasilnya sendiri.
+"""
+
+import time
+import threading
+
+from anpr_batcher import BatchingDetector
+
+
+class _FakeModel:
+    """Records every forward pass; the 'result' of an image is (image, kwargs)."""
+
+    names = {0: "plate"}
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+
+    def __call__(self, imgs, **kwargs):
+        self.batches.append((list(imgs), kwargs))
+        if self.fail_on in imgs:
+            raise RuntimeError("bad frame")
+        time.sleep(0.005)
+        return [(img, kwargs) for img in imgs]
+
+
+def _call_all(detector, calls):
+    """Run detector(img, **kwargs) for every (img, kwargs) at once; returns results in call order."""
+    results = [None] * len(calls)
+    barrier = threading.Barrier(len(calls))
+
+    def run(i, img, kwargs):
+        barrier.wait()
+        try:
+            results[i] = detector(img, **kwargs)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, img, kw)) for i, (img, kw) in enumerate(calls)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_callers_share_one_batch():
+    model = _FakeModel()
+    detector = BatchingDetector(model, max_batch=8, max_wait_ms=50)
+    calls = [(f"cam{i}", {"conf": 0.5}) for i in range(4)]
+    results = _call_all(detector, calls)
+    assert results == [[(f"cam{i}", {"conf": 0.5})] for i in range(4)]  # each caller gets its own image back
+    assert len(model.batches) == 1 and sorted(model.batches[0][0]) == ["cam0", "cam1", "cam2", "cam3"]
+    assert detector.stats()["avg_batch"] == 4.0
+    assert detector.names == {0: "plate"}  # model attributes reachable through the wrapper
+
+
+def test_different_kwargs_are_not_mixed():
+    model = _FakeModel()
+    detector = BatchingDetector(model, max_batch=8, max_wait_ms=50)
+    calls = [("a", {"conf": 0.5}), ("b", {"conf": 0.3, "imgsz": 480}), ("c", {"conf": 0.5}),
+             ("d", {"imgsz": 480, "conf": 0.3})]
+    results = _call_all(detector, calls)
+    assert results == [[(img, kw)] for img, kw in calls]
+    groups = sorted((sorted(imgs), kw) for imgs, kw in model.batches)
+    assert groups == [(["a", "c"], {"conf": 0.5}), (["b", "d"], {"conf": 0.3, "imgsz": 480})]
+
+
+def test_max_batch_and_error_isolation():
+    model = _FakeModel(fail_on="bad")
+    detector = BatchingDetector(model, max_batch=2, max_wait_ms=50)
+    results = _call_all(detector, [("bad", {}), ("x", {}), ("y", {}), ("z", {})])
+    assert all(len(imgs) <= 2 for imgs, _ in model.batches)
+    assert isinstance(results[0], RuntimeError)
+    # frames batched with the bad one fail with it, every other caller still gets its own result
+    for img, res in zip("xyz", results[1:]):
+        assert isinstance(res, RuntimeError) or res == [(img, {})]
+    assert sum(isinstance(r, RuntimeError) for r in results) <= 2
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All batcher tests passed")
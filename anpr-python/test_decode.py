@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test script untuk anpr_decode: ukuran dari header JPEG, pemilihan faktor IMREAD_REDUCED,
+pemetaan bbox ke resolusi penuh dan crop plat.
+"""
+
+import cv2
+import numpy as np
+
+from anpr_decode import decode_frame, jpeg_size, reduced_factor
+
+
+def _jpeg(w, h):
+    img = np.zeros((h, w, 3), dtype=np.uint8)
+    cv2.rectangle(img, (w // 4, h // 2), (w // 4 + w // 8, h // 2 + h // 16), (255, 255, 255), -1)
+    return cv2.imencode(".jpg", img)[1].tobytes()
+
+
+def test_jpeg_size_and_factor():
+    assert jpeg_size(_jpeg(1920, 1080)) == (1920, 1080)
+    assert jpeg_size(cv2.imencode(".png", np.zeros((8, 8, 3), np.uint8))[1].tobytes()) is None
+    assert reduced_factor(1920, 1080, 640) == 2
+    assert reduced_factor(1280, 720, 640) == 2
+    assert reduced_factor(1280, 720, 1280) == 1
+    assert reduced_factor(4000, 3000, 480) == 8
+
+
+def test_reduced_decode_and_crops():
+    frame = decode_frame(_jpeg(1920, 1080), target=640, reduced=True, gray=False)
+    assert frame.image.shape == (540, 960, 3) and frame.full_size == (1920, 1080)
+    box = (240, 270, 360, 303)  # the white plate in reduced coordinates
+    assert frame.to_full(box) == (480, 540, 720, 606)
+
+    (crop, full_box), = frame.crops([box], min_height=64)  # too small: cropped at full resolution
+    assert full_box == (480, 540, 720, 606) and crop.shape == (66, 240, 3)
+    (crop, _), = frame.crops([box], min_height=0)  # large enough: reduced crop is used
+    assert crop.shape == (33, 120, 3)
+
+
+def test_grayscale_and_full_paths():
+    data = _jpeg(1280, 720)
+    gray = decode_frame(data, target=640, reduced=True, gray=True)
+    assert gray.image.shape == (360, 640, 3)
+    assert gray.crops([(10, 10, 50, 20)], min_height=64)[0][0].shape == (20, 80, 3)
+
+    full = decode_frame(data, reduced=False)
+    assert full.image.shape == (720, 1280, 3) and not full.reduced
+    assert decode_frame(b"not an image") is None
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All decode tests passed")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script untuk postprocess detector ONNX (anpr_detector) dengan output YOLOv8 sintetis:
+koordinat letterbox kembali ke frame asli, NMS membuang duplikat, threshold confidence berlaku.
+Tidak butuh onnxruntime maupun file model.
+"""
+
+import numpy as np
+
+from anpr_detector import OnnxPlateDetector, letterbox, to_blob
+
+
+def _head(boxes, nc=1):
+    """[(cx, cy, w, h, conf)] in letterboxed pixels -> YOLOv8 output (4 + nc, anchors)."""
+    pred = np.zeros((4 + nc, len(boxes)), dtype=np.float32)
+    for i, (cx, cy, w, h, conf) in enumerate(boxes):
+        pred[:, i] = [cx, cy, w, h, conf] + [0.0] * (nc - 1)
+    return pred
+
+
+def test_letterbox_geometry():
+    img = np.zeros((720, 1280, 3), dtype=np.uint8)
+    boxed, scale, (padx, pady) = letterbox(img, 640)
+    assert boxed.shape == (640, 640, 3) and scale == 0.5 and (padx, pady) == (0, 140)
+    assert boxed[139, 0, 0] == 114 and boxed[140, 0, 0] == 0 and boxed[499, 0, 0] == 0 and boxed[500, 0, 0] == 114
+    blob, metas = to_blob([img, np.zeros((480, 640, 3), dtype=np.uint8)], 320)
+    assert blob.shape == (2, 3, 320, 320) and blob.dtype == np.float32
+    assert metas == [(0.25, (0, 70), (720, 1280)), (0.5, (0, 40), (480, 640))]
+
+
+def test_postprocess_maps_back_and_suppresses():
+    meta = (0.5, (0, 140), (720, 1280))  # 1280x720 frame letterboxed to 640
+    # plate at (100, 200)-(300, 260) in the frame -> center (100, 255), size 100x30 letterboxed
+    pred = _head([
+        (100, 255, 100, 30, 0.9),
+        (102, 256, 100, 30, 0.8),    # same plate, next anchor: removed by NMS
+        (500, 400, 80, 24, 0.7),     # second plate
+        (300, 300, 50, 20, 0.1),     # below conf threshold
+        (635, 150, 30, 20, 0.6),     # sticks out of the right edge: clipped to the frame
+    ])
+    res = OnnxPlateDetector._postprocess(pred, meta, conf_thresh=0.25, iou_thresh=0.45)
+    boxes = res.boxes
+    assert len(boxes) == 3
+    order = np.argsort(-boxes.conf)
+    xyxy = boxes.xyxy[order]
+    np.testing.assert_allclose(xyxy[0], [100, 200, 300, 260], atol=1e-3)
+    np.testing.assert_allclose(xyxy[1], [920, 496, 1080, 544], atol=1e-3)
+    np.testing.assert_allclose(xyxy[2], [1240, 0, 1280, 40], atol=1e-3)
+    np.testing.assert_allclose(boxes.conf[order], [0.9, 0.7, 0.6], atol=1e-6)
+    assert boxes.cls.tolist() == [0, 0, 0]
+
+
+def test_postprocess_nothing_above_threshold():
+    res = OnnxPlateDetector._postprocess(_head([(100, 100, 50, 20, 0.2)]), (1.0, (0, 0), (640, 640)), 0.25, 0.45)
+    assert len(res.boxes) == 0 and res.boxes.xyxy.shape == (0, 4)
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All detector tests passed")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script untuk anpr_evidence: mode gambar (full/thumb/crop), EvidenceStore content-addressed
+dan transport multipart lewat LaravelForwarder ke stand-in HTTP server lokal.
+"""
+
+import os
+import base64
+import hashlib
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from anpr_evidence import MULTIPART_KEY, EvidenceStore, attach_evidence, evidence_jpeg
+from anpr_forwarder import LaravelForwarder
+
+
+def _frame_bytes(w=1280, h=720):
+    frame = np.random.RandomState(0).randint(0, 255, (h, w, 3), dtype=np.uint8)
+    return cv2.imencode(".jpg", frame)[1].tobytes()
+
+
+def test_image_modes():
+    data = _frame_bytes()
+    assert evidence_jpeg(image_bytes=data, mode="full") is data
+    assert evidence_jpeg(image_bytes=data, mode="none") is None
+
+    thumb = cv2.imdecode(np.frombuffer(evidence_jpeg(image_bytes=data, mode="thumb"), np.uint8), cv2.IMREAD_COLOR)
+    assert thumb.shape[1] == 640 and thumb.shape[0] == 360
+
+    crop = cv2.imdecode(np.frombuffer(evidence_jpeg(image_bytes=data, bbox=[100, 200, 300, 260], mode="crop"),
+                                      np.uint8), cv2.IMREAD_COLOR)
+    assert crop.shape[:2] == (60 + 2 * 15, 200 + 2 * 50)  # plate plus 25% margin per side
+
+
+def test_store_and_transports():
+    data = _frame_bytes(320, 240)
+    sha = hashlib.sha256(data).hexdigest()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EvidenceStore(tmp)
+        assert store.put(data) == sha and store.put(data) == sha
+        assert store.get(sha) == data
+        assert store.get("../../etc/passwd") is None
+
+        assert base64.b64decode(attach_evidence({}, data, "base64", store)["image_base64"]) == data
+        assert attach_evidence({}, data, "multipart", store) == {MULTIPART_KEY: sha}
+        stored = attach_evidence({}, data, "store", store)
+        assert stored["image_sha256"] == sha and stored["image_url"].endswith(f"/evidence/{sha}")
+        assert attach_evidence({"plate": "B1234CD"}, None, "base64", store) == {"plate": "B1234CD"}
+
+
+def test_forwarder_multipart():
+    received = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received["type"] = self.headers.get("Content-Type", "")
+            received["body"] = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            out = b'{"success": true}'
+            self.send_response(201)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    data = _frame_bytes(320, 240)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EvidenceStore(os.path.join(tmp, "evidence"))
+        fwd = LaravelForwarder(f"http://127.0.0.1:{server.server_address[1]}/api/anpr/result",
+                               outbox_path=os.path.join(tmp, "outbox.sqlite"), timeout=1, evidence_store=store)
+        ok, body = fwd.send(attach_evidence({"plate": "B1234CD", "mode": "entry", "slot_name": None},
+                                            data, "multipart", store))
+        assert ok and body == {"success": True}
+        fwd.stop()
+    server.shutdown()
+
+    assert received["type"].startswith("multipart/form-data")
+    assert b'name="plate"' in received["body"] and b"B1234CD" in received["body"]
+    assert b'name="image"' in received["body"] and data in received["body"]
+    assert b"slot_name" not in received["body"] and MULTIPART_KEY.encode() not in received["body"]
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All evidence tests passed")
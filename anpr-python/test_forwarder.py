@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Test script untuk anpr_forwarder tanpa Laravel asli.
+Menjalankan stand-in HTTP server lokal yang bisa disetel latency dan error 5xx,
+lalu memastikan event tidak hilang dan urutannya tetap saat outage.
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from anpr_forwarder import LaravelForwarder
+
+
+class StandInLaravel:
+    """Fake /api/anpr/result: records received plates; latency and failure switchable at runtime."""
+
+    def __init__(self, latency=0.0, fail_status=None):
+        self.latency = latency
+        self.fail_status = fail_status  # e.g. 503 -> every request fails
+        self.reject = set()  # plates answered with 422 (alone or inside a batch)
+        self.received = []
+        self.requests = 0
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def do_POST(self):
+                owner.requests += 1
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if owner.latency:
+                    time.sleep(owner.latency)
+                if owner.fail_status:
+                    self._reply(owner.fail_status, {"success": False})
+                    return
+                data = json.loads(body)
+                events = data["events"] if "events" in data else [data]
+                if any(e["plate"] in owner.reject for e in events):
+                    self._reply(422, {"success": False})
+                    return
+                owner.received.extend(e["plate"] for e in events)
+                self._reply(201, {"success": True})
+
+            def _reply(self, status, obj):
+                out = json.dumps(obj).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/anpr/result"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def _wait_for(cond, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cond():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _forwarder(url, tmpdir, **kwargs):
+    return LaravelForwarder(url, outbox_path=os.path.join(tmpdir, "outbox.sqlite"),
+                            timeout=1, backoff_base=0.1, backoff_max=0.5, **kwargs)
+
+
+def test_direct_send():
+    laravel = StandInLaravel()
+    with tempfile.TemporaryDirectory() as tmp:
+        fwd = _forwarder(laravel.url, tmp).start()
+        ok, body = fwd.send({"plate": "B1234CD", "webcam_index": 1})
+        assert ok and body == {"success": True}
+        assert laravel.received == ["B1234CD"]
+        fwd.stop()
+    laravel.close()
+
+
+def test_outage_replays_in_order():
+    laravel = StandInLaravel(fail_status=503)
+    plates = [f"B{i}XY" for i in range(10)]
+    with tempfile.TemporaryDirectory() as tmp:
+        fwd = _forwarder(laravel.url, tmp).start()
+        for p in plates:
+            ok, body = fwd.send({"plate": p, "webcam_index": 1})
+            assert not ok and body["queued"]
+        assert fwd.outbox.pending() == len(plates)
+
+        laravel.fail_status = None  # Laravel back online
+        assert _wait_for(lambda: fwd.outbox.pending() == 0)
+        assert laravel.received == plates
+        fwd.stop()
+    laravel.close()
+
+
+def test_outbox_survives_restart():
+    laravel = StandInLaravel(fail_status=500)
+    with tempfile.TemporaryDirectory() as tmp:
+        fwd = _forwarder(laravel.url, tmp)
+        fwd.send({"plate": "L1389DJ", "webcam_index": 2})
+        fwd.stop()
+
+        laravel.fail_status = None
+        fwd2 = _forwarder(laravel.url, tmp).start()  # new process, same outbox file
+        assert _wait_for(lambda: laravel.received == ["L1389DJ"])
+        fwd2.stop()
+    laravel.close()
+
+
+def test_slow_backend_times_out_to_outbox():
+    laravel = StandInLaravel(latency=2.0)
+    with tempfile.TemporaryDirectory() as tmp:
+        fwd = _forwarder(laravel.url, tmp)
+        t0 = time.time()
+        ok, body = fwd.send({"plate": "K141K", "webcam_index": 1})
+        assert not ok and body["queued"]
+        assert time.time() - t0 < 1.9  # caller is not held for the whole backend latency
+        fwd.stop()
+    laravel.close()
+
+
+def test_batch_flush():
+    laravel = StandInLaravel(fail_status=503)
+    with tempfile.TemporaryDirectory() as tmp:
+        fwd = _forwarder(laravel.url, tmp, batch_url=None, batch_size=5).start()
+        fwd.batch_url = laravel.url  # stand-in accepts {"events": [...]} on the same path
+        for i in range(12):
+            fwd.enqueue({"plate": f"AB{i}C", "webcam_index": 1})
+        requests_before = laravel.requests
+        laravel.fail_status = None
+        assert _wait_for(lambda: len(laravel.received) == 12)
+        assert laravel.received == [f"AB{i}C" for i in range(12)]
+        # 12 events in batches of 5 -> at most a handful of POSTs after recovery
+        assert laravel.requests - requests_before <= 6
+        fwd.stop()
+    laravel.close()
+
+
+def test_batch_rejected_marks_only_bad_event_dead():
+    laravel = StandInLaravel()
+    laravel.reject.add("BAD1")
+    with tempfile.TemporaryDirectory() as tmp:
+        fwd = _forwarder(laravel.url, tmp, batch_url=laravel.url, batch_size=10)
+        for p in ("AB1C", "BAD1", "AB2C"):
+            fwd.enqueue({"plate": p, "webcam_index": 1})
+        assert fwd.flush() == 2
+        assert laravel.received == ["AB1C", "AB2C"]
+        assert fwd.outbox.counts() == {"dead": 1} and fwd.stats["dead"] == 1
+        assert fwd.flush() == 0  # queue is not stuck behind the poison event
+
+        assert fwd.purge(now=time.time() + 3600) == 0  # younger than the retention
+        assert fwd.purge(now=time.time() + fwd.dead_retention + 1) == 1
+        assert fwd.outbox.counts() == {}
+        fwd.stop()
+    laravel.close()
+
+
+def test_shared_outbox_single_flusher():
+    laravel = StandInLaravel(fail_status=503)
+    with tempfile.TemporaryDirectory() as tmp:
+        flusher = _forwarder(laravel.url, tmp).start()
+        assert _wait_for(lambda: flusher._lock_file is not None)
+        other = _forwarder(laravel.url, tmp).start()  # second server worker on the same outbox
+        for p in ("B1AA", "B2BB", "B3CC"):
+            other.send({"plate": p, "webcam_index": 1})
+        assert not other._acquire_flusher_lock()
+
+        laravel.fail_status = None
+        assert _wait_for(lambda: flusher.outbox.pending() == 0)
+        assert laravel.received == ["B1AA", "B2BB", "B3CC"]
+        other.stop()
+        flusher.stop()
+    laravel.close()
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All forwarder tests passed")
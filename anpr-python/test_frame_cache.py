@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script untuk anpr_frame_cache (dHash + TTL + LRU), tanpa model; plus jalur server:
+hasil yang gagal diteruskan ke Laravel tidak boleh di-cache.
+"""
+
+import os
+import time
+import tempfile
+
+import cv2
+import numpy as np
+
+from anpr_frame_cache import FrameResultCache, dhash, hamming
+from anpr_profiles import CameraProfile
+
+
+def _frame(seed, noise=0):
+    rng = np.random.default_rng(seed)
+    img = cv2.resize(rng.integers(0, 255, (12, 16, 3), dtype=np.uint8), (640, 480), interpolation=cv2.INTER_LINEAR)
+    if noise:
+        jitter = np.random.default_rng(seed + 1000).integers(-noise, noise + 1, img.shape)
+        img = np.clip(img.astype(int) + jitter, 0, 255).astype(np.uint8)
+    return img
+
+
+def test_near_duplicate_frames_hash_close():
+    a, b, other = dhash(_frame(1)), dhash(_frame(1, noise=3)), dhash(_frame(2))
+    assert hamming(a, b) <= 4
+    assert hamming(a, other) > 10
+
+
+def test_roi_hash_ignores_motion_outside_roi():
+    profile = CameraProfile(roi=[0, 0.5, 1, 1])  # lane in the lower half
+    car = _frame(1)
+    passer_by = car.copy()
+    passer_by[:200] = _frame(3)[:200]  # someone walks through the top of the picture
+    new_car = car.copy()
+    new_car[260:] = _frame(4)[260:]
+    roi_hash = dhash(profile.crop(car)[0])
+    assert hamming(dhash(car), dhash(passer_by)) > 4  # full frame hash would miss
+    assert dhash(profile.crop(passer_by)[0]) == roi_hash
+    assert hamming(dhash(profile.crop(new_car)[0]), roi_hash) > 4
+
+
+def test_hit_and_miss_per_camera():
+    cache = FrameResultCache(ttl=10, max_entries=4, max_distance=4)
+    h = dhash(_frame(1))
+    cache.put(1, h, ("B1234CD", {"text": "B1234CD"}))
+    assert cache.get(1, dhash(_frame(1, noise=3)))[0] == "B1234CD"
+    assert cache.get(2, h) is None  # other camera never shares results
+    assert cache.get(1, dhash(_frame(2))) is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+
+
+def test_ttl_expiry():
+    cache = FrameResultCache(ttl=0.05, max_entries=4, max_distance=0)
+    h = dhash(_frame(3))
+    cache.put(1, h, (None, "no plate detected"))
+    assert cache.get(1, h) is not None
+    time.sleep(0.1)
+    assert cache.get(1, h) is None
+
+
+def test_lru_eviction():
+    cache = FrameResultCache(ttl=10, max_entries=2, max_distance=0)
+    hashes = [dhash(_frame(s)) for s in (10, 11, 12)]
+    cache.put(1, hashes[0], "a")
+    cache.put(1, hashes[1], "b")
+    assert cache.get(1, hashes[0]) == "a"  # touch -> most recent
+    cache.put(1, hashes[2], "c")           # evicts hashes[1]
+    assert cache.get(1, hashes[1]) is None
+    assert cache.get(1, hashes[0]) == "a"
+
+
+def test_failed_forward_is_not_cached():
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)  # outbox / job store of the imported server land in the temp dir
+        try:
+            import anpr_api_server as server
+        finally:
+            os.chdir(cwd)
+        plates = [{"text": "B1234CD", "confidence": 0.9, "detection_confidence": 0.9, "bbox": [10, 10, 90, 40]}]
+        outcomes = [(False, "HTTP 422"), (True, {"success": True})]
+        sent = []
+
+        def send(plate_text, **kwargs):
+            sent.append(plate_text)
+            return outcomes.pop(0)
+
+        saved = server.process_image_from_array, server.send_to_laravel_api
+        server.process_image_from_array = lambda *args, **kwargs: [dict(p) for p in plates]
+        server.send_to_laravel_api = send
+        try:
+            jpeg = cv2.imencode(".jpg", _frame(20))[1].tobytes()
+            first, status = server._run_anpr_job(jpeg, 1, None, None)
+            assert status == 500 and not first["success"]
+            second, status = server._run_anpr_job(jpeg, 1, None, None)  # same frame: must be forwarded again
+            assert status == 200 and not second.get("cached") and sent == ["B1234CD", "B1234CD"]
+            third, status = server._run_anpr_job(jpeg, 1, None, None)
+            assert third["cached"] and len(sent) == 2
+        finally:
+            server.process_image_from_array, server.send_to_laravel_api = saved
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All frame cache tests passed")
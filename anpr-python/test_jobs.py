@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script untuk anpr_jobs (antrean job async): antrean penuh ditolak, hasil lama dibuang
+setelah result_ttl, callback hanya ke host yang diizinkan, status job terlihat dari worker lain.
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from anpr_jobs import CallbackNotAllowed, JobManager, QueueFull
+
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_queue_full_rejects():
+    jobs = JobManager(workers=1, max_queue=2)  # workers not started: nothing leaves the queue
+    for _ in range(2):
+        jobs.submit(lambda: ({}, 200))
+    try:
+        jobs.submit(lambda: ({}, 200))
+        raise AssertionError("third job must be refused")
+    except QueueFull:
+        pass
+    stats = jobs.stats()
+    assert stats["rejected"] == 1 and stats["queue_depth"] == 2
+
+
+def test_finished_jobs_expire():
+    jobs = JobManager(workers=1, max_queue=4, result_ttl=0.2)
+    jobs.start()
+    job_id = jobs.submit(lambda x: ({"plate": x}, 200), "B1234CD")
+    assert _wait_for(lambda: jobs.get(job_id)["status"] == "done")
+    assert jobs.get(job_id)["result"] == {"plate": "B1234CD"}
+    time.sleep(0.3)
+    jobs.submit(lambda: ({}, 200))  # submit sweeps finished jobs older than result_ttl
+    assert jobs.get(job_id) is None
+
+
+def test_job_visible_from_other_worker():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "jobs.sqlite")
+        owner = JobManager(workers=1, max_queue=4, store_path=path)
+        other = JobManager(workers=1, max_queue=4, store_path=path)  # another gunicorn worker
+        owner.start()
+        job_id = owner.submit(lambda x: ({"plate": x, "conf": 0.9}, 200), "B1234CD")
+        assert other.get(job_id)["status"] in ("queued", "running", "done")
+        assert _wait_for(lambda: other.get(job_id)["status"] == "done")
+        job = other.get(job_id)
+        assert job["result"] == {"plate": "B1234CD", "conf": 0.9} and job["http_status"] == 200
+        assert other.get("unknown") is None
+
+
+def test_callback_only_to_allowed_hosts():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    jobs = JobManager(workers=1, max_queue=4, callback_hosts=["127.0.0.1"])
+    jobs.start()
+    for url in ("http://169.254.169.254/latest/meta-data", "file:///etc/passwd", f"http://localhost:{port}/cb"):
+        try:
+            jobs.submit(lambda: ({}, 200), callback_url=url)
+            raise AssertionError(f"{url} must be refused")
+        except CallbackNotAllowed:
+            pass
+    job_id = jobs.submit(lambda: ({"plate": "L1389DJ"}, 200), callback_url=f"http://127.0.0.1:{port}/cb")
+    assert _wait_for(lambda: received)
+    assert received == [{"job_id": job_id, "status": "done", "http_status": 200, "result": {"plate": "L1389DJ"}}]
+    assert "callback_url" not in jobs.get(job_id)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All job tests passed")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test script untuk anpr_plate_grammar (decoder plat Indonesia), tanpa model.
+"""
+
+import numpy as np
+
+from anpr_plate_grammar import MIN_TEXT_QUALITY, ctc_steps, decode, decode_text, text_to_steps
+from anpr_bisa import post_process_license_plate, _pick_best_candidate
+
+
+def test_letters_stay_letters_outside_the_number():
+    # the old global table turned every D/L/O into digits, also in region and suffix
+    assert post_process_license_plate("L 1389 DJ") == "L 1389 DJ"
+    assert post_process_license_plate("B1387DKC") == "B 1387 DKC"
+    assert post_process_license_plate("B 1O87 DKC") == "B 1087 DKC"
+    assert post_process_license_plate("81387 DKC") == "B 1387 DKC"
+
+
+def test_separators_and_border_noise():
+    assert decode_text("|B-1656-SPW.")[0] == "B 1656 SPW"
+    assert decode_text("8 I387 0KC")[0] == "B 1387 DKC"
+    steps, gaps = text_to_steps("B 1387 DKC")
+    assert gaps == {1, 5}
+    assert decode(steps, gaps)[0] == "B 1387 DKC"
+
+
+def test_non_plate_text_is_only_cleaned():
+    assert decode_text("")[0] == ""
+    assert decode_text("a")[0] == "A"
+    text, quality = decode_text("hello world")
+    assert text == "HELLO WORLD"
+    assert quality < decode_text("B 1387 DKC")[1]
+    assert quality < MIN_TEXT_QUALITY
+
+
+def test_ctc_probabilities_choose_valid_class():
+    chars = ["blank"] + list("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+    seq = ["B", None, "1", "3", None, "8", "7", None, "D", "K", "C"]
+    probs = np.full((len(seq), len(chars)), 1e-3)
+    for t, c in enumerate(seq):
+        probs[t, 0 if c is None else chars.index(c)] = 0.9
+    # first suffix letter read as '0' slightly above 'D'
+    probs[8, chars.index("0")], probs[8, chars.index("D")] = 0.5, 0.4
+    steps, gaps = ctc_steps(probs, chars)
+    assert len(steps) == 8
+    plate, conf = decode(steps, gaps)
+    assert plate == "B 1387 DKC"
+    assert 0.5 < conf <= 1.0
+
+
+def test_pick_best_prefers_grammar_fit():
+    best = _pick_best_candidate([("gray", "B1387DK0", 0.95), ("otsu", "B 1387 DKC", 0.9)])
+    assert best[0] == "B 1387 DKC" and best[2] == "otsu"
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All plate grammar tests passed")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script untuk anpr_profiles: pemilihan profil per kamera, reload file tanpa restart,
+dan deteksi yang hanya melihat ROI (detector palsu, tanpa model YOLO).
+"""
+
+import os
+import json
+import time
+import tempfile
+
+import numpy as np
+
+from anpr_bisa import detect_plate_boxes
+from anpr_detector import DetBoxes, DetResult
+from anpr_profiles import ProfileStore
+
+
+class FakeDetector:
+    """Returns fixed boxes in input-image coordinates and records what it was called with."""
+
+    def __init__(self, boxes):
+        self.boxes = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+        self.calls = []
+
+    def __call__(self, img, **kwargs):
+        self.calls.append((img.shape, kwargs))
+        n = len(self.boxes)
+        return [DetResult(DetBoxes(self.boxes, np.full(n, 0.9, np.float32), np.zeros(n, np.int64)))]
+
+
+def _write(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def test_lookup_and_reload():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "profiles.json")
+        _write(path, {"default": {"conf": 0.5},
+                      "profiles": {"1": {"imgsz": 480}, "Slot-2": {"conf": 0.7}, "Slot-2:2": {"conf": 0.3}}})
+        store = ProfileStore(path, reload_seconds=0)
+        assert store.get(1).imgsz == 480 and store.get(1).conf == 0.5  # default merged in
+        assert store.get(2, "Slot-2").conf == 0.3
+        assert store.get(3, "Slot-2").conf == 0.7
+        assert store.get(9).name == "default"
+
+        _write(path, {"profiles": {"1": {"conf": 0.4, "preprocs": ["original"]}}})
+        os.utime(path, (time.time() + 5, time.time() + 5))
+        assert store.get(1).conf == 0.4 and store.get(1).preprocs == ("original",)
+
+        with open(path, "w") as f:
+            f.write("{broken")
+        os.utime(path, (time.time() + 10, time.time() + 10))
+        assert store.get(1).conf == 0.4  # previous profiles stay active
+        assert store.reloads == 2
+
+
+def test_rect_roi_crops_before_detection():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "profiles.json")
+        _write(path, {"profiles": {"1": {"roi": [0, 0.5, 1, 1], "imgsz": 320, "conf": 0.4}}})
+        profile = ProfileStore(path).get(1)
+    det = FakeDetector([[10, 20, 110, 60]])
+    boxes = detect_plate_boxes(np.zeros((720, 1280, 3), np.uint8), det, profile)
+    assert det.calls == [((360, 1280, 3), {"conf": 0.4, "imgsz": 320})]
+    assert boxes == [((10, 380, 110, 420), 0.8999999761581421)]
+
+
+def test_polygon_roi_drops_outside_detections():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "profiles.json")
+        _write(path, {"profiles": {"1": {"roi": [[0, 0.5], [0.5, 0.5], [0, 1]]}}})
+        profile = ProfileStore(path).get(1)
+    frame = np.full((100, 200, 3), 255, np.uint8)
+    sub, offset = profile.crop(frame)
+    assert offset == (0, 50) and sub.shape == (50, 100, 3)
+    assert sub[2, 2].tolist() == [255, 255, 255] and sub[-2, -2].tolist() == [114, 114, 114]  # masked outside
+    # box inside the triangle kept, box in the masked corner of the crop dropped
+    det = FakeDetector([[10, 10, 40, 30], [80, 40, 100, 50]])
+    assert [b for b, _ in detect_plate_boxes(frame, det, profile)] == [(10, 60, 40, 80)]
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All profile tests passed")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test script untuk anpr_reconcile: jarak berbobot (kebingungan OCR murah), pencocokan bacaan
+keluar ke plat yang parkir (fuzzy, ambigu, tidak ketemu), refresh dari Laravel dan kesamaan
+hasil indeks dengan pencarian brute force.
+"""
+
+import random
+
+from anpr_reconcile import ParkedIndex, plate_distance
+
+
+def test_weighted_distance():
+    assert plate_distance("B1387DKC", "81387DKC") == 1  # B/8 confusion
+    assert plate_distance("B1234CD", "B1234C0") == 1  # D/0
+    assert plate_distance("B1234CD", "B1234CX") == 3  # arbitrary substitution
+    assert plate_distance("B1234CD", "B124CD") == 3  # dropped character
+    assert plate_distance("B1234CD", "B1234CD") == 0
+
+
+def test_match_exit_reads():
+    fetched = [["B 1387 DKC", "L1389DJ", "B1234CD", "B1234CO"]]
+    index = ParkedIndex(fetch=lambda: fetched[0], max_distance=3, miss_refresh_seconds=3600)
+    assert index.refresh() and len(index) == 4
+
+    assert index.match("81387DKC") == ("B1387DKC", 1)
+    assert index.match("L1389DJ") == ("L1389DJ", 0)
+    assert index.match("B1234C0") == (None, 1)  # D and O are equally near: do not guess
+    assert index.match("Z9999XX") == (None, None)
+    assert index.stats["fuzzy"] == 1 and index.stats["ambiguous"] == 1 and index.stats["miss"] == 1
+
+    index.remove("B1234CO")
+    assert index.match("B1234C0") == ("B1234CD", 1)
+    index.add("AB 77 XY")
+    assert index.match("A877XY") == ("AB77XY", 1)
+
+    def broken():
+        raise IOError("laravel down")
+    index.fetch = broken
+    assert not index.refresh() and len(index) == 4 and index.stats["refresh_errors"] == 1
+
+
+def test_miss_reloads_before_giving_up():
+    laravel = ["B1AA"]
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return list(laravel)
+    index = ParkedIndex(fetch=fetch, miss_refresh_seconds=3600)
+    assert index.refresh() and len(calls) == 1
+    laravel.append("B 1387 DKC")  # entry read by another worker
+    assert index.match("81387DKC") == (None, None) and len(calls) == 1  # last reload too recent to repeat
+
+    index = ParkedIndex(fetch=fetch, miss_refresh_seconds=0)
+    index.add("B1AA")  # only this process's events so far
+    assert index.match("81387DKC") == ("B1387DKC", 1)  # reloaded inline, found on the retry
+    assert index.match("Z9999XX") == (None, None) and index.stats["miss"] == 1
+    assert len(calls) == 3
+
+
+def test_refresh_keeps_events_seen_during_fetch():
+    index = ParkedIndex()
+    index.add("B 1 AA")
+
+    def slow_fetch():
+        # Laravel's list was read before these two events reached it
+        index.add("L 1389 DJ")
+        index.remove("B 1 AA")
+        return ["B1AA", "D77XY"]
+    index.fetch = slow_fetch
+    assert index.refresh()
+    assert index.match("L1389DJ") == ("L1389DJ", 0)
+    assert index.match("B1AA") == (None, None)
+    assert len(index) == 2
+    index.fetch = None
+    index.add("Z9")  # no fetch in flight: nothing is journaled
+    assert index._journal is None
+
+
+def test_index_matches_brute_force():
+    rng = random.Random(3)
+    letters = "ABCDEGHKLNRSTZ"
+    plates = {rng.choice(["B", "D", "AB", "L"]) + str(rng.randint(1, 999)) + rng.choice(letters) + rng.choice(letters)
+              for _ in range(400)}
+    index = ParkedIndex(max_distance=4)
+    index.replace(plates)
+    for plate in list(plates)[:60]:
+        i = rng.randrange(len(plate))
+        read = plate[:i] + rng.choice("08BDOSZ5X") + plate[i + 1:]
+        expected = sorted((plate_distance(read, p), p) for p in plates if plate_distance(read, p) <= 4)
+        assert index._index.search(read) == expected
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All reconcile tests passed")
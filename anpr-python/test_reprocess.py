@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test script untuk anpr_reprocess: daftar gambar dari direktori/glob, resume dari output JSONL
+(termasuk baris terakhir yang terpotong) dan konversi ke format license_plate_results.json.
+"""
+
+import os
+import json
+import tempfile
+
+from anpr_reprocess import iter_image_paths, load_checkpoint, to_result_schema, write_legacy_json
+
+
+def test_image_paths():
+    with tempfile.TemporaryDirectory() as d:
+        os.makedirs(os.path.join(d, "2024", "01"))
+        for name in ("a.jpg", "notes.txt", os.path.join("2024", "01", "b.JPEG")):
+            open(os.path.join(d, name), "wb").close()
+        paths = list(iter_image_paths([d, os.path.join(d, "**", "*.JPEG")]))
+        assert paths == [os.path.join(d, "2024", "01", "b.JPEG"), os.path.join(d, "a.jpg")]
+
+
+def test_resume_and_legacy_json():
+    plate = {"text": "B 1387 DKC", "confidence": 0.99, "preprocessing": "clahe", "bbox": [36, 54, 238, 121],
+             "detection_confidence": 0.82, "ocr_passes": 3}
+    with tempfile.TemporaryDirectory() as d:
+        out = os.path.join(d, "results.jsonl")
+        with open(out, "w") as f:
+            f.write(json.dumps({"image": "images/test1.jpg", "plates": [to_result_schema(plate)]}) + "\n")
+            f.write(json.dumps({"image": "images/test2.jpg", "error": "cannot decode image"}) + "\n")
+            f.write(json.dumps({"image": "images/test3.jpg", "plates": []}) + "\n")
+            f.write('{"image": "images/test4.jpg", "pla')  # killed mid-write
+
+        assert load_checkpoint(out) == {"images/test1.jpg", "images/test3.jpg"}  # errors are retried
+        with open(out) as f:
+            assert f.read().endswith("\n")
+
+        legacy = os.path.join(d, "license_plate_results.json")
+        assert write_legacy_json(out, legacy) == 1
+        with open(legacy) as f:
+            assert json.load(f) == {"images/test1.jpg": [{
+                "text": "B 1387 DKC", "confidence": 0.99, "preprocessing_method": "clahe",
+                "bbox": [36, 54, 238, 121], "detection_confidence": 0.82}]}
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All reprocess tests passed")
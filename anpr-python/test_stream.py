@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script untuk anpr_stream: parser multipart, dan satu koneksi streaming sungguhan
+(werkzeug server lokal + FrameStreamClient) dengan pipeline palsu yang lambat, untuk
+memastikan event kembali di koneksi yang sama selagi frame masih dikirim dan frame basi dibuang.
+"""
+
+import io
+import time
+import threading
+
+from flask import Flask, Response, request
+from werkzeug.serving import make_server
+
+import numpy as np
+
+from anpr_bisa import detect_plate_boxes
+from anpr_stream import FrameStreamClient, StreamSession, boundary_from_content_type, read_multipart_frames
+
+
+def test_multipart_parser():
+    body = (b"--b\r\nContent-Type: image/jpeg\r\nContent-Length: 3\r\n\r\nabc\r\n"
+            b"--b\r\nContent-Type: image/jpeg\r\n\r\n\xff\xd8no-length\r\n"
+            b"--b--\r\n")
+    assert list(read_multipart_frames(io.BytesIO(body), "b")) == [b"abc", b"\xff\xd8no-length"]
+    assert boundary_from_content_type('multipart/x-mixed-replace; boundary="cam1"') == "cam1"
+
+
+def _serve(process):
+    app = Flask("stream-test")
+
+    @app.route("/stream", methods=["POST"])
+    def stream():
+        session = StreamSession(request.stream, process, boundary=boundary_from_content_type(request.content_type),
+                                stats_seconds=0)
+        return Response(session.events(), mimetype="application/x-ndjson")
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_stream_duplex_and_drop():
+    def slow_pipeline(data, final):
+        if data is None:
+            return [{"type": "flush"}] if final else []
+        time.sleep(0.05)
+        return [{"type": "plate", "plate": data.decode()}]
+
+    server = _serve(slow_pipeline)
+    events = []
+    client = FrameStreamClient(f"http://127.0.0.1:{server.server_port}/stream?webcam_index=1",
+                               on_event=events.append).connect()
+    client.send(b"F0")
+    deadline = time.time() + 5
+    while not events and time.time() < deadline:
+        time.sleep(0.01)
+    assert events and events[0]["plate"] == "F0"  # answered while the request body is still open
+
+    for i in range(1, 40):
+        client.send(f"F{i}".encode())
+    time.sleep(0.3)
+    client.send(b"LAST")
+    time.sleep(0.2)
+    client.close()
+    server.shutdown()
+
+    end = events[-1]
+    assert end["type"] == "end" and end["received"] == 41 and end["error"] is None
+    assert end["dropped"] > 0 and end["processed"] + end["dropped"] == 41
+    plates = [e["plate"] for e in events if e["type"] == "plate"]
+    assert plates[-1] == "LAST" and len(plates) == end["processed"]
+    assert events[-2] == {"type": "flush"}
+
+
+
+def test_streams_share_detector_one_call_at_a_time():
+    # gthread: every /stream of a worker calls the same (not thread-safe) model instance
+    state = {"inside": 0, "overlap": 0, "calls": 0}
+    guard = threading.Lock()
+
+    def detector(img, **kwargs):
+        with guard:
+            state["inside"] += 1
+            state["calls"] += 1
+            state["overlap"] = max(state["overlap"], state["inside"])
+        time.sleep(0.005)
+        with guard:
+            state["inside"] -= 1
+        return []
+
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    threads = [threading.Thread(target=lambda: [detect_plate_boxes(frame, detector) for _ in range(10)])
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert state["calls"] == 40 and state["overlap"] == 1
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All stream tests passed")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script untuk anpr_tracker (tracking IoU + voting per karakter), tanpa kamera/model.
+"""
+
+from anpr_tracker import PlateTracker, vote_plate
+
+
+def test_vote_fixes_single_bad_character():
+    plate, agreement = vote_plate([("B 1387 DKC", 0.9), ("B 1381 DKC", 0.6), ("B 1387 DKC", 0.8)])
+    assert plate == "B1387DKC"
+    assert 0.9 < agreement <= 1.0
+
+
+def test_vote_ignores_minority_length():
+    plate, _ = vote_plate([("L1389DJ", 0.9), ("L1389DJ09", 0.95), ("L1389DJ", 0.7)])
+    assert plate == "L1389DJ"
+
+
+def test_one_event_per_vehicle_with_few_ocr_calls():
+    tracker = PlateTracker(iou_thresh=0.3, max_age=0.5, ocr_reads=3, ocr_interval=2, min_reads=2)
+    reads = ["B1656SPW", "B1656SPH", "B1656SPW"]
+    events = []
+    t = 0.0
+    # 30 frames of one car creeping forward
+    for frame in range(30):
+        t += 0.05
+        box = (100 + frame, 200, 260 + frame, 250)
+        for track in tracker.update([(box, 0.8)], now=t):
+            if tracker.wants_read(track):
+                tracker.add_read(track, reads[len(track.reads) % len(reads)], 0.9)
+        events.extend(tracker.pop_events(now=t))
+    events.extend(tracker.pop_events(now=t + 5))  # car gone
+    assert len(events) == 1
+    assert events[0]["plate"] == "B1656SPW"
+    assert tracker.stats["ocr_calls"] == 3  # not 30
+
+
+def test_two_cars_get_separate_tracks():
+    tracker = PlateTracker(ocr_reads=1, min_reads=1)
+    seen = tracker.update([((0, 0, 100, 40), 0.9), ((400, 300, 500, 340), 0.9)], now=0.0)
+    assert seen[0].id != seen[1].id
+    seen2 = tracker.update([((402, 301, 502, 341), 0.9), ((3, 1, 103, 41), 0.9)], now=0.1)
+    assert seen2[0].id == seen[1].id and seen2[1].id == seen[0].id
+
+
+def test_short_track_with_too_few_reads_is_dropped():
+    tracker = PlateTracker(max_age=0.2, ocr_reads=3, min_reads=2)
+    (track,) = tracker.update([((0, 0, 100, 40), 0.9)], now=0.0)
+    tracker.add_read(track, "XX9", 0.3)
+    assert tracker.pop_events(now=1.0) == []
+    assert not tracker.tracks
+
+
+def test_evidence_from_best_read():
+    tracker = PlateTracker(max_age=0.2, ocr_reads=3, ocr_interval=1, min_reads=2)
+    for i, conf in enumerate([0.6, 0.95, 0.7]):
+        (track,) = tracker.update([((10 * i, 0, 10 * i + 100, 40), 0.9)], now=0.1 * i)
+        tracker.add_read(track, "B1234CD", conf, evidence=f"frame{i}")
+    tracker.update([((300, 0, 400, 40), 0.9)], now=0.3)  # plate moved on, a different box
+    (event,) = tracker.pop_events(now=0.3)
+    assert event["evidence"] == "frame1" and event["evidence_bbox"] == (10, 0, 110, 40)
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All tracker tests passed")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script untuk upload adaptif webcam_capture: crop/downscale, budget JPEG, dan interval
+kirim yang mengikuti Retry-After / X-Suggested-Interval dari server (stand-in HTTP lokal).
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from webcam_capture import JpegBudgetEncoder, SendPacer, StreamRate, capture_and_send_frame, prepare_frame
+
+
+def _noisy_frame(w=1280, h=720, blur=0):
+    frame = np.random.RandomState(1).randint(0, 255, (h, w, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(frame, (blur, blur), 0) if blur else frame
+
+
+def test_prepare_and_budget():
+    frame = _noisy_frame()
+    assert prepare_frame(frame, roi=(0.0, 0.5, 1.0, 1.0), max_width=640).shape == (180, 640, 3)
+
+    encoder = JpegBudgetEncoder(budget_kb=40, quality_range=(30, 90))
+    small = prepare_frame(frame, roi=(0.0, 0.5, 1.0, 1.0), max_width=640)
+    data = encoder.encode(small)
+    assert len(data) <= 40 * 1024 or encoder.quality == 30
+    assert encoder.quality < 90
+    assert cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR).shape == small.shape
+
+
+def test_pacer_and_stream_rate():
+    pacer = SendPacer(min_interval=0.5, max_interval=5.0)
+    pacer.sent({"X-Suggested-Interval": "20"}, 200, now=100.0)
+    assert pacer.interval == 5.0  # suggestion capped so vehicles are not missed
+    pacer.sent({"Retry-After": "8"}, 503, now=100.0)
+    assert pacer.interval == 8.0 and not pacer.ready(107.0) and pacer.ready(108.0)
+    pacer.sent({}, 200, now=108.0)
+    assert pacer.interval == 6.4  # relaxes back without feedback
+    pacer = SendPacer(min_interval=0.5, max_interval=5.0)
+    for expected in (1.0, 2.0, 4.0, 5.0):
+        pacer.sent(status=None, now=0.0)  # server down: back off, do not hammer it
+        assert pacer.interval == expected
+    pacer.sent({}, 502, now=0.0)
+    assert pacer.interval == 5.0
+
+    rate = StreamRate(max_fps=5)
+    rate.on_stats(received=10, dropped=6)
+    assert rate.fps == 3.5
+    rate.on_stats(received=20, dropped=6)
+    assert abs(rate.fps - 4.2) < 1e-9
+
+
+def test_send_reuses_frame_and_follows_server():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append((self.headers.get("Content-Type"), self.rfile.read(int(self.headers["Content-Length"]))))
+            out = json.dumps({"success": True, "plate": "B1234CD"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("X-Suggested-Interval", "1.5")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    class NoRead:
+        def read(self):
+            raise AssertionError("frame must not be read twice")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    pacer = SendPacer(min_interval=0.5, max_interval=5.0)
+    ok, plate = capture_and_send_frame(NoRead(), f"http://127.0.0.1:{server.server_address[1]}/process_image",
+                                       frame=_noisy_frame(blur=9), encoder=JpegBudgetEncoder(budget_kb=60), pacer=pacer)
+    server.shutdown()
+
+    assert ok and plate == "B1234CD" and pacer.interval == 1.5
+    content_type, body = received[0]
+    assert content_type == "image/jpeg" and len(body) <= 60 * 1024
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            print(f"[{name}]", end=" ", flush=True)
+            fn()
+            print("OK")
+    print("All webcam capture tests passed")
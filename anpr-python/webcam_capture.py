@@ -1,9 +1,11 @@
+import os
 import cv2
 import requests
 import numpy as np
 import time
 import logging
-from anpr_bisa import setup_models, process_image
+from anpr_motion import MotionGate, MOTION_GATE, parse_roi
+from anpr_stream import FrameStreamClient, StreamError
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -14,6 +16,17 @@ CAMERA_INDEX = 0  # Change to 1 or other numbers if multiple cameras exist
 CAMERA_RESOLUTION = (1280, 720)  # 720p resolution, optimal for ANPR
 CAMERA_FPS = 15  # Frame rate to avoid overwhelming the system
 ANPR_SERVER_URL = "http://localhost:5000/process_image"  # Default ANPR server URL
+ANPR_STREAM_URL = "http://localhost:5000/stream"  # Streaming endpoint (satu koneksi per kamera)
+STREAM_FPS = 5  # Frame per detik yang dikirim di mode streaming; server membuang frame basi sendiri
+
+# Adaptive upload: crop + downscale sebelum encode, kualitas JPEG mengikuti budget byte,
+# interval kirim mengikuti Retry-After / X-Suggested-Interval dari server
+CLIENT_ROI = os.getenv("CLIENT_ROI", "0,0,1,1")  # x1,y1,x2,y2 (fraksi); jangan dobel dengan roi di camera_profiles.json
+CLIENT_MAX_WIDTH = int(os.getenv("CLIENT_MAX_WIDTH", 960))  # lebar maksimum frame yang dikirim
+CLIENT_JPEG_BUDGET_KB = float(os.getenv("CLIENT_JPEG_BUDGET_KB", 60))
+CLIENT_JPEG_QUALITY = (int(os.getenv("CLIENT_JPEG_QUALITY_MIN", 50)), int(os.getenv("CLIENT_JPEG_QUALITY_MAX", 90)))
+CLIENT_MIN_INTERVAL = float(os.getenv("CLIENT_MIN_INTERVAL", 0.5))  # detik, saat ada gerakan
+CLIENT_MAX_INTERVAL = float(os.getenv("CLIENT_MAX_INTERVAL", 5.0))  # batas atas saran server (kecuali Retry-After)
 
 def initialize_camera(camera_index=CAMERA_INDEX, resolution=CAMERA_RESOLUTION, fps=CAMERA_FPS):
     """
@@ -40,37 +53,121 @@ def initialize_camera(camera_index=CAMERA_INDEX, resolution=CAMERA_RESOLUTION, f
 
     return cap
 
-def capture_and_send_frame(cap, server_url=ANPR_SERVER_URL):
+def prepare_frame(frame, roi=None, max_width=None):
+    """Crop to the camera ROI (fractions) and downscale to max_width before encoding."""
+    x1, y1, x2, y2 = parse_roi(roi or CLIENT_ROI) if not isinstance(roi, tuple) else roi
+    h, w = frame.shape[:2]
+    if (x1, y1, x2, y2) != (0.0, 0.0, 1.0, 1.0):
+        frame = frame[int(y1 * h):int(y2 * h), int(x1 * w):int(x2 * w)]
+        h, w = frame.shape[:2]
+    max_width = max_width or CLIENT_MAX_WIDTH
+    if w > max_width:
+        frame = cv2.resize(frame, (max_width, int(h * max_width / float(w))), interpolation=cv2.INTER_AREA)
+    return frame
+
+
+class JpegBudgetEncoder:
     """
-    Capture a frame from the camera and send it to the ANPR server
+    JPEG encoder that keeps frames near a byte budget: quality drops (and the frame is
+    re-encoded) when a frame comes out too large, and creeps back up while frames are small.
     """
-    ret, frame = cap.read()
 
-    if not ret:
-        logger.error("Failed to capture frame from camera")
-        return False, None
+    def __init__(self, budget_kb=None, quality_range=None, step=5):
+        self.budget = int((budget_kb or CLIENT_JPEG_BUDGET_KB) * 1024)
+        self.min_q, self.max_q = quality_range or CLIENT_JPEG_QUALITY
+        self.step = step
+        self.quality = self.max_q
+
+    def encode(self, frame):
+        while True:
+            _, buf = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+            if buf.size <= self.budget or self.quality <= self.min_q:
+                break
+            # estimate the quality that fits instead of stepping down one notch at a time
+            over = buf.size / float(self.budget)
+            self.quality = max(self.min_q, int(self.quality - max(self.step, 10 * (over - 1))))
+        if buf.size < 0.7 * self.budget and self.quality < self.max_q:
+            self.quality = min(self.max_q, self.quality + 1)
+        return buf.tobytes()
+
+
+class SendPacer:
+    """
+    Send interval from server feedback: Retry-After is obeyed as is, X-Suggested-Interval is
+    followed within [min_interval, max_interval]. A failed send (no response, or 5xx without
+    Retry-After) doubles the interval up to max_interval; a good response without feedback
+    relaxes it back to min_interval. A camera never waits longer than max_interval unless told to.
+    """
+
+    def __init__(self, min_interval=None, max_interval=None):
+        self.min_interval = CLIENT_MIN_INTERVAL if min_interval is None else min_interval
+        self.max_interval = CLIENT_MAX_INTERVAL if max_interval is None else max_interval
+        self.interval = self.min_interval
+        self.next_send = 0.0
+
+    def ready(self, now=None):
+        return (time.time() if now is None else now) >= self.next_send
+
+    def sent(self, headers=None, status=None, now=None):
+        now = time.time() if now is None else now
+        headers = headers or {}
+        retry_after = _float_header(headers, "Retry-After")
+        suggested = _float_header(headers, "X-Suggested-Interval")
+        if retry_after is not None and (status in (429, 503) or status is None):
+            self.interval = max(self.min_interval, retry_after)
+        elif suggested is not None:
+            self.interval = min(self.max_interval, max(self.min_interval, suggested))
+        elif status is None or status >= 500:
+            self.interval = min(self.max_interval, max(self.min_interval, 2 * self.interval))
+        else:
+            self.interval = max(self.min_interval, 0.8 * self.interval)
+        self.next_send = now + self.interval
 
-    # Encode frame as JPEG with high quality
-    encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 90]
-    _, img_encoded = cv2.imencode('.jpg', frame, encode_param)
+
+def _float_header(headers, name):
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def capture_and_send_frame(cap, server_url=ANPR_SERVER_URL, frame=None, encoder=None, pacer=None):
+    """
+    Send a frame to the ANPR server.
+    frame: the frame already read (and displayed) by the caller; only read from cap when None
+    encoder: JpegBudgetEncoder (ROI crop, downscale and byte budget); None = full frame at quality 90
+    pacer: SendPacer updated from Retry-After / X-Suggested-Interval of the response
+    """
+    if frame is None:
+        ret, frame = cap.read()
+        if not ret:
+            logger.error("Failed to capture frame from camera")
+            return False, None
+
+    if encoder is not None:
+        data = encoder.encode(prepare_frame(frame))
+    else:
+        _, img_encoded = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 90])
+        data = img_encoded.tobytes()
 
     try:
         # Send image to ANPR server
         response = requests.post(
             server_url,
-            data=img_encoded.tobytes(),
-            headers={'Content-Type': 'application/octet-stream'},
+            data=data,
+            headers={'Content-Type': 'image/jpeg'},
             timeout=10  # Add timeout to prevent hanging
         )
+        if pacer is not None:
+            pacer.sent(response.headers, response.status_code)
 
-        if response.status_code == 200:
+        if response.status_code in (200, 202):
             result = response.json()
             logger.info(f"ANPR Result: {result}")
 
             # Extract plate number if available
-            plate_number = None
-            if result.get('success') and result.get('data', {}).get('plate_number'):
-                plate_number = result['data']['plate_number']
+            plate_number = result.get('plate') if result.get('success') else None
+            if plate_number:
                 logger.info(f"Detected plate: {plate_number}")
 
             return True, plate_number
@@ -79,18 +176,25 @@ def capture_and_send_frame(cap, server_url=ANPR_SERVER_URL):
             return False, None
 
     except requests.exceptions.RequestException as e:
+        if pacer is not None:
+            pacer.sent(status=None)
         logger.error(f"Error sending frame to ANPR server: {e}")
         return False, None
 
-def run_webcam_anpr(cap, server_url=ANPR_SERVER_URL, capture_interval=2.0):
+
+def run_webcam_anpr(cap, server_url=ANPR_SERVER_URL, capture_interval=None):
     """
     Main loop to continuously capture frames and run ANPR
-    capture_interval: Time between captures in seconds (to avoid overwhelming the server)
+    capture_interval: fixed seconds between captures; None = adaptive (SendPacer follows the
+                      server's Retry-After / X-Suggested-Interval, starting at CLIENT_MIN_INTERVAL)
     """
     logger.info("Starting webcam ANPR system. Press 'q' to quit.")
 
     frame_count = 0
-    last_capture_time = time.time()
+    # Lewati kirim ke server saat lajur kosong (tidak ada perubahan di ROI)
+    gate = MotionGate() if MOTION_GATE else None
+    encoder = JpegBudgetEncoder()
+    pacer = SendPacer(capture_interval, capture_interval) if capture_interval else SendPacer()
 
     while True:
         ret, frame = cap.read()
@@ -104,10 +208,10 @@ def run_webcam_anpr(cap, server_url=ANPR_SERVER_URL, capture_interval=2.0):
 
         # Process frame at specified intervals
         current_time = time.time()
-        if current_time - last_capture_time >= capture_interval:
-            last_capture_time = current_time
-
-            success, plate_number = capture_and_send_frame(cap, server_url)
+        moving = gate.check(frame, current_time) if gate is not None else True
+        if moving and pacer.ready(current_time):
+            # the frame just displayed, not a second (later) cap.read()
+            success, plate_number = capture_and_send_frame(cap, server_url, frame=frame, encoder=encoder, pacer=pacer)
 
             if success and plate_number:
                 logger.info(f"PLATE DETECTED: {plate_number}")
@@ -131,8 +235,107 @@ def run_webcam_anpr(cap, server_url=ANPR_SERVER_URL, capture_interval=2.0):
     # Cleanup
     cap.release()
     cv2.destroyAllWindows()
+    if gate is not None:
+        logger.info(f"Motion gate: {gate.stats()}")
     logger.info("Webcam ANPR system stopped.")
 
+def _log_stream_event(event):
+    if event.get("type") == "plate":
+        logger.info(f"PLATE DETECTED: {event['plate']} (track {event['track_id']}, {event['reads']} reads, "
+                    f"sent={event['sent']} queued={event['queued']})")
+    elif event.get("type") in ("stats", "end"):
+        logger.info(f"Stream {event['type']}: received={event['received']} processed={event['processed']} "
+                    f"dropped={event['dropped']}")
+    else:
+        logger.info(f"Stream: {event}")
+
+
+class StreamRate:
+    """
+    Send rate for streaming mode from the server's stats events: when the server drops a
+    large share of frames (inference behind) the rate goes down, when it drops none it
+    climbs back to max_fps.
+    """
+
+    def __init__(self, max_fps=None, min_fps=1.0):
+        self.max_fps = max_fps or STREAM_FPS
+        self.min_fps = min_fps
+        self.fps = self.max_fps
+        self._last = (0, 0)  # (received, dropped) at the previous stats event
+
+    def on_stats(self, received, dropped):
+        d_recv, d_drop = received - self._last[0], dropped - self._last[1]
+        self._last = (received, dropped)
+        if d_recv <= 0:
+            return
+        if d_drop / float(d_recv) > 0.3:
+            self.fps = max(self.min_fps, self.fps * 0.7)
+        elif d_drop == 0:
+            self.fps = min(self.max_fps, self.fps * 1.2)
+
+
+def run_webcam_stream(cap, stream_url=ANPR_STREAM_URL, webcam_index=1, slot_name=None, fps=STREAM_FPS):
+    """
+    Streaming mode: one long-lived connection to /stream instead of a POST per frame.
+    Frames are cropped / downscaled / budget-encoded and go out as MJPEG parts at up to `fps`,
+    lowered while the server reports dropped frames; plate events come back on the same
+    connection (one per vehicle, the server tracks and debounces). Reconnects with backoff
+    if the server restarts or is not ready yet.
+    """
+    logger.info("Starting webcam ANPR stream. Press 'q' to quit.")
+    url = f"{stream_url}?webcam_index={webcam_index}" + (f"&slot_name={slot_name}" if slot_name else "")
+    encoder = JpegBudgetEncoder()
+    rate = StreamRate(fps)
+    gate = MotionGate() if MOTION_GATE else None
+
+    def on_event(event):
+        _log_stream_event(event)
+        if event.get("type") == "stats":
+            rate.on_stats(event["received"], event["dropped"])
+    client = None
+    backoff = 0.5
+    next_connect = 0.0
+    last_sent = 0.0
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            logger.error("Failed to read frame from camera")
+            break
+        cv2.imshow('Webcam ANPR - Press q to quit', frame)
+
+        now = time.time()
+        if client is None and now >= next_connect:
+            try:
+                client = FrameStreamClient(url, on_event=on_event).connect()
+                rate._last = (0, 0)  # counters restart with the connection
+                backoff = 0.5
+            except OSError as e:
+                logger.error(f"Cannot connect to {stream_url}: {e}")
+                client, next_connect, backoff = None, now + backoff, min(backoff * 2, 30.0)
+
+        moving = gate.check(frame, now) if gate is not None else True
+        if client is not None and moving and now - last_sent >= 1.0 / rate.fps:
+            last_sent = now
+            try:
+                client.send(encoder.encode(prepare_frame(frame)))
+            except StreamError as e:
+                logger.error(f"Stream lost ({e}), reconnecting")
+                client.close(wait=0)
+                client, next_connect, backoff = None, now + backoff, min(backoff * 2, 30.0)
+
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    if client is not None:
+        client.close()
+    cap.release()
+    cv2.destroyAllWindows()
+    if gate is not None:
+        logger.info(f"Motion gate: {gate.stats()}")
+    logger.info("Webcam ANPR stream stopped.")
+
+
 def test_camera_configurations():
     """
     Test different camera configurations to find the optimal one for Logitech Webcam
@@ -174,14 +377,18 @@ if __name__ == "__main__":
     # You can run in test mode or normal mode
     import sys
 
-    if len(sys.argv) > 1 and sys.argv[1] == "test":
+    # python webcam_capture.py [stream|post|test]: stream (default) = satu koneksi /stream,
+    # post = loop lama satu POST /process_image per capture_interval
+    mode = sys.argv[1] if len(sys.argv) > 1 else "stream"
+    if mode == "test":
         test_camera_configurations()
     else:
         # Initialize camera
         cap = initialize_camera()
 
-        if cap is not None:
-            # Start the main ANPR loop
+        if cap is None:
+            logger.error("Failed to initialize camera. Exiting.")
+        elif mode == "post":
             run_webcam_anpr(cap)
         else:
-            logger.error("Failed to initialize camera. Exiting.")
\ No newline at end of file
+            run_webcam_stream(cap)
\ No newline at end of file